@@ -0,0 +1,233 @@
+"""
+Caché de resultados de validación direccionada por contenido.
+
+La clave combina el SHA-256 del archivo subido con una huella de la
+configuración de formato activa y otra del plan de reglas usado
+(validators/reglas.py), de modo que un cambio en `Settings` o en el archivo
+de reglas de una escuela invalida automáticamente los resultados anteriores.
+
+Dos niveles:
+- LRU en memoria del proceso (acotado, con TTL)
+- Backend compartido opcional (Redis si hay REDIS_URL, o uno en memoria para pruebas)
+"""
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Protocol, Tuple
+
+from .config import Settings, get_settings
+from .models import ValidacionResultado
+from .validators.reglas import PlanReglas, plan_reglas
+
+logger = logging.getLogger(__name__)
+
+# Campos de Settings que afectan el resultado de la validación
+CAMPOS_FORMATO = (
+    "page_width_cm",
+    "page_height_cm",
+    "margin_top_cm",
+    "margin_bottom_cm",
+    "margin_left_cm",
+    "margin_right_cm",
+    "font_name",
+    "font_size_pt",
+    "line_spacing",
+    "first_line_indent_cm",
+    "estructura_secciones",
+    "estructura_variantes",
+    "validation_stories",
+)
+
+# Subir cuando cambien las reglas de validación para no servir resultados
+# calculados con las anteriores (2: propiedades efectivas heredadas de estilos,
+# 3: clasificación de párrafos compartida con los formateadores,
+# 4: variantes de secciones y normalización completa de acentos,
+# 5: reglas por escuela en la clave,
+# 6: paginación estimada y validación de páginas,
+# 7: fin de los índices en la primera sección preliminar)
+VERSION_REGLAS = 7
+
+
+def huella_settings(settings: Settings) -> str:
+    """Huella corta de la configuración de formato."""
+    valores = {campo: getattr(settings, campo) for campo in CAMPOS_FORMATO}
+    valores["_version"] = VERSION_REGLAS
+    datos = json.dumps(valores, sort_keys=True).encode()
+    return hashlib.sha256(datos).hexdigest()[:16]
+
+
+class BackendCache(Protocol):
+    """Nivel compartido de la caché (p. ej. Redis)."""
+
+    async def get(self, clave: str) -> Optional[bytes]: ...
+
+    async def set(self, clave: str, valor: bytes, ttl: int) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class BackendMemoria:
+    """Backend en memoria con la misma interfaz que Redis, para pruebas."""
+
+    def __init__(self):
+        self._datos: Dict[str, Tuple[bytes, float]] = {}
+
+    async def get(self, clave: str) -> Optional[bytes]:
+        entrada = self._datos.get(clave)
+        if entrada is None:
+            return None
+        valor, expira = entrada
+        if expira < time.monotonic():
+            del self._datos[clave]
+            return None
+        return valor
+
+    async def set(self, clave: str, valor: bytes, ttl: int) -> None:
+        self._datos[clave] = (valor, time.monotonic() + ttl)
+
+    async def close(self) -> None:
+        self._datos.clear()
+
+
+class BackendRedis:
+    """Backend sobre Redis (requiere el paquete `redis`)."""
+
+    def __init__(self, url: str):
+        from redis import asyncio as redis_asyncio
+
+        self._cliente = redis_asyncio.from_url(url)
+
+    async def get(self, clave: str) -> Optional[bytes]:
+        return await self._cliente.get(clave)
+
+    async def set(self, clave: str, valor: bytes, ttl: int) -> None:
+        await self._cliente.set(clave, valor, ex=ttl)
+
+    async def close(self) -> None:
+        await self._cliente.aclose()
+
+
+class CacheValidaciones:
+    """Caché de ValidacionResultado con LRU local y backend compartido opcional."""
+
+    def __init__(
+        self,
+        max_entradas: int = 256,
+        ttl: int = 3600,
+        backend: Optional[BackendCache] = None,
+        settings: Optional[Settings] = None,
+    ):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.backend = backend
+        self._settings = settings
+        self._lru: "OrderedDict[str, Tuple[ValidacionResultado, float]]" = OrderedDict()
+        self._huella: Optional[str] = None
+        self.aciertos_lru = 0
+        self.aciertos_backend = 0
+        self.fallos = 0
+
+    def _clave(self, sha256: str, plan: Optional[PlanReglas]) -> str:
+        huella = huella_settings(self._settings or get_settings())
+        if huella != self._huella:
+            # La configuración cambió: los resultados locales ya no son válidos
+            self._lru.clear()
+            self._huella = huella
+        plan = plan or plan_reglas()
+        return f"validacion:{huella}:{plan.huella}:{sha256}"
+
+    async def obtener(
+        self, sha256: str, plan: Optional[PlanReglas] = None
+    ) -> Optional[ValidacionResultado]:
+        clave = self._clave(sha256, plan)
+
+        entrada = self._lru.get(clave)
+        if entrada is not None:
+            resultado, expira = entrada
+            if expira >= time.monotonic():
+                self._lru.move_to_end(clave)
+                self.aciertos_lru += 1
+                return resultado
+            del self._lru[clave]
+
+        if self.backend is not None:
+            try:
+                datos = await self.backend.get(clave)
+            except Exception as e:
+                logger.warning("Error al leer la caché compartida: %s", e)
+                datos = None
+            if datos is not None:
+                resultado = ValidacionResultado.model_validate_json(datos)
+                self._guardar_local(clave, resultado)
+                self.aciertos_backend += 1
+                return resultado
+
+        self.fallos += 1
+        return None
+
+    async def guardar(
+        self, sha256: str, resultado: ValidacionResultado, plan: Optional[PlanReglas] = None
+    ) -> None:
+        clave = self._clave(sha256, plan)
+        self._guardar_local(clave, resultado)
+
+        if self.backend is not None:
+            try:
+                await self.backend.set(
+                    clave, resultado.model_dump_json().encode(), self.ttl
+                )
+            except Exception as e:
+                logger.warning("Error al escribir la caché compartida: %s", e)
+
+    def _guardar_local(self, clave: str, resultado: ValidacionResultado) -> None:
+        if self.max_entradas <= 0:
+            return
+        self._lru[clave] = (resultado, time.monotonic() + self.ttl)
+        self._lru.move_to_end(clave)
+        while len(self._lru) > self.max_entradas:
+            self._lru.popitem(last=False)
+
+    def invalidar(self) -> None:
+        """Vacía el nivel local (el compartido expira por TTL o por huella)."""
+        self._lru.clear()
+
+    async def cerrar(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+
+
+def _crear_backend(settings: Settings) -> Optional[BackendCache]:
+    if not settings.redis_url:
+        return None
+    if settings.redis_url == "memory://":
+        return BackendMemoria()
+    try:
+        return BackendRedis(settings.redis_url)
+    except ImportError:
+        logger.warning("REDIS_URL definido pero el paquete redis no está instalado")
+        return None
+
+
+_cache: Optional[CacheValidaciones] = None
+
+
+def get_cache() -> CacheValidaciones:
+    """Retorna la caché del proceso, creándola si aún no existe."""
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        _cache = CacheValidaciones(
+            max_entradas=settings.cache_max_entries if settings.cache_enabled else 0,
+            ttl=settings.cache_ttl_s,
+            backend=_crear_backend(settings) if settings.cache_enabled else None,
+        )
+    return _cache
+
+
+async def cerrar_cache() -> None:
+    global _cache
+    if _cache is not None:
+        await _cache.cerrar()
+        _cache = None
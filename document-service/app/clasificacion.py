@@ -0,0 +1,293 @@
+"""
+Clasificación de párrafos compartida por validadores y formateadores.
+
+Cada párrafo recibe una sola etiqueta (`tipo`): portada, índice (título o
+entrada), capítulo, título de nivel 1/2/3, entrada de referencias, cuerpo o
+vacío. La etiqueta sale de dos partes:
+
+- el nivel según el texto y el estilo (`nivel_texto`), con un único patrón
+  precompilado para capítulos y numeraciones, memoizado por (texto, estilo)
+  porque entre versiones y entre validación y formateo se repiten;
+- el contexto del documento (`Clasificador`), que se recorre en orden: la
+  portada va antes del primer índice o capítulo, las entradas de índice van
+  desde un título de índice hasta el primer título que no es una entrada
+  (ver `Clasificador`), y las referencias desde su título hasta el siguiente
+  capítulo o título de anexos.
+
+Así estructura.py y los formateadores usan las mismas reglas para decidir
+qué es un título.
+"""
+import re
+import unicodedata
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+
+class TipoParrafo(str, Enum):
+    VACIO = "VACIO"
+    PORTADA = "PORTADA"
+    INDICE = "INDICE"  # título de un índice o lista
+    ENTRADA_INDICE = "ENTRADA_INDICE"
+    CAPITULO = "CAPITULO"
+    TITULO_1 = "TITULO_1"
+    TITULO_2 = "TITULO_2"
+    TITULO_3 = "TITULO_3"
+    REFERENCIA = "REFERENCIA"
+    CUERPO = "CUERPO"
+
+
+NIVELES_TITULO = (
+    TipoParrafo.CAPITULO,
+    TipoParrafo.TITULO_1,
+    TipoParrafo.TITULO_2,
+    TipoParrafo.TITULO_3,
+)
+
+# Capítulo y títulos numerados en un solo patrón. Los numerales romanos van
+# de mayor a menor longitud y con \b para que "II" no se lea como "I"
+PATRON_ENCABEZADO = re.compile(
+    r"""
+    (?P<capitulo>CAP[IÍ]TULO\s+(?P<numero>X|IX|VIII|VII|VI|V|IV|III|II|I|\d+)\b)
+    | (?P<nivel_3>\d+\.\d+\.\d+\.?\s+\S)
+    | (?P<nivel_2>\d+\.\d+\.?\s+\S)
+    """,
+    re.IGNORECASE | re.VERBOSE,
+)
+
+# Títulos en mayúsculas: más de 3 y menos de 100 caracteres
+MIN_TITULO_MAYUSCULAS = 4
+MAX_TITULO_MAYUSCULAS = 99
+
+# Párrafos del inicio en los que puede estar la portada
+PARRAFOS_PORTADA = 40
+
+ELEMENTOS_PORTADA = [
+    "UNIVERSIDAD NACIONAL DEL ALTIPLANO",
+    "UNIVERSIDAD",
+    "NACIONAL",
+    "ALTIPLANO",
+    "FACULTAD",
+    "ESCUELA PROFESIONAL",
+    "TESIS",
+    "PRESENTADA POR",
+    "PARA OPTAR",
+    "PUNO",
+]
+
+# Palabras clave para detectar secciones de índice
+PALABRAS_INDICE = [
+    "INDICE",
+    "ÍNDICE",
+    "CONTENIDO",
+    "TABLA DE CONTENIDO",
+    "LISTA DE TABLAS",
+    "LISTA DE FIGURAS",
+    "LISTA DE CUADROS",
+    "LISTA DE GRAFICOS",
+    "LISTA DE ANEXOS",
+    "ACRÓNIMOS",
+    "ACRONIMOS",
+    "ABREVIATURAS",
+]
+MAX_TITULO_INDICE = 49
+
+# Índices que no listan capítulos (se comparan con el texto normalizado)
+PALABRAS_INDICE_SIN_CAPITULOS = (
+    "TABLAS",
+    "FIGURAS",
+    "CUADROS",
+    "GRAFICOS",
+    "ILUSTRACIONES",
+    "ANEXOS",
+    "ACRONIMOS",
+    "ABREVIATURAS",
+    "SIGLAS",
+)
+
+# Secciones preliminares que siguen a los índices: su título termina el índice
+SECCIONES_PRELIMINARES = (
+    "DEDICATORIA",
+    "AGRADECIMIENTO",
+    "PRESENTACION",
+    "PROLOGO",
+    "RESUMEN",
+    "ABSTRACT",
+    "INTRODUCCION",
+)
+
+# Número de página al final de una entrada de índice: arábigo tras un espacio,
+# o romano en minúsculas (páginas preliminares) tras tabulación o puntos
+PATRON_PAGINA = re.compile(r"(?:(?:\t|\.{2,}|…)\s*(?:\d+|[ivxlcdm]+)|\s\d+)\s*$")
+
+# Se comparan con el texto normalizado (sin acentos)
+PALABRAS_REFERENCIAS = ("REFERENCIA", "BIBLIOGRAFIA")
+PALABRAS_ANEXOS = ("ANEXO", "APENDICE")
+
+
+class Clasificacion(NamedTuple):
+    tipo: TipoParrafo
+    nivel: TipoParrafo  # CAPITULO, TITULO_1/2/3 o CUERPO, solo por el texto
+    estilo_titulo: bool  # el estilo de párrafo es de título (Heading, Título, ...)
+    capitulo: Optional[str]  # numeral del capítulo, en mayúsculas
+
+    @property
+    def es_titulo(self) -> bool:
+        """Título por el texto o por el estilo, sin importar el contexto."""
+        return self.nivel is not TipoParrafo.CUERPO or self.estilo_titulo
+
+
+def _nivel_estilo(estilo: Optional[str]) -> Optional[TipoParrafo]:
+    """Nivel de título que indica el nombre del estilo, o None si no es de título."""
+    if not estilo:
+        return None
+    nombre = estilo.lower()
+    if "heading" not in nombre and "titulo" not in nombre and "title" not in nombre:
+        return None
+    digitos = "".join(c for c in nombre if c.isdigit())
+    if digitos == "2":
+        return TipoParrafo.TITULO_2
+    if digitos and int(digitos) >= 3:
+        return TipoParrafo.TITULO_3
+    return TipoParrafo.TITULO_1
+
+
+@lru_cache(maxsize=16384)
+def nivel_texto(texto: str, estilo: Optional[str]) -> Tuple[TipoParrafo, Optional[TipoParrafo], Optional[str]]:
+    """
+    (nivel por el texto, nivel por el estilo o None, numeral del capítulo)
+    de un párrafo con `texto` ya sin espacios en los extremos.
+    """
+    nivel = TipoParrafo.CUERPO
+    numero = None
+    if texto:
+        encabezado = PATRON_ENCABEZADO.match(texto)
+        if encabezado is not None and encabezado.group("capitulo"):
+            nivel = TipoParrafo.CAPITULO
+            numero = encabezado.group("numero").upper()
+        elif texto.isupper() and MIN_TITULO_MAYUSCULAS <= len(texto) <= MAX_TITULO_MAYUSCULAS:
+            nivel = TipoParrafo.TITULO_1
+        elif encabezado is not None:
+            nivel = TipoParrafo.TITULO_3 if encabezado.group("nivel_3") else TipoParrafo.TITULO_2
+    return nivel, _nivel_estilo(estilo), numero
+
+
+def _tabla_sin_acentos() -> Dict[int, Optional[str]]:
+    """Letra latina con diacríticos -> letra base; marcas combinantes sueltas -> nada."""
+    tabla: Dict[int, Optional[str]] = {}
+    for codigo in range(0x00C0, 0x0250):  # Latin-1, Latin Extended-A y B
+        base = unicodedata.normalize("NFD", chr(codigo))[0]
+        if base != chr(codigo) and base.isascii():
+            tabla[codigo] = base
+    for codigo in range(0x0300, 0x0370):  # texto ya descompuesto (NFD)
+        tabla[codigo] = None
+    return tabla
+
+
+TABLA_SIN_ACENTOS = _tabla_sin_acentos()
+
+
+def normalizar_texto(texto: str) -> str:
+    """Normaliza texto para comparación: mayúsculas y sin acentos (Á -> A, Ñ -> N, Ü -> U)."""
+    return texto.upper().strip().translate(TABLA_SIN_ACENTOS)
+
+
+class Clasificador:
+    """Clasifica los párrafos de un documento en orden, llevando el contexto."""
+
+    def __init__(self):
+        self.en_portada = True
+        self.en_indice = False
+        self.en_referencias = False
+        self.indice_general = False  # el índice actual lista capítulos
+        self.capitulos_indice: Set[str] = set()  # numerales de capítulo listados en el índice
+
+    @staticmethod
+    def _es_titulo_indice(texto: str, mayusculas: str, nivel: TipoParrafo, estilo_titulo: bool) -> bool:
+        if len(mayusculas) > MAX_TITULO_INDICE or not any(p in mayusculas for p in PALABRAS_INDICE):
+            return False
+        # "Índice de tablas ..... v" dentro de otro índice es una entrada
+        if PATRON_PAGINA.search(texto) is not None:
+            return False
+        # "Análisis de contenido" no abre un índice: debe ser un título o empezar por la palabra
+        return nivel is TipoParrafo.TITULO_1 or estilo_titulo or mayusculas.startswith(tuple(PALABRAS_INDICE))
+
+    def _es_entrada(self, texto: str, nivel: TipoParrafo, estilo: Optional[str], numero: Optional[str]) -> bool:
+        """
+        Dentro de un índice: True si el párrafo es una entrada, False si es el
+        primer título después del índice. Son entradas las líneas con número
+        de página y las líneas de capítulo de un índice general que aún no se
+        listaron; terminan el índice un título con estilo de título (no TOC),
+        un capítulo que se repite (el cuerpo vuelve a empezar) o fuera de un
+        índice general, y el título de una sección preliminar.
+        """
+        inicio = 0
+        if nivel is TipoParrafo.CAPITULO:
+            inicio = PATRON_ENCABEZADO.match(texto).end("capitulo")
+        if PATRON_PAGINA.search(texto, inicio) is not None:
+            if numero is not None:
+                self.capitulos_indice.add(numero)
+            return True
+        if _nivel_estilo(estilo) is not None and not estilo.lower().startswith("toc"):
+            return False
+        if nivel is TipoParrafo.CAPITULO:
+            if not self.indice_general or numero in self.capitulos_indice:
+                return False
+            self.capitulos_indice.add(numero)
+            return True
+        return not normalizar_texto(texto).startswith(SECCIONES_PRELIMINARES)
+
+    def siguiente(self, indice: int, texto: str, estilo: Optional[str]) -> Clasificacion:
+        """Clasificación del párrafo `indice` (texto sin espacios en los extremos)."""
+        nivel, nivel_estilo, numero = nivel_texto(texto, estilo)
+        estilo_titulo = nivel_estilo is not None
+
+        if not texto:
+            return Clasificacion(TipoParrafo.VACIO, nivel, estilo_titulo, numero)
+
+        mayusculas = texto.upper()
+        if self._es_titulo_indice(texto, mayusculas, nivel, estilo_titulo):
+            if not self.en_indice:
+                self.capitulos_indice = set()
+            self.en_portada = self.en_referencias = False
+            self.en_indice = True
+            normalizado = normalizar_texto(texto)
+            self.indice_general = not any(p in normalizado for p in PALABRAS_INDICE_SIN_CAPITULOS)
+            return Clasificacion(TipoParrafo.INDICE, nivel, estilo_titulo, numero)
+
+        if self.en_indice:
+            if self._es_entrada(texto, nivel, estilo, numero):
+                return Clasificacion(TipoParrafo.ENTRADA_INDICE, nivel, estilo_titulo, numero)
+            self.en_indice = False
+
+        if nivel is TipoParrafo.CAPITULO:
+            tipo = nivel
+            self.en_portada = self.en_referencias = False
+        elif (
+            self.en_portada
+            and indice < PARRAFOS_PORTADA
+            and any(elem in mayusculas for elem in ELEMENTOS_PORTADA)
+        ):
+            tipo = TipoParrafo.PORTADA
+        elif nivel is not TipoParrafo.CUERPO or estilo_titulo:
+            tipo = nivel if nivel is not TipoParrafo.CUERPO else nivel_estilo
+            normalizado = normalizar_texto(texto)
+            if any(p in normalizado for p in PALABRAS_REFERENCIAS):
+                self.en_referencias = True
+            elif any(p in normalizado for p in PALABRAS_ANEXOS):
+                self.en_referencias = False
+        elif self.en_referencias:
+            tipo = TipoParrafo.REFERENCIA
+        else:
+            tipo = TipoParrafo.CUERPO
+
+        return Clasificacion(tipo, nivel, estilo_titulo, numero)
+
+
+def clasificar_parrafos(parrafos: Iterable[Tuple[str, Optional[str]]]) -> List[Clasificacion]:
+    """Clasificación de cada (texto, nombre de estilo), en el orden del documento."""
+    clasificador = Clasificador()
+    return [
+        clasificador.siguiente(indice, texto, estilo)
+        for indice, (texto, estilo) in enumerate(parrafos)
+    ]
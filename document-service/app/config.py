@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -15,6 +16,82 @@ class Settings(BaseSettings):
     line_spacing: float = 2.0
     first_line_indent_cm: float = 1.25
 
+    # Secciones obligatorias (None = las de la guía) y otros nombres aceptados
+    # para cada una, p. ej. ESTRUCTURA_VARIANTES='{"REVISION DE LITERATURA": ["MARCO TEORICO"]}'
+    estructura_secciones: Optional[List[str]] = None
+    estructura_variantes: Dict[str, List[str]] = {}
+
+    # Reglas por escuela o facultad (validators/reglas.py): un <id>.json por
+    # conjunto en rules_dir, elegido con ?reglas=<id>; sin id se usa rules_default
+    rules_dir: Optional[str] = None
+    rules_default: str = "guia"
+    rules_reload_interval_s: float = 2.0  # cada cuánto se revisan los archivos
+
+    # Formateo: "directo" (fuente/interlineado/sangría en cada párrafo) o
+    # "estilos" (en los estilos, quitando el formato directo redundante)
+    format_mode: str = "directo"
+
+    # Motor de validación: "docx" (python-docx) o "xml" (lectura en streaming del XML)
+    validation_engine: str = "docx"
+    # Validar fuentes e interlineado también en tablas, controles de contenido,
+    # cuadros de texto, encabezados, pies de página y notas
+    validation_stories: bool = False
+
+    # Servidor de producción (python -m app.servidor): master pre-fork + workers uvicorn
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: Optional[int] = None  # None = según CPUs y memoria del contenedor
+    server_worker_memory_mb: int = 512  # memoria estimada por worker (con su pool)
+    server_max_requests: Optional[int] = 2000  # reciclar cada worker tras N peticiones
+    server_max_requests_jitter: int = 200  # para que no se reciclen todos a la vez
+    server_graceful_timeout_s: int = 30  # espera de peticiones en curso al detener un worker
+
+    # Pool de procesos para validación y formateo
+    pool_workers: Optional[int] = None  # None = número de CPUs, 0 = hilos en el mismo proceso
+    pool_max_tasks_per_child: Optional[int] = 50  # reciclar procesos para liberar memoria
+    pool_max_queue: int = 32  # tareas admitidas (en ejecución + en espera)
+    pool_retry_after_s: int = 5
+
+    # Ingesta de archivos subidos
+    upload_max_bytes: int = 100 * 1024 * 1024
+    upload_spool_bytes: int = 16 * 1024 * 1024  # por encima se vuelca a disco
+    upload_tmp_dir: Optional[str] = None
+
+    # Guardado de documentos formateados (ver app/guardado.py)
+    save_passthrough: bool = True  # copiar comprimidas las partes sin cambios (imágenes, ...)
+    save_deflate_level: int = 6  # 0-9; nivel de compresión de las partes que se escriben
+
+    # Caché de validaciones
+    cache_enabled: bool = True
+    cache_max_entries: int = 256  # nivel LRU en memoria
+    cache_ttl_s: int = 24 * 3600
+    redis_url: Optional[str] = None  # nivel compartido; "memory://" para pruebas
+
+    # Validación por lotes (/validar/lote)
+    batch_max_files: int = 500  # documentos por lote, contando los de cada .zip
+    batch_max_zip_bytes: int = 1024 * 1024 * 1024
+
+    # Trabajos asíncronos (/jobs)
+    jobs_backend: str = "memory"  # "memory" o "sqlite"
+    jobs_sqlite_path: str = "trabajos.db"
+    jobs_concurrency: Optional[int] = None  # None = número de workers del pool
+    jobs_ttl_s: int = 24 * 3600  # tiempo que se conservan los trabajos terminados
+    jobs_lease_s: int = 60  # un trabajo sin renovar en este tiempo vuelve a la cola
+    jobs_poll_s: float = 1.0  # cada cuánto revisan la cola los consumidores
+
+    # Revalidación incremental por tesis (/validar?tesis_id=...)
+    lineage_backend: str = "sqlite"  # "sqlite" o "archivos"
+    lineage_sqlite_path: str = "linajes.db"
+    lineage_dir: str = "linajes"
+    lineage_ttl_s: int = 30 * 24 * 3600  # se purgan los linajes sin validar en este tiempo
+    lineage_max_bytes: int = 8 * 1024 * 1024  # estados más grandes no se guardan
+
+    # Perfilado bajo demanda (?perfilar=...); desactivado si no hay token
+    profiling_token: Optional[str] = None
+    profiling_dir: Optional[str] = None  # None = <tmp>/tesis-perfiles
+    profiling_max_perfiles: int = 50
+    profiling_intervalo_ms: float = 1.0  # modo muestreo
+
     class Config:
         env_file = ".env"
 
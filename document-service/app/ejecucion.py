@@ -0,0 +1,230 @@
+"""
+Capa de ejecución para el trabajo pesado (carga, validación y formateo).
+
+Las tareas se envían a un pool de procesos para no bloquear el event loop de
+uvicorn: mientras un documento grande se procesa, el resto de peticiones
+(incluido /health) siguen atendiéndose. La cola es acotada; cuando se llena
+se rechazan nuevas tareas en lugar de acumular esperas indefinidas.
+"""
+import asyncio
+import functools
+import io
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from .config import Settings, get_settings
+from .etapas import ejecutar_medido
+from .metricas import get_metricas
+
+
+class ColaLlena(Exception):
+    """No hay espacio en la cola de tareas (el cliente debe reintentar)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("La cola de procesamiento está llena")
+        self.retry_after = retry_after
+
+
+class PoolNoDisponible(Exception):
+    """El pool de procesos no está disponible (detenido o roto)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("El pool de procesamiento no está disponible")
+        self.retry_after = retry_after
+
+
+def cpus_disponibles() -> int:
+    """CPUs utilizables: afinidad del proceso, acotada por la cuota del cgroup (contenedor)."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    cuota = _cuota_cgroup()
+    if cuota is not None:
+        cpus = min(cpus, max(1, int(cuota)))
+    return cpus
+
+
+def _cuota_cgroup() -> Optional[float]:
+    try:
+        # cgroup v2: "<cuota> <periodo>" o "max <periodo>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        return None if cuota == "max" else int(cuota) / int(periodo)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            cuota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            periodo = int(f.read())
+        return cuota / periodo if cuota > 0 and periodo > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def _numero_workers(configurado: Optional[int]) -> int:
+    if configurado is not None:
+        return max(configurado, 0)
+    return cpus_disponibles()
+
+
+def precalentar() -> None:
+    """
+    Valida y formatea un documento mínimo para dejar compilado el estado
+    compartido (lo usan el master de app.servidor y el forkserver, ver precarga.py).
+    """
+    from docx import Document
+
+    from .formatters import formatear_documento
+    from .paquete import abrir_para_validar
+    from .validators import construir_snapshot_xml, validar_documento_completo, validar_snapshot
+
+    doc = Document()
+    doc.add_paragraph("UNIVERSIDAD NACIONAL DEL ALTIPLANO")
+    doc.add_paragraph("RESUMEN", style="Heading 1")
+    doc.add_paragraph("CAPÍTULO I INTRODUCCIÓN", style="Heading 1")
+    doc.add_paragraph("1.1. Planteamiento del problema")
+    doc.add_paragraph("Texto del cuerpo de la tesis.")
+    doc.add_paragraph("REFERENCIAS BIBLIOGRÁFICAS", style="Heading 1")
+    salida = io.BytesIO()
+    doc.save(salida)
+    contenido = salida.getvalue()
+
+    validar_documento_completo(abrir_para_validar(contenido)[0])
+    validar_snapshot(construir_snapshot_xml(contenido))
+    formatear_documento(Document(io.BytesIO(contenido)), io.BytesIO(), None, contenido)
+
+
+def _contexto_multiproceso():
+    # forkserver precarga docx/lxml y precalienta una sola vez (precarga.py) y
+    # los hijos lo heredan; fork no es compatible con max_tasks_per_child.
+    if sys.platform.startswith("linux"):
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["app.precarga"])
+        return ctx
+    return multiprocessing.get_context("spawn")
+
+
+class EjecutorDocumentos:
+    """
+    Pool de procesos con cola acotada.
+
+    - workers: número de procesos (0 ejecuta en hilos del mismo proceso)
+    - max_tasks_per_child: tareas por proceso antes de reciclarlo
+    - max_queue: tareas admitidas a la vez (en ejecución + en espera)
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_tasks_per_child: Optional[int] = None,
+        max_queue: int = 32,
+        retry_after: int = 5,
+    ):
+        self.workers = workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool: Optional[Executor] = None
+        self._pendientes = 0
+
+    @classmethod
+    def desde_settings(cls, settings: Settings) -> "EjecutorDocumentos":
+        return cls(
+            workers=_numero_workers(settings.pool_workers),
+            max_tasks_per_child=settings.pool_max_tasks_per_child,
+            max_queue=settings.pool_max_queue,
+            retry_after=settings.pool_retry_after_s,
+        )
+
+    @property
+    def pendientes(self) -> int:
+        """Tareas admitidas que aún no terminan."""
+        return self._pendientes
+
+    @property
+    def activo(self) -> bool:
+        return self._pool is not None
+
+    def iniciar(self) -> None:
+        if self._pool is not None:
+            return
+        if self.workers == 0:
+            self._pool = ThreadPoolExecutor(thread_name_prefix="documentos")
+            return
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=_contexto_multiproceso(),
+            max_tasks_per_child=self.max_tasks_per_child or None,
+        )
+
+    def detener(self) -> None:
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    async def ejecutar(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Ejecuta fn(*args) en el pool y espera su resultado sin bloquear el loop.
+
+        Lanza ColaLlena si ya hay max_queue tareas admitidas y
+        PoolNoDisponible si el pool está detenido o un proceso murió.
+        """
+        if self._pool is None:
+            raise PoolNoDisponible(self.retry_after)
+        if self._pendientes >= self.max_queue:
+            raise ColaLlena(self.retry_after)
+
+        pool = self._pool
+        metricas = get_metricas()
+        tarea = getattr(fn, "__name__", "tarea")
+        self._pendientes += 1
+        inicio = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            resultado, medicion = await loop.run_in_executor(
+                pool, functools.partial(ejecutar_medido, fn, *args)
+            )
+        except BrokenProcessPool:
+            # Un proceso murió (p. ej. OOM): recrear el pool para las siguientes
+            # tareas, solo una vez aunque fallen varias a la vez
+            metricas.registrar_fallo(tarea, "pool_roto")
+            if self._pool is pool:
+                self._pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.iniciar()
+            raise PoolNoDisponible(self.retry_after)
+        except BaseException as e:
+            cancelada = isinstance(e, asyncio.CancelledError)
+            metricas.registrar_fallo(tarea, "cancelada" if cancelada else "error")
+            raise
+        finally:
+            self._pendientes -= 1
+
+        metricas.registrar_tarea(tarea, time.perf_counter() - inicio, medicion)
+        return resultado
+
+
+_ejecutor: Optional[EjecutorDocumentos] = None
+
+
+def get_ejecutor() -> EjecutorDocumentos:
+    """Retorna el ejecutor del proceso, creándolo si aún no existe."""
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = EjecutorDocumentos.desde_settings(get_settings())
+    _ejecutor.iniciar()
+    return _ejecutor
+
+
+def detener_ejecutor() -> None:
+    global _ejecutor
+    if _ejecutor is not None:
+        _ejecutor.detener()
+        _ejecutor = None
@@ -0,0 +1,106 @@
+"""
+Medición del tiempo de cada etapa del procesamiento de un documento.
+
+Además del Cronometro explícito (usado por los trabajos asíncronos), las
+funciones del pipeline marcan sus etapas con `etapa("nombre")`. Esas marcas
+no cuestan nada salvo que haya una medición activa, que la abre
+`ejecutar_medido` al correr cada tarea del pool y devuelve junto con el
+resultado para publicarla en /metrics.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional, Tuple
+
+
+class Cronometro:
+    """Acumula segundos por etapa: `with cron.etapa("carga"): ...`"""
+
+    def __init__(self):
+        self.etapas: Dict[str, float] = {}
+        self.valores: Dict[str, float] = {}
+
+    @contextmanager
+    def etapa(self, nombre: str) -> Iterator[None]:
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nombre] = (
+                self.etapas.get(nombre, 0.0) + time.perf_counter() - inicio
+            )
+
+    def registrar(self, nombre: str, valor: float) -> None:
+        """Acumula un valor que no es un tiempo (párrafos, runs, ...)."""
+        self.valores[nombre] = self.valores.get(nombre, 0.0) + valor
+
+
+# Medición de la tarea en curso; una por hilo/proceso del pool
+_activo: ContextVar[Optional[Cronometro]] = ContextVar("cronometro_activo", default=None)
+
+
+@contextmanager
+def etapa(nombre: str) -> Iterator[None]:
+    """Mide el bloque en la medición activa, si la hay."""
+    cron = _activo.get()
+    if cron is None:
+        yield
+        return
+    with cron.etapa(nombre):
+        yield
+
+
+def registrar(nombre: str, valor: float) -> None:
+    """Acumula un valor en la medición activa, si la hay."""
+    cron = _activo.get()
+    if cron is not None:
+        cron.registrar(nombre, valor)
+
+
+class Medicion(NamedTuple):
+    etapas: Dict[str, float]
+    valores: Dict[str, float]
+    pico_memoria_bytes: Optional[int]
+
+
+def _reiniciar_pico_memoria() -> None:
+    # Linux: escribir "5" en clear_refs reinicia VmHWM del proceso
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _pico_memoria_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for linea in f:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+
+        # ru_maxrss: pico de toda la vida del proceso (KB en Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+
+def ejecutar_medido(fn: Callable[..., Any], *args: Any) -> Tuple[Any, Medicion]:
+    """
+    Ejecuta fn(*args) con una medición activa y retorna (resultado, medición).
+
+    Se ejecuta dentro del pool; debe ser de nivel de módulo para poder
+    enviarse a otro proceso.
+    """
+    cron = Cronometro()
+    token = _activo.set(cron)
+    _reiniciar_pico_memoria()
+    try:
+        resultado = fn(*args)
+    finally:
+        _activo.reset(token)
+    return resultado, Medicion(cron.etapas, cron.valores, _pico_memoria_bytes())
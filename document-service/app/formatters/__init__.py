@@ -1,46 +1,60 @@
-from .estilos import aplicar_estilos_base
-from .portada import generar_portada
-from .capitulos import formatear_capitulos
-from .indices import generar_indices
+from .estilos import aplicar_estilos_base, PasoEstilosBase
+from .portada import generar_portada, PasoPortada
+from .capitulos import formatear_capitulos, PasoCapitulos
+from .indices import generar_indices, PasoIndices
+from .pipeline import ParrafoFormato, PasoFormato, ejecutar_pasos
 from ..models import FormateoResultado
+from ..etapas import etapa
+from ..guardado import Origen, guardar_paquete
 from docx import Document
-from typing import Dict, Optional
+from typing import IO, Dict, Optional, Union
 
 
 def formatear_documento(
     doc: Document,
-    output_path: str,
-    datos: Optional[Dict] = None
+    output_path: Optional[Union[str, IO[bytes]]],
+    datos: Optional[Dict] = None,
+    origen: Optional[Origen] = None,
 ) -> FormateoResultado:
     """
     Aplica el formateo completo al documento según la Guía UNAP 2.0.
+
+    output_path puede ser una ruta o un stream binario (p. ej. BytesIO);
+    en ese caso archivo_formateado queda en None. Con None el documento se
+    formatea en memoria y queda a cargo de quien llama guardarlo.
+
+    `origen` es el .docx del que se cargó `doc` (bytes o ruta): al guardar,
+    las partes que no cambiaron (imágenes, ...) se copian de él sin
+    recomprimir (ver app/guardado.py).
+
+    Todos los pasos se aplican en un solo recorrido de los párrafos (ver
+    pipeline.py), en el mismo orden que si se ejecutaran uno tras otro.
     """
     cambios_realizados = []
 
     try:
-        # 1. Aplicar estilos base (márgenes, fuente, interlineado)
-        cambios_estilos = aplicar_estilos_base(doc)
-        cambios_realizados.extend(cambios_estilos)
-
-        # 2. Formatear capítulos y títulos
-        cambios_capitulos = formatear_capitulos(doc)
-        cambios_realizados.extend(cambios_capitulos)
-
+        pasos = [
+            # 1. Aplicar estilos base (márgenes, fuente, interlineado)
+            PasoEstilosBase(),
+            # 2. Formatear capítulos y títulos
+            PasoCapitulos(),
+        ]
         # 3. Generar portada si hay datos
         if datos:
-            cambios_portada = generar_portada(doc, datos)
-            cambios_realizados.extend(cambios_portada)
-
+            pasos.append(PasoPortada(datos))
         # 4. Actualizar índices si existen
-        cambios_indices = generar_indices(doc)
-        cambios_realizados.extend(cambios_indices)
+        pasos.append(PasoIndices())
+
+        cambios_realizados.extend(ejecutar_pasos(doc, pasos))
 
         # Guardar documento
-        doc.save(output_path)
+        if output_path is not None:
+            with etapa("guardado"):
+                guardar_paquete(doc, output_path, origen)
 
         return FormateoResultado(
             exito=True,
-            archivo_formateado=output_path,
+            archivo_formateado=output_path if isinstance(output_path, str) else None,
             mensaje="Documento formateado exitosamente",
             cambios_realizados=cambios_realizados,
         )
@@ -59,4 +73,11 @@ __all__ = [
     "generar_portada",
     "formatear_capitulos",
     "generar_indices",
+    "ejecutar_pasos",
+    "ParrafoFormato",
+    "PasoFormato",
+    "PasoEstilosBase",
+    "PasoCapitulos",
+    "PasoPortada",
+    "PasoIndices",
 ]
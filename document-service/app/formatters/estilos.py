@@ -2,11 +2,40 @@ from docx import Document
 from docx.shared import Pt, Cm, Twips
 from docx.enum.text import WD_LINE_SPACING, WD_ALIGN_PARAGRAPH
 from docx.enum.style import WD_STYLE_TYPE
-from typing import List
+from typing import List, Optional
 from ..config import get_settings
+from .pipeline import ParrafoFormato, ejecutar_pasos
+from ..validators.estilos import (
+    ResolutorEstilos,
+    W_IND,
+    W_PPR,
+    W_RFONTS,
+    W_RPR,
+    W_SPACING,
+    W_SZ,
+    A_FIRST_LINE,
+    A_HANGING,
+    A_LINE,
+    A_LINE_RULE,
+)
 
+# "directo": formato en cada párrafo y run (comportamiento original)
+# "estilos": las reglas van en los estilos y solo queda el formato directo
+#            que cambia el valor heredado
+MODO_DIRECTO = "directo"
+MODO_ESTILOS = "estilos"
 
-def aplicar_estilos_base(doc: Document) -> List[str]:
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_PSTYLE = _W + "pStyle"
+A_VAL = _W + "val"
+# Atributos de w:rFonts que fija run.font.name, más los de tema que lo anulan
+_ATRIBUTOS_FUENTE = tuple(
+    _W + nombre for nombre in ("ascii", "hAnsi", "asciiTheme", "hAnsiTheme")
+)
+_ATRIBUTOS_TEMA = (_W + "asciiTheme", _W + "hAnsiTheme")
+
+
+def aplicar_estilos_base(doc: Document, modo: Optional[str] = None) -> List[str]:
     """
     Aplica los estilos base al documento según la Guía UNAP 2.0:
     - Márgenes
@@ -14,84 +43,127 @@ def aplicar_estilos_base(doc: Document) -> List[str]:
     - Fuente y tamaño
     - Interlineado
     - Sangría
+
+    `modo` (por defecto settings.format_mode) decide si la fuente, el
+    interlineado y la sangría se escriben en cada párrafo ("directo") o se
+    dejan en los estilos ("estilos").
     """
-    settings = get_settings()
-    cambios = []
-
-    # Aplicar márgenes a todas las secciones
-    for section in doc.sections:
-        section.page_width = Cm(settings.page_width_cm)
-        section.page_height = Cm(settings.page_height_cm)
-        section.top_margin = Cm(settings.margin_top_cm)
-        section.bottom_margin = Cm(settings.margin_bottom_cm)
-        section.left_margin = Cm(settings.margin_left_cm)
-        section.right_margin = Cm(settings.margin_right_cm)
-
-    cambios.append(f"Márgenes aplicados: {settings.margin_top_cm}/{settings.margin_bottom_cm}/{settings.margin_left_cm}/{settings.margin_right_cm} cm")
-    cambios.append(f"Tamaño de página: A4 ({settings.page_width_cm}x{settings.page_height_cm} cm)")
-
-    # Configurar estilo Normal
-    try:
-        style_normal = doc.styles['Normal']
-        style_normal.font.name = settings.font_name
-        style_normal.font.size = Pt(settings.font_size_pt)
-        style_normal.paragraph_format.line_spacing = settings.line_spacing
-        style_normal.paragraph_format.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
-        style_normal.paragraph_format.first_line_indent = Cm(settings.first_line_indent_cm)
-        style_normal.paragraph_format.space_after = Pt(0)
-        style_normal.paragraph_format.space_before = Pt(0)
-
-        cambios.append(f"Estilo Normal configurado: {settings.font_name} {settings.font_size_pt}pt")
-    except KeyError:
-        pass
-
-    # Configurar estilos de título
-    titulo_configs = [
-        ('Heading 1', 16, True),
-        ('Heading 2', 14, True),
-        ('Heading 3', 12, True),
-        ('Heading 4', 12, False),
-    ]
-
-    for style_name, size, bold in titulo_configs:
+    return ejecutar_pasos(doc, [PasoEstilosBase(modo)])
+
+
+class PasoEstilosBase:
+    """aplicar_estilos_base como paso de la pasada única (ver pipeline.py)."""
+
+    nombre = "aplicar_estilos_base"
+
+    def __init__(self, modo: Optional[str] = None):
+        self.settings = get_settings()
+        self.modo = modo or self.settings.format_mode
+        self._cambios: List[str] = []
+        self._estilos: Optional[ResolutorEstilos] = None
+        self._parrafos = 0
+        self._eliminadas = 0
+        self._mantenidas = 0
+
+    def preparar(self, doc: Document) -> None:
+        settings = self.settings
+        cambios = self._cambios
+
+        # Aplicar márgenes a todas las secciones
+        for section in doc.sections:
+            section.page_width = Cm(settings.page_width_cm)
+            section.page_height = Cm(settings.page_height_cm)
+            section.top_margin = Cm(settings.margin_top_cm)
+            section.bottom_margin = Cm(settings.margin_bottom_cm)
+            section.left_margin = Cm(settings.margin_left_cm)
+            section.right_margin = Cm(settings.margin_right_cm)
+
+        cambios.append(f"Márgenes aplicados: {settings.margin_top_cm}/{settings.margin_bottom_cm}/{settings.margin_left_cm}/{settings.margin_right_cm} cm")
+        cambios.append(f"Tamaño de página: A4 ({settings.page_width_cm}x{settings.page_height_cm} cm)")
+
+        # Configurar estilo Normal
         try:
-            style = doc.styles[style_name]
-            style.font.name = settings.font_name
-            style.font.size = Pt(size)
-            style.font.bold = bold
-            style.paragraph_format.line_spacing = settings.line_spacing
-            style.paragraph_format.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
-            style.paragraph_format.first_line_indent = Cm(0)
-            style.paragraph_format.space_before = Pt(12)
-            style.paragraph_format.space_after = Pt(6)
+            style_normal = doc.styles['Normal']
+            style_normal.font.name = settings.font_name
+            style_normal.font.size = Pt(settings.font_size_pt)
+            style_normal.paragraph_format.line_spacing = settings.line_spacing
+            style_normal.paragraph_format.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
+            style_normal.paragraph_format.first_line_indent = Cm(settings.first_line_indent_cm)
+            style_normal.paragraph_format.space_after = Pt(0)
+            style_normal.paragraph_format.space_before = Pt(0)
+            if self.modo == MODO_ESTILOS:
+                _quitar_fuente_tema(style_normal)
+
+            cambios.append(f"Estilo Normal configurado: {settings.font_name} {settings.font_size_pt}pt")
         except KeyError:
             pass
 
-    cambios.append("Estilos de títulos configurados")
+        # Configurar estilos de título
+        titulo_configs = [
+            ('Heading 1', 16, True),
+            ('Heading 2', 14, True),
+            ('Heading 3', 12, True),
+            ('Heading 4', 12, False),
+        ]
+
+        for style_name, size, bold in titulo_configs:
+            try:
+                style = doc.styles[style_name]
+                style.font.name = settings.font_name
+                style.font.size = Pt(size)
+                style.font.bold = bold
+                style.paragraph_format.line_spacing = settings.line_spacing
+                style.paragraph_format.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
+                style.paragraph_format.first_line_indent = Cm(0)
+                style.paragraph_format.space_before = Pt(12)
+                style.paragraph_format.space_after = Pt(6)
+                if self.modo == MODO_ESTILOS:
+                    _quitar_fuente_tema(style)
+            except KeyError:
+                pass
+
+        cambios.append("Estilos de títulos configurados")
 
-    # Aplicar formato a todos los párrafos
-    parrafos_modificados = 0
-    for para in doc.paragraphs:
-        # Verificar si es un párrafo de texto normal (no título)
-        es_titulo = False
-        if para.style and para.style.name:
-            style_name = para.style.name.lower()
-            if 'heading' in style_name or 'titulo' in style_name or 'title' in style_name:
-                es_titulo = True
+        if self.modo == MODO_ESTILOS:
+            # Los estilos ya están configurados; el resolutor se arma después
+            self._estilos = ResolutorEstilos.desde_documento(doc)
+
+    def parrafo(self, p: ParrafoFormato) -> None:
+        self._parrafos += 1
+        if self._estilos is not None:
+            self._parrafo_por_estilos(p)
+        else:
+            self._parrafo_directo(p)
+
+    def cambios(self) -> List[str]:
+        settings = self.settings
+        if self._estilos is not None:
+            resumen = [
+                f"Formato por estilos aplicado a {self._parrafos} párrafos",
+                f"Formato directo redundante eliminado: {self._eliminadas} propiedades "
+                f"({self._mantenidas} necesarias conservadas)",
+            ]
+        else:
+            resumen = [f"Formato aplicado a {self._parrafos} párrafos"]
+        return self._cambios + resumen + [
+            f"Interlineado: {settings.line_spacing}",
+            f"Sangría primera línea: {settings.first_line_indent_cm} cm",
+        ]
 
-        # Verificar si el texto está en mayúsculas (probable título)
-        texto = para.text.strip()
-        if texto and texto.isupper() and len(texto) < 100:
-            es_titulo = True
+    def _parrafo_directo(self, p: ParrafoFormato) -> None:
+        """Fuente, interlineado y sangría escritos en cada párrafo y run."""
+        settings = self.settings
+        texto = p.texto
+        es_titulo = _es_titulo(p)
 
         # Aplicar formato
-        for run in para.runs:
+        for run in p.runs:
             run.font.name = settings.font_name
             if not es_titulo:
                 run.font.size = Pt(settings.font_size_pt)
 
         # Configurar párrafo
-        pf = para.paragraph_format
+        pf = p.para.paragraph_format
         pf.line_spacing = settings.line_spacing
         pf.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
 
@@ -100,10 +172,94 @@ def aplicar_estilos_base(doc: Document) -> List[str]:
         else:
             pf.first_line_indent = Cm(0)
 
-        parrafos_modificados += 1
+    def _parrafo_por_estilos(self, p: ParrafoFormato) -> None:
+        """
+        Deja la fuente, el interlineado y la sangría a cargo de los estilos.
+
+        Se quita el formato directo de esas propiedades y se vuelve a
+        escribir solo donde el valor que resulta de la cadena de estilos no
+        es el que pide la guía. El documento se ve igual que con el modo
+        directo, pero el XML es mucho más chico.
+        """
+        settings = self.settings
+        estilos = self._estilos
+        texto = p.texto
+        es_titulo = _es_titulo(p)
+        para = p.para
+        p_xml = para._p
+        pPr = p_xml.find(W_PPR)
+        pStyle = pPr.find(W_PSTYLE) if pPr is not None else None
+        style_id = pStyle.get(A_VAL) if pStyle is not None else None
+
+        for run in p.runs:
+            r = run._r
+            rPr = r.find(W_RPR)
+            if _quitar_atributos(rPr, W_RFONTS, _ATRIBUTOS_FUENTE):
+                self._eliminadas += 1
+            if not es_titulo and _quitar_atributos(rPr, W_SZ, (A_VAL,)):
+                # w:sz solo tiene w:val; quitarlo elimina el elemento
+                self._eliminadas += 1
+            _quitar_si_vacio(r, rPr)
+
+            heredado = estilos.run(style_id, r.find(W_RPR))
+            if heredado.fuente != settings.font_name:
+                run.font.name = settings.font_name
+                self._mantenidas += 1
+            if not es_titulo and heredado.tamano_pt != settings.font_size_pt:
+                run.font.size = Pt(settings.font_size_pt)
+                self._mantenidas += 1
+
+        if _quitar_atributos(pPr, W_SPACING, (A_LINE, A_LINE_RULE)):
+            self._eliminadas += 1
+        if _quitar_atributos(pPr, W_IND, (A_FIRST_LINE, A_HANGING)):
+            self._eliminadas += 1
+
+        heredado = estilos.parrafo(style_id, p_xml.find(W_PPR))
+        pf = para.paragraph_format
+        if (
+            heredado.regla_interlineado != WD_LINE_SPACING.MULTIPLE
+            or heredado.interlineado is None
+            or abs(heredado.interlineado - settings.line_spacing) > 0.01
+        ):
+            pf.line_spacing = settings.line_spacing
+            pf.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
+            self._mantenidas += 1
+
+        sangria = settings.first_line_indent_cm if not es_titulo and texto else 0.0
+        if abs((heredado.sangria_cm or 0.0) - sangria) > 0.01:
+            pf.first_line_indent = Cm(sangria)
+            self._mantenidas += 1
+        _quitar_si_vacio(p_xml, p_xml.find(W_PPR))
+
+
+def _es_titulo(p: ParrafoFormato) -> bool:
+    # Título por estilo, mayúsculas, capítulo o numeración (app/clasificacion.py)
+    return p.clase.es_titulo
+
+
+def _quitar_fuente_tema(style) -> None:
+    """
+    python-docx fija w:ascii/w:hAnsi pero deja w:asciiTheme, que tiene
+    prioridad: sin quitarlo el estilo seguiría mostrando la fuente del tema.
+    """
+    rPr = style.element.find(W_RPR)
+    rFonts = rPr.find(W_RFONTS) if rPr is not None else None
+    if rFonts is not None:
+        for atributo in _ATRIBUTOS_TEMA:
+            rFonts.attrib.pop(atributo, None)
+
+
+def _quitar_atributos(padre, tag: str, atributos) -> bool:
+    """Quita `atributos` del hijo `tag` de `padre` (y el hijo si queda vacío)."""
+    elemento = padre.find(tag) if padre is not None else None
+    if elemento is None:
+        return False
+    quitados = [a for a in atributos if elemento.attrib.pop(a, None) is not None]
+    if not elemento.attrib and len(elemento) == 0:
+        padre.remove(elemento)
+    return bool(quitados)
 
-    cambios.append(f"Formato aplicado a {parrafos_modificados} párrafos")
-    cambios.append(f"Interlineado: {settings.line_spacing}")
-    cambios.append(f"Sangría primera línea: {settings.first_line_indent_cm} cm")
 
-    return cambios
+def _quitar_si_vacio(padre, elemento) -> None:
+    if elemento is not None and len(elemento) == 0 and not elemento.attrib:
+        padre.remove(elemento)
@@ -2,7 +2,9 @@ from docx import Document
 from docx.shared import Pt, Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from typing import List
+from ..clasificacion import TipoParrafo
 from ..config import get_settings
+from .pipeline import ParrafoFormato, ejecutar_pasos
 
 
 def generar_indices(doc: Document) -> List[str]:
@@ -15,35 +17,29 @@ def generar_indices(doc: Document) -> List[str]:
     - Índice de figuras
     - Lista de acrónimos
     """
-    settings = get_settings()
-    cambios = []
-
-    # Palabras clave para detectar secciones de índice
-    palabras_indice = [
-        "INDICE",
-        "ÍNDICE",
-        "CONTENIDO",
-        "TABLA DE CONTENIDO",
-        "LISTA DE TABLAS",
-        "LISTA DE FIGURAS",
-        "LISTA DE CUADROS",
-        "LISTA DE GRAFICOS",
-        "LISTA DE ANEXOS",
-        "ACRÓNIMOS",
-        "ACRONIMOS",
-        "ABREVIATURAS",
-    ]
-
-    indices_encontrados = []
-    en_seccion_indice = False
-
-    for para in doc.paragraphs:
-        texto = para.text.strip().upper()
+    return ejecutar_pasos(doc, [PasoIndices()])
+
+
+class PasoIndices:
+    """generar_indices como paso de la pasada única (ver pipeline.py)."""
+
+    nombre = "generar_indices"
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.indices_encontrados: List[str] = []
+
+    def preparar(self, doc: Document) -> None:
+        pass
+
+    def parrafo(self, p: ParrafoFormato) -> None:
+        settings = self.settings
+        para = p.para
+        tipo = p.clase.tipo
 
         # Detectar inicio de sección de índice
-        if any(palabra in texto for palabra in palabras_indice) and len(texto) < 50:
-            en_seccion_indice = True
-            indices_encontrados.append(texto)
+        if tipo is TipoParrafo.INDICE:
+            self.indices_encontrados.append(p.mayusculas)
 
             # Formatear título del índice
             para.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -51,34 +47,29 @@ def generar_indices(doc: Document) -> List[str]:
             para.paragraph_format.space_before = Pt(18)
             para.paragraph_format.space_after = Pt(12)
 
-            for run in para.runs:
+            for run in p.runs:
                 run.font.name = settings.font_name
                 run.font.size = Pt(14)
                 run.font.bold = True
 
-            continue
+            return
 
-        # Si estamos en sección de índice, formatear entradas
-        if en_seccion_indice and texto:
+        # Si estamos en sección de índice (hasta el siguiente capítulo), formatear entradas
+        if tipo is TipoParrafo.ENTRADA_INDICE:
+            texto = p.mayusculas
             # Las entradas del índice no tienen sangría
             para.paragraph_format.first_line_indent = Cm(0)
 
             # Detectar si es una entrada de índice (contiene números de página)
-            tiene_numero = any(c.isdigit() for c in texto[-10:]) if texto else False
+            tiene_numero = any(c.isdigit() for c in texto[-10:])
 
             if tiene_numero:
                 # Es una entrada de índice
-                for run in para.runs:
+                for run in p.runs:
                     run.font.name = settings.font_name
                     run.font.size = Pt(12)
 
-            # Detectar fin de sección de índice
-            if texto.startswith("CAPITULO") or texto.startswith("CAPÍTULO"):
-                en_seccion_indice = False
-
-    if indices_encontrados:
-        cambios.append(f"Índices formateados: {', '.join(indices_encontrados[:3])}")
-    else:
-        cambios.append("No se encontraron secciones de índice")
-
-    return cambios
+    def cambios(self) -> List[str]:
+        if self.indices_encontrados:
+            return [f"Índices formateados: {', '.join(self.indices_encontrados[:3])}"]
+        return ["No se encontraron secciones de índice"]
@@ -0,0 +1,75 @@
+"""
+Recorrido único del documento para todos los formateadores.
+
+Cada formateador es un paso con tres partes: `preparar` (lo que es del
+documento entero: secciones, estilos), `parrafo` (lo que aplica a cada
+párrafo) y `cambios` (el resumen para cambios_realizados). `ejecutar_pasos`
+clasifica cada párrafo una sola vez (texto, runs, estilo y su etiqueta de
+app/clasificacion.py, la misma que usan los validadores) y se lo pasa a
+todos los pasos en orden, en lugar de que cada uno recorra y vuelva a
+armar `doc.paragraphs`.
+
+El resultado es el mismo que ejecutar los pasos uno detrás de otro: cada
+paso decide solo a partir del texto y el estilo del párrafo, que ningún
+paso modifica, y solo toca el párrafo que recibe.
+"""
+from functools import cached_property
+from typing import List, Protocol, Sequence
+
+from docx import Document
+from docx.text.paragraph import Paragraph
+
+from ..clasificacion import Clasificacion, Clasificador
+from ..etapas import etapa
+
+
+class ParrafoFormato:
+    """Un párrafo y lo que los pasos consultan de él, calculado una sola vez."""
+
+    def __init__(self, indice: int, para: Paragraph, clasificador: Clasificador):
+        self.indice = indice
+        self.para = para
+        self.texto = para.text.strip()
+        style = para.style
+        self.estilo = style.name if style is not None else None
+        self.clase: Clasificacion = clasificador.siguiente(indice, self.texto, self.estilo)
+
+    @cached_property
+    def mayusculas(self) -> str:
+        return self.texto.upper()
+
+    @cached_property
+    def runs(self) -> list:
+        return self.para.runs
+
+
+
+class PasoFormato(Protocol):
+    """Un formateador dentro de la pasada única."""
+
+    nombre: str
+
+    def preparar(self, doc: Document) -> None: ...
+
+    def parrafo(self, p: ParrafoFormato) -> None: ...
+
+    def cambios(self) -> List[str]: ...
+
+
+def ejecutar_pasos(doc: Document, pasos: Sequence[PasoFormato]) -> List[str]:
+    """Prepara cada paso, recorre los párrafos una vez y junta los cambios en orden."""
+    for paso in pasos:
+        with etapa(paso.nombre):
+            paso.preparar(doc)
+
+    clasificador = Clasificador()
+    with etapa("recorrido_parrafos"):
+        for indice, para in enumerate(doc.paragraphs):
+            p = ParrafoFormato(indice, para, clasificador)
+            for paso in pasos:
+                paso.parrafo(p)
+
+    cambios: List[str] = []
+    for paso in pasos:
+        cambios.extend(paso.cambios())
+    return cambios
@@ -2,7 +2,13 @@ from docx import Document
 from docx.shared import Pt, Cm
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from typing import List, Dict
+from ..clasificacion import TipoParrafo
 from ..config import get_settings
+from .pipeline import ParrafoFormato, ejecutar_pasos
+
+
+# Párrafos del inicio en los que se busca la portada
+PARRAFOS_BUSQUEDA_PORTADA = 20
 
 
 def generar_portada(doc: Document, datos: Dict) -> List[str]:
@@ -17,53 +23,40 @@ def generar_portada(doc: Document, datos: Dict) -> List[str]:
     - facultad: Facultad
     - fecha: Fecha de sustentación
     """
-    settings = get_settings()
-    cambios = []
+    return ejecutar_pasos(doc, [PasoPortada(datos)])
+
+
+class PasoPortada:
+    """generar_portada como paso de la pasada única (ver pipeline.py)."""
 
-    # Buscar si ya existe una portada (primera página con universidad)
-    portada_encontrada = False
-    for i, para in enumerate(doc.paragraphs[:20]):  # Buscar en los primeros 20 párrafos
-        texto = para.text.strip().upper()
-        if "UNIVERSIDAD" in texto or "NACIONAL" in texto or "ALTIPLANO" in texto:
-            portada_encontrada = True
-            break
+    nombre = "generar_portada"
 
-    if portada_encontrada:
-        # Actualizar datos en la portada existente
-        if "titulo" in datos:
-            for para in doc.paragraphs[:30]:
-                # Buscar párrafos que podrían ser el título
-                texto = para.text.strip()
-                if len(texto) > 20 and len(texto) < 300:
-                    # Podría ser el título si está en la primera parte
-                    for run in para.runs:
-                        if run.font.bold or (run.font.size and run.font.size >= Pt(14)):
-                            # Este podría ser el título
-                            pass
-            cambios.append("Portada existente encontrada")
-    else:
-        cambios.append("No se encontró portada - se recomienda agregar manualmente")
+    def __init__(self, datos: Dict):
+        self.settings = get_settings()
+        self.datos = datos
+        self.portada_encontrada = False
 
-    # Aplicar formato a elementos de portada si existen
-    elementos_portada = [
-        "UNIVERSIDAD NACIONAL DEL ALTIPLANO",
-        "FACULTAD",
-        "ESCUELA PROFESIONAL",
-        "TESIS",
-        "PRESENTADA POR",
-        "PARA OPTAR",
-        "PUNO",
-    ]
+    def preparar(self, doc: Document) -> None:
+        pass
 
-    for para in doc.paragraphs[:40]:
-        texto = para.text.strip().upper()
-        es_elemento_portada = any(elem in texto for elem in elementos_portada)
+    def parrafo(self, p: ParrafoFormato) -> None:
+        # Elementos de portada: antes del primer índice o capítulo (app/clasificacion.py)
+        if p.clase.tipo is TipoParrafo.PORTADA:
+            # Buscar si ya existe una portada (primera página con universidad)
+            if p.indice < PARRAFOS_BUSQUEDA_PORTADA:
+                self.portada_encontrada = True
 
-        if es_elemento_portada:
+            para = p.para
             para.alignment = WD_ALIGN_PARAGRAPH.CENTER
             para.paragraph_format.first_line_indent = Cm(0)
 
-            for run in para.runs:
-                run.font.name = settings.font_name
+            for run in p.runs:
+                run.font.name = self.settings.font_name
 
-    return cambios
+    def cambios(self) -> List[str]:
+        if not self.portada_encontrada:
+            return ["No se encontró portada - se recomienda agregar manualmente"]
+        # La portada existente aún no se reescribe con los datos enviados
+        if "titulo" in self.datos:
+            return ["Portada existente encontrada"]
+        return []
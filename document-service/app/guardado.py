@@ -0,0 +1,235 @@
+"""
+Guardado del paquete .docx copiando tal cual las partes que no cambiaron.
+
+`doc.save()` vuelve a comprimir cada parte del paquete, también las decenas
+de MB de imágenes de `word/media` que los formateadores nunca tocan. Aquí se
+escribe el mismo paquete que `doc.save()` (mismas partes, relaciones y
+[Content_Types].xml, en el mismo orden), pero cada parte cuyo contenido es
+idéntico al de la entrada del zip original (mismo tamaño y CRC-32) se copia
+con sus bytes ya comprimidos, sin descomprimirla ni volver a comprimirla.
+Solo las partes XML que python-docx vuelve a serializar (document.xml,
+estilos, ...) y las nuevas se comprimen, con el nivel settings.save_deflate_level.
+
+El zip se escribe secuencialmente (cabecera local, datos, directorio
+central al final), así que la salida puede ser cualquier stream binario.
+"""
+import io
+import struct
+import time
+import zlib
+import zipfile
+from typing import IO, Dict, List, NamedTuple, Optional, Union
+
+from docx.document import Document as DocumentoDocx
+from docx.opc.pkgwriter import PackageWriter
+
+from .config import get_settings
+from .etapas import registrar
+
+# Formatos de zipfile (APPNOTE.TXT 4.3.7, 4.3.12 y 4.3.16)
+_CABECERA_LOCAL = struct.Struct("<4s2B4HL2L2H")
+_CABECERA_CENTRAL = struct.Struct("<4s4B4HL2L5H2L")
+_FIN_DIRECTORIO = struct.Struct("<4s4H2LH")
+_FIRMA_LOCAL = b"PK\003\004"
+_FIRMA_CENTRAL = b"PK\001\002"
+_FIRMA_FIN = b"PK\005\006"
+
+_VERSION = 20  # 2.0: deflate
+_UTF8 = 0x800  # bit 11: nombre en UTF-8
+_CIFRADO = 0x01
+_MAXIMO_ZIP32 = 0xFFFFFFFF
+
+Origen = Union[bytes, str, IO[bytes]]
+Salida = Union[str, IO[bytes]]
+
+
+class ResumenGuardado(NamedTuple):
+    partes: int  # entradas escritas
+    copiadas: int  # entradas copiadas comprimidas desde el original
+    bytes_copiados: int  # bytes comprimidos copiados sin recomprimir
+
+
+class _Entrada(NamedTuple):
+    nombre: bytes
+    banderas: int
+    compresion: int
+    hora: int
+    fecha: int
+    crc: int
+    comprimido: int
+    tamano: int
+    desplazamiento: int
+
+
+def _fecha_dos(fecha_hora) -> tuple:
+    anio, mes, dia, hora, minuto, segundo = fecha_hora[:6]
+    return (
+        hora << 11 | minuto << 5 | segundo // 2,
+        (max(anio, 1980) - 1980) << 9 | mes << 5 | dia,
+    )
+
+
+class _Original:
+    """Entradas del zip original y acceso a sus datos comprimidos."""
+
+    def __init__(self, origen: Origen):
+        if isinstance(origen, (bytes, bytearray)):
+            self._archivo: IO[bytes] = io.BytesIO(origen)
+            self._propio = True
+        elif isinstance(origen, str):
+            self._archivo = open(origen, "rb")
+            self._propio = True
+        else:
+            self._archivo = origen
+            self._propio = False
+        with zipfile.ZipFile(self._archivo) as zf:
+            self.entradas: Dict[str, zipfile.ZipInfo] = {info.filename: info for info in zf.infolist()}
+
+    def datos_comprimidos(self, info: zipfile.ZipInfo) -> Optional[bytes]:
+        """Bytes comprimidos de la entrada, o None si la cabecera local no es válida."""
+        self._archivo.seek(info.header_offset)
+        cabecera = self._archivo.read(_CABECERA_LOCAL.size)
+        if len(cabecera) != _CABECERA_LOCAL.size or cabecera[:4] != _FIRMA_LOCAL:
+            return None
+        largo_nombre, largo_extra = struct.unpack("<2H", cabecera[26:30])
+        self._archivo.seek(largo_nombre + largo_extra, io.SEEK_CUR)
+        datos = self._archivo.read(info.compress_size)
+        return datos if len(datos) == info.compress_size else None
+
+    def close(self) -> None:
+        if self._propio:
+            self._archivo.close()
+
+
+class EscritorZip:
+    """
+    Escritor con la interfaz PhysPkgWriter de python-docx (`write(pack_uri,
+    blob)` y `close()`) que copia las partes sin cambios desde `origen`.
+    """
+
+    def __init__(self, salida: Salida, origen: Optional[Origen] = None, nivel: int = 6):
+        if isinstance(salida, str):
+            self._salida: IO[bytes] = open(salida, "wb")
+            self._propia = True
+        else:
+            self._salida = salida
+            self._propia = False
+        self._original = _Original(origen) if origen is not None else None
+        self._nivel = nivel
+        self._posicion = 0
+        self._entradas: List[_Entrada] = []
+        self._fecha = _fecha_dos(time.localtime())
+        self.copiadas = 0
+        self.bytes_copiados = 0
+
+    def write(self, pack_uri, blob: bytes) -> None:
+        nombre = pack_uri.membername
+        info = self._original.entradas.get(nombre) if self._original is not None else None
+        if (
+            info is not None
+            and info.file_size == len(blob)
+            and not info.flag_bits & _CIFRADO
+            and info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+            and zlib.crc32(blob) == info.CRC
+        ):
+            datos = self._original.datos_comprimidos(info)
+            if datos is not None:
+                self._agregar(nombre, info.compress_type, _fecha_dos(info.date_time), info.CRC, datos, len(blob))
+                self.copiadas += 1
+                self.bytes_copiados += len(datos)
+                return
+        if self._nivel == 0:
+            compresion, datos = zipfile.ZIP_STORED, blob
+        else:
+            compresor = zlib.compressobj(self._nivel, zlib.DEFLATED, -zlib.MAX_WBITS)
+            compresion, datos = zipfile.ZIP_DEFLATED, compresor.compress(blob) + compresor.flush()
+        self._agregar(nombre, compresion, self._fecha, zlib.crc32(blob), datos, len(blob))
+
+    def _agregar(self, nombre: str, compresion: int, fecha: tuple, crc: int, datos: bytes, tamano: int) -> None:
+        try:
+            nombre_bytes, banderas = nombre.encode("ascii"), 0
+        except UnicodeEncodeError:
+            nombre_bytes, banderas = nombre.encode("utf-8"), _UTF8
+        if max(len(datos), tamano, self._posicion) > _MAXIMO_ZIP32:
+            raise ValueError("el paquete supera el tamaño de un zip sin ZIP64")
+        hora, dia = fecha
+        cabecera = _CABECERA_LOCAL.pack(
+            _FIRMA_LOCAL, _VERSION, 0, banderas, compresion, hora, dia,
+            crc, len(datos), tamano, len(nombre_bytes), 0,
+        )
+        self._entradas.append(
+            _Entrada(nombre_bytes, banderas, compresion, hora, dia, crc, len(datos), tamano, self._posicion)
+        )
+        self._escribir(cabecera + nombre_bytes)
+        self._escribir(datos)
+
+    def _escribir(self, datos: bytes) -> None:
+        self._salida.write(datos)
+        self._posicion += len(datos)
+
+    def resumen(self) -> ResumenGuardado:
+        return ResumenGuardado(len(self._entradas), self.copiadas, self.bytes_copiados)
+
+    def descartar(self) -> None:
+        """Libera los archivos sin terminar el zip (p. ej. tras un error)."""
+        if self._propia:
+            self._salida.close()
+        if self._original is not None:
+            self._original.close()
+
+    def close(self) -> None:
+        inicio = self._posicion
+        for e in self._entradas:
+            self._escribir(
+                _CABECERA_CENTRAL.pack(
+                    _FIRMA_CENTRAL, _VERSION, 0, _VERSION, 0, e.banderas, e.compresion,
+                    e.hora, e.fecha, e.crc, e.comprimido, e.tamano, len(e.nombre), 0, 0, 0, 0, 0,
+                    e.desplazamiento,
+                )
+                + e.nombre
+            )
+        cantidad = len(self._entradas)
+        if cantidad > 0xFFFF or self._posicion > _MAXIMO_ZIP32:
+            raise ValueError("el paquete supera el tamaño de un zip sin ZIP64")
+        self._escribir(
+            _FIN_DIRECTORIO.pack(_FIRMA_FIN, 0, 0, cantidad, cantidad, self._posicion - inicio, inicio, 0)
+        )
+        if not self._propia:
+            self._salida.flush()
+        self.descartar()
+
+
+def guardar_paquete(
+    doc: DocumentoDocx,
+    salida: Salida,
+    origen: Optional[Origen] = None,
+    nivel: Optional[int] = None,
+) -> ResumenGuardado:
+    """
+    Guarda `doc` en `salida` (ruta o stream) como `doc.save()`. Con `origen`
+    (el .docx del que se cargó: bytes, ruta o stream) las partes sin cambios
+    se copian comprimidas desde él. `nivel` es el nivel de deflate de las
+    partes que se escriben (por defecto settings.save_deflate_level).
+    """
+    settings = get_settings()
+    if not settings.save_passthrough:
+        origen = None
+    if nivel is None:
+        nivel = settings.save_deflate_level
+    package = doc.part.package
+    partes = list(package.iter_parts())
+
+    escritor = EscritorZip(salida, origen, nivel)
+    try:
+        PackageWriter._write_content_types_stream(escritor, partes)
+        PackageWriter._write_pkg_rels(escritor, package.rels)
+        PackageWriter._write_parts(escritor, partes)
+    except BaseException:
+        escritor.descartar()
+        raise
+    escritor.close()
+
+    resumen = escritor.resumen()
+    registrar("partes_copiadas", resumen.copiadas)
+    registrar("bytes_copiados", resumen.bytes_copiados)
+    return resumen
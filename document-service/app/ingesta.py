@@ -0,0 +1,192 @@
+"""
+Ingesta de documentos subidos.
+
+El archivo se lee por bloques directamente en memoria y solo se vuelca a
+disco si supera upload_spool_bytes. El tamaño máximo se controla mientras se
+lee, sin esperar a tener todo el archivo, y el archivo temporal (si lo hubo)
+se elimina siempre al salir del bloque `async with`.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional, Union
+
+from docx import Document
+from fastapi import UploadFile
+
+from .config import get_settings
+from .etapas import etapa, registrar
+from .guardado import guardar_paquete
+from .metricas import get_metricas
+from .paquete import abrir_para_validar
+
+TAMANO_BLOQUE = 1024 * 1024
+
+# Contenido en memoria (bytes) o ruta de un archivo temporal en disco
+FuenteDocumento = Union[bytes, str]
+
+
+class ArchivoDemasiadoGrande(Exception):
+    """El archivo subido supera upload_max_bytes."""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"El archivo supera el tamaño máximo de {max_bytes // (1024 * 1024)} MB")
+        self.max_bytes = max_bytes
+
+
+class DocumentoSubido:
+    """Contenido de un archivo subido, en memoria o volcado a disco."""
+
+    def __init__(self, spool_bytes: int, tmp_dir: Optional[str] = None):
+        self._spool_bytes = spool_bytes
+        self._tmp_dir = tmp_dir
+        self._memoria: Optional[io.BytesIO] = io.BytesIO()
+        self._archivo = None
+        self.ruta: Optional[str] = None
+        self.tamano = 0
+        self.segundos_disco = 0.0  # tiempo escribiendo el archivo temporal
+        self._hash = hashlib.sha256()
+
+    @property
+    def sha256(self) -> str:
+        """SHA-256 del contenido, calculado mientras se lee."""
+        return self._hash.hexdigest()
+
+    @property
+    def en_disco(self) -> bool:
+        return self.ruta is not None
+
+    def escribir(self, bloque: bytes) -> None:
+        self.tamano += len(bloque)
+        self._hash.update(bloque)
+        if self._memoria is not None and self.tamano > self._spool_bytes:
+            self._volcar_a_disco()
+        if self._archivo is not None:
+            inicio = time.perf_counter()
+            self._archivo.write(bloque)
+            self.segundos_disco += time.perf_counter() - inicio
+        else:
+            self._memoria.write(bloque)
+
+    def _volcar_a_disco(self) -> None:
+        inicio = time.perf_counter()
+        self._archivo = tempfile.NamedTemporaryFile(
+            delete=False, suffix=".docx", dir=self._tmp_dir
+        )
+        self.ruta = self._archivo.name
+        self._archivo.write(self._memoria.getbuffer())
+        self._memoria = None
+        self.segundos_disco += time.perf_counter() - inicio
+
+    def terminar(self) -> None:
+        if self._archivo is not None:
+            inicio = time.perf_counter()
+            self._archivo.close()
+            self.segundos_disco += time.perf_counter() - inicio
+
+    def fuente(self) -> FuenteDocumento:
+        """Contenido para enviar al pool: bytes en memoria o ruta en disco."""
+        if self.ruta is not None:
+            return self.ruta
+        return self._memoria.getvalue()
+
+    def contenido(self) -> bytes:
+        """Contenido completo en bytes; lee el temporal si está en disco."""
+        fuente = self.fuente()
+        if isinstance(fuente, bytes):
+            return fuente
+        with open(fuente, "rb") as f:
+            return f.read()
+
+    def cerrar(self) -> None:
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        if self.ruta is not None:
+            try:
+                os.unlink(self.ruta)
+            except FileNotFoundError:
+                pass
+            self.ruta = None
+        self._memoria = None
+
+
+async def leer_upload(
+    file: UploadFile,
+    max_bytes: Optional[int] = None,
+) -> DocumentoSubido:
+    """
+    Lee el UploadFile por bloques aplicando el tamaño máximo
+    (upload_max_bytes por defecto).
+
+    Lanza ArchivoDemasiadoGrande en cuanto se supera el límite. Quien llama
+    debe invocar `cerrar()` al terminar; `recibir_documento` lo hace solo.
+    """
+    settings = get_settings()
+    limite = max_bytes if max_bytes is not None else settings.upload_max_bytes
+    subido = DocumentoSubido(settings.upload_spool_bytes, settings.upload_tmp_dir)
+    inicio = time.perf_counter()
+    try:
+        while True:
+            bloque = await file.read(TAMANO_BLOQUE)
+            if not bloque:
+                break
+            if subido.tamano + len(bloque) > limite:
+                raise ArchivoDemasiadoGrande(limite)
+            subido.escribir(bloque)
+        subido.terminar()
+    except BaseException:
+        subido.cerrar()
+        raise
+
+    metricas = get_metricas()
+    metricas.etapa_duracion.observar(time.perf_counter() - inicio, etapa="lectura_upload")
+    if subido.en_disco:
+        metricas.etapa_duracion.observar(subido.segundos_disco, etapa="escritura_temporal")
+    metricas.documento_tamano.observar(subido.tamano)
+    return subido
+
+
+@asynccontextmanager
+async def recibir_documento(file: UploadFile) -> AsyncIterator[DocumentoSubido]:
+    """Lee el UploadFile (ver leer_upload) y lo elimina al salir del bloque."""
+    subido = await leer_upload(file)
+    try:
+        yield subido
+    finally:
+        subido.cerrar()
+
+
+def abrir_documento(fuente: FuenteDocumento) -> Document:
+    """Carga el documento desde bytes en memoria o desde una ruta."""
+    with etapa("carga"):
+        if isinstance(fuente, (bytes, bytearray)):
+            return Document(io.BytesIO(fuente))
+        return Document(fuente)
+
+
+def abrir_documento_validacion(fuente: FuenteDocumento) -> Document:
+    """
+    Carga el documento solo con las partes que usan los validadores, sin
+    leer imágenes ni objetos incrustados (ver app/paquete.py). No se debe
+    guardar: se perderían las partes omitidas.
+    """
+    with etapa("carga"):
+        doc, omitidas = abrir_para_validar(fuente)
+    registrar("partes_omitidas", len(omitidas))
+    registrar("bytes_omitidos", sum(parte.tamano for parte in omitidas))
+    return doc
+
+
+def guardar_documento(doc: Document, origen: Optional[FuenteDocumento] = None) -> bytes:
+    """
+    Serializa el documento en memoria. Con `origen` (el contenido del que se
+    cargó) las partes sin cambios se copian sin recomprimir (ver app/guardado.py).
+    """
+    with etapa("guardado"):
+        salida = io.BytesIO()
+        guardar_paquete(doc, salida, origen)
+        return salida.getvalue()
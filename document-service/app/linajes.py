@@ -0,0 +1,224 @@
+"""
+Estado de validación por linaje de documento (todas las versiones de una tesis).
+
+`/validar?tesis_id=...` guarda aquí las huellas por párrafo de la última
+versión validada (ver validators/incremental.py) para que la siguiente
+solo revalide lo que cambió. El almacén es intercambiable:
+
+- BackendLinajesSQLite: un archivo SQLite local (por defecto)
+- BackendLinajesArchivos: un archivo por tesis en un directorio
+
+Los tesis_id los elige el cliente, así que el almacén se acota: los linajes
+sin validar en lineage_ttl_s se purgan y un estado mayor que
+lineage_max_bytes no se guarda (la próxima validación es completa).
+obtener_linaje y guardar_linaje hacen E/S bloqueante: se llaman fuera del
+event loop.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Protocol
+
+from .config import Settings, get_settings
+
+MAX_TESIS_ID = 128
+INTERVALO_PURGA_S = 600
+
+
+class TesisIdInvalido(ValueError):
+    """El tesis_id enviado por el cliente está vacío o es demasiado largo."""
+
+    def __init__(self):
+        super().__init__(f"tesis_id debe tener entre 1 y {MAX_TESIS_ID} caracteres")
+
+
+def validar_tesis_id(tesis_id: str) -> str:
+    tesis_id = tesis_id.strip()
+    if not tesis_id or len(tesis_id) > MAX_TESIS_ID:
+        raise TesisIdInvalido()
+    return tesis_id
+
+
+class BackendLinajes(Protocol):
+    """Almacén del estado serializado de cada linaje."""
+
+    def obtener(self, tesis_id: str) -> Optional[bytes]: ...
+
+    def guardar(self, tesis_id: str, estado: bytes) -> None: ...
+
+    def eliminar(self, tesis_id: str) -> None: ...
+
+    def purgar(self, antes_de: datetime) -> int:
+        """Elimina los linajes guardados por última vez antes de `antes_de`."""
+        ...
+
+    def cerrar(self) -> None: ...
+
+
+class BackendLinajesArchivos:
+    """Un archivo por tesis; el nombre es un hash del id para no depender de sus caracteres."""
+
+    def __init__(self, directorio: str):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, tesis_id: str) -> str:
+        nombre = hashlib.sha256(tesis_id.encode()).hexdigest()
+        return os.path.join(self.directorio, nombre + ".json")
+
+    def obtener(self, tesis_id: str) -> Optional[bytes]:
+        try:
+            with open(self._ruta(tesis_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def guardar(self, tesis_id: str, estado: bytes) -> None:
+        # Escribir aparte y reemplazar, para no dejar un estado a medias
+        fd, tmp = tempfile.mkstemp(dir=self.directorio, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(estado)
+            os.replace(tmp, self._ruta(tesis_id))
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def eliminar(self, tesis_id: str) -> None:
+        try:
+            os.unlink(self._ruta(tesis_id))
+        except FileNotFoundError:
+            pass
+
+    def purgar(self, antes_de: datetime) -> int:
+        # Incluye los .tmp que haya dejado un proceso interrumpido
+        limite = antes_de.timestamp()
+        eliminados = 0
+        with os.scandir(self.directorio) as entradas:
+            for entrada in entradas:
+                if not entrada.name.endswith((".json", ".tmp")):
+                    continue
+                try:
+                    if entrada.stat().st_mtime < limite:
+                        os.unlink(entrada.path)
+                        eliminados += 1
+                except FileNotFoundError:
+                    pass
+        return eliminados
+
+    def cerrar(self) -> None:
+        pass
+
+
+class BackendLinajesSQLite:
+    """Estado de todos los linajes en un archivo SQLite local."""
+
+    def __init__(self, ruta: str):
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS linajes (
+                    tesis_id TEXT PRIMARY KEY,
+                    estado BLOB NOT NULL,
+                    actualizado_en TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_linajes_actualizado ON linajes (actualizado_en)"
+            )
+
+    def obtener(self, tesis_id: str) -> Optional[bytes]:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT estado FROM linajes WHERE tesis_id = ?", (tesis_id,)
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def guardar(self, tesis_id: str, estado: bytes) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO linajes (tesis_id, estado) VALUES (?, ?)
+                ON CONFLICT (tesis_id) DO UPDATE
+                SET estado = excluded.estado, actualizado_en = CURRENT_TIMESTAMP
+                """,
+                (tesis_id, estado),
+            )
+
+    def eliminar(self, tesis_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM linajes WHERE tesis_id = ?", (tesis_id,))
+
+    def purgar(self, antes_de: datetime) -> int:
+        # CURRENT_TIMESTAMP se guarda en UTC como 'YYYY-MM-DD HH:MM:SS'
+        limite = antes_de.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM linajes WHERE actualizado_en < ?", (limite,)
+            )
+        return cursor.rowcount
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _crear_backend(settings: Settings) -> BackendLinajes:
+    if settings.lineage_backend == "archivos":
+        return BackendLinajesArchivos(settings.lineage_dir)
+    return BackendLinajesSQLite(settings.lineage_sqlite_path)
+
+
+_linajes: Optional[BackendLinajes] = None
+_proxima_purga = 0.0
+
+
+def get_linajes() -> BackendLinajes:
+    """Retorna el almacén de linajes del proceso, creándolo si aún no existe."""
+    global _linajes
+    if _linajes is None:
+        _linajes = _crear_backend(get_settings())
+    return _linajes
+
+
+def obtener_linaje(tesis_id: str) -> Optional[bytes]:
+    """Estado guardado de la tesis, o None. Bloqueante."""
+    return get_linajes().obtener(tesis_id)
+
+
+def guardar_linaje(tesis_id: str, estado: bytes) -> bool:
+    """
+    Guarda el estado de la tesis y, cada INTERVALO_PURGA_S, purga los
+    linajes vencidos. Un estado mayor que settings.lineage_max_bytes no se
+    guarda (y se descarta el anterior, que ya no corresponde). Bloqueante.
+    """
+    global _proxima_purga
+    settings = get_settings()
+    linajes = get_linajes()
+    ahora = time.monotonic()
+    if ahora >= _proxima_purga:
+        _proxima_purga = ahora + INTERVALO_PURGA_S
+        linajes.purgar(datetime.now(timezone.utc) - timedelta(seconds=settings.lineage_ttl_s))
+    if len(estado) > settings.lineage_max_bytes:
+        linajes.eliminar(tesis_id)
+        return False
+    linajes.guardar(tesis_id, estado)
+    return True
+
+
+def cerrar_linajes() -> None:
+    global _linajes, _proxima_purga
+    if _linajes is not None:
+        _linajes.cerrar()
+        _linajes = None
+    _proxima_purga = 0.0
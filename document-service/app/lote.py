@@ -0,0 +1,232 @@
+"""
+Validación por lotes.
+
+Recibe varios .docx (o un .zip que los contenga), los valida en paralelo en
+el pool de procesos con la misma tarea que /validar y produce una línea
+NDJSON por documento a medida que cada uno termina. Un archivo corrupto solo
+genera su propia línea de error; el resto del lote continúa.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import zipfile
+from typing import AsyncIterator, Iterator, List, Optional, Tuple, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from .cache import CacheValidaciones
+from .ejecucion import ColaLlena, EjecutorDocumentos
+from .ingesta import ArchivoDemasiadoGrande, DocumentoSubido
+from .tareas import tarea_validar
+from .validators.reglas import PlanReglas
+
+# (nombre, contenido) o (nombre, error que impidió leerlo)
+EntradaLote = Tuple[str, Union[bytes, Exception]]
+
+
+class EntradaSubida:
+    """Archivo recibido en el lote: un .docx, un .zip o un error de lectura."""
+
+    def __init__(
+        self,
+        nombre: str,
+        subido: Optional[DocumentoSubido] = None,
+        error: Optional[Exception] = None,
+    ):
+        self.nombre = nombre
+        self.subido = subido
+        self.error = error
+
+    def cerrar(self) -> None:
+        if self.subido is not None:
+            self.subido.cerrar()
+
+
+def _es_docx(nombre: str) -> bool:
+    base = nombre.rsplit("/", 1)[-1]
+    return nombre.lower().endswith(".docx") and not base.startswith(("~$", "._"))
+
+
+def _miembros_zip(entrada: EntradaSubida, max_bytes: int) -> Iterator[EntradaLote]:
+    """Documentos .docx dentro del zip, leídos uno a la vez."""
+    fuente = entrada.subido.fuente()
+    origen = io.BytesIO(fuente) if isinstance(fuente, bytes) else fuente
+    try:
+        archivo = zipfile.ZipFile(origen)
+    except zipfile.BadZipFile as e:
+        yield entrada.nombre, e
+        return
+
+    with archivo:
+        for info in archivo.infolist():
+            if info.is_dir() or not _es_docx(info.filename):
+                continue
+            nombre = f"{entrada.nombre}/{info.filename}"
+            if info.file_size > max_bytes:
+                yield nombre, ArchivoDemasiadoGrande(max_bytes)
+                continue
+            try:
+                yield nombre, archivo.read(info)
+            except Exception as e:
+                yield nombre, e
+
+
+def _aplanar(entradas: List[EntradaSubida], max_bytes: int) -> Iterator[EntradaLote]:
+    for entrada in entradas:
+        if entrada.error is not None:
+            yield entrada.nombre, entrada.error
+        elif entrada.nombre.lower().endswith(".zip"):
+            yield from _miembros_zip(entrada, max_bytes)
+        elif _es_docx(entrada.nombre):
+            yield entrada.nombre, entrada.subido.contenido()
+        else:
+            yield entrada.nombre, ValueError("Solo se permiten archivos .docx o .zip")
+
+
+def iterar_entradas(
+    entradas: List[EntradaSubida],
+    max_bytes: int,
+    max_documentos: int,
+) -> Iterator[EntradaLote]:
+    """Aplana los archivos recibidos (expandiendo los .zip) en orden."""
+    for i, entrada in enumerate(_aplanar(entradas, max_bytes)):
+        if i >= max_documentos:
+            yield entrada[0], ValueError(
+                f"El lote supera el máximo de {max_documentos} documentos"
+            )
+            return
+        yield entrada
+
+
+def _tomar(
+    fuentes: Iterator[Tuple[int, EntradaLote]],
+) -> Optional[Tuple[int, str, Union[bytes, Exception], Optional[str]]]:
+    """
+    Siguiente documento del lote con su sha256. Lee el archivo o descomprime
+    el miembro del zip, así que se llama fuera del event loop.
+    """
+    siguiente = next(fuentes, None)
+    if siguiente is None:
+        return None
+    indice, (nombre, contenido) = siguiente
+    if isinstance(contenido, Exception):
+        return indice, nombre, contenido, None
+    return indice, nombre, contenido, hashlib.sha256(contenido).hexdigest()
+
+
+def _linea(datos: dict) -> bytes:
+    return json.dumps(datos, ensure_ascii=False).encode() + b"\n"
+
+
+async def _validar_uno(
+    ejecutor: EjecutorDocumentos,
+    contenido: bytes,
+    reglas: Optional[str] = None,
+):
+    while True:
+        try:
+            return await ejecutor.ejecutar(tarea_validar, contenido, reglas)
+        except ColaLlena as e:
+            # Hay peticiones individuales ocupando la cola: esperar turno
+            await asyncio.sleep(e.retry_after)
+
+
+async def validar_lote(
+    entradas: List[EntradaSubida],
+    ejecutor: EjecutorDocumentos,
+    cache: CacheValidaciones,
+    max_bytes: int,
+    max_documentos: int,
+    plan: Optional[PlanReglas] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Valida los documentos manteniendo como máximo un documento en vuelo por
+    worker del pool y emite una línea NDJSON por cada uno al terminar:
+
+        {"tipo": "resultado", "indice": 0, "archivo": "...", "sha256": "...", "cache": false, "resultado": {...}}
+        {"tipo": "error", "indice": 1, "archivo": "...", "error": "..."}
+        {"tipo": "resumen", "total": 2, "validados": 1, "fallidos": 1, "validos": 0}
+    """
+    paralelo = max(1, min(max(ejecutor.workers, 1), ejecutor.max_queue))
+    pendientes = {}
+    total = validados = fallidos = validos = 0
+    fuentes = enumerate(iterar_entradas(entradas, max_bytes, max_documentos))
+
+    def resultado_linea(indice, nombre, sha256, resultado, desde_cache) -> bytes:
+        nonlocal validados, validos
+        validados += 1
+        validos += int(resultado.es_valido)
+        return _linea(
+            {
+                "tipo": "resultado",
+                "indice": indice,
+                "archivo": nombre,
+                "sha256": sha256,
+                "cache": desde_cache,
+                "resultado": resultado.model_dump(mode="json"),
+            }
+        )
+
+    def error_linea(indice, nombre, error: Exception) -> bytes:
+        nonlocal fallidos
+        fallidos += 1
+        return _linea(
+            {"tipo": "error", "indice": indice, "archivo": nombre, "error": str(error)}
+        )
+
+    try:
+        agotado = False
+        while not agotado or pendientes:
+            # Llenar los huecos libres con los siguientes documentos
+            while not agotado and len(pendientes) < paralelo:
+                siguiente = await run_in_threadpool(_tomar, fuentes)
+                if siguiente is None:
+                    agotado = True
+                    break
+                indice, nombre, contenido, sha256 = siguiente
+                total += 1
+                if isinstance(contenido, Exception):
+                    yield error_linea(indice, nombre, contenido)
+                    continue
+
+                resultado = await cache.obtener(sha256, plan)
+                if resultado is not None:
+                    yield resultado_linea(indice, nombre, sha256, resultado, True)
+                    continue
+
+                tarea = asyncio.ensure_future(
+                    _validar_uno(ejecutor, contenido, plan.id if plan else None)
+                )
+                pendientes[tarea] = (indice, nombre, sha256)
+
+            if not pendientes:
+                continue
+
+            hechas, _ = await asyncio.wait(
+                pendientes.keys(), return_when=asyncio.FIRST_COMPLETED
+            )
+            for tarea in hechas:
+                indice, nombre, sha256 = pendientes.pop(tarea)
+                try:
+                    resultado = tarea.result()
+                except Exception as e:
+                    yield error_linea(indice, nombre, e)
+                    continue
+                await cache.guardar(sha256, resultado, plan)
+                yield resultado_linea(indice, nombre, sha256, resultado, False)
+
+        yield _linea(
+            {
+                "tipo": "resumen",
+                "total": total,
+                "validados": validados,
+                "fallidos": fallidos,
+                "validos": validos,
+            }
+        )
+    finally:
+        for tarea in pendientes:
+            tarea.cancel()
+        for entrada in entradas:
+            entrada.cerrar()
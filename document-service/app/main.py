@@ -1,19 +1,74 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from docx import Document
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import hashlib
 import tempfile
+import time
 import os
-from typing import Optional
+from typing import Any, Callable, List, Optional, Tuple
 
-from .models import ValidacionResultado, FormateoResultado
-from .validators import validar_documento_completo
-from .formatters import formatear_documento
+from .models import (
+    ValidacionResultado,
+    FormateoResultado,
+    ProcesamientoResultado,
+    TipoTrabajo,
+    Trabajo,
+)
 from .config import get_settings
+from .ejecucion import get_ejecutor, detener_ejecutor, ColaLlena, PoolNoDisponible
+from .cache import get_cache, cerrar_cache
+from .ingesta import recibir_documento, leer_upload, ArchivoDemasiadoGrande
+from .lote import EntradaSubida, validar_lote
+from .tareas import (
+    tarea_validar,
+    tarea_validar_incremental,
+    tarea_linaje,
+    tarea_formatear,
+    tarea_formatear_bytes,
+    tarea_procesar,
+)
+from .respuestas import respuesta_documento, respuesta_multipart
+from .trabajos import get_gestor_trabajos, detener_gestor_trabajos
+from .linajes import (
+    obtener_linaje,
+    guardar_linaje,
+    cerrar_linajes,
+    validar_tesis_id,
+    TesisIdInvalido,
+)
+from .validators import ReglasDesconocidas, get_reglas
+from .metricas import get_metricas, CONTENT_TYPE as CONTENT_TYPE_METRICAS
+from .perfilado import (
+    PerfiladoNoAutorizado,
+    modo_solicitado,
+    verificar_token,
+    tarea_perfilada,
+    guardar_perfil,
+    leer_resumen,
+    ruta_datos,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Levantar el pool de procesos antes de recibir peticiones
+    get_ejecutor()
+    get_cache()
+    get_gestor_trabajos()
+    yield
+    await detener_gestor_trabajos()
+    detener_ejecutor()
+    await cerrar_cache()
+    cerrar_linajes()
+
 
 app = FastAPI(
     title="Document Service - Sistema de Tesis UNAP",
     description="Servicio de validación y formateo de documentos según Guía UNAP 2.0",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -26,6 +81,82 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def medir_peticiones(request: Request, call_next):
+    metricas = get_metricas()
+    metricas.peticiones_en_curso.inc()
+    inicio = time.perf_counter()
+    estado = 500
+    try:
+        response = await call_next(request)
+        estado = response.status_code
+        return response
+    finally:
+        metricas.peticiones_en_curso.dec()
+        # Plantilla de la ruta (/jobs/{trabajo_id}) para no crear una serie por id
+        ruta = request.scope.get("route")
+        metricas.peticion_duracion.observar(
+            time.perf_counter() - inicio,
+            metodo=request.method,
+            ruta=getattr(ruta, "path", "desconocida"),
+            estado=str(estado),
+        )
+
+
+@app.exception_handler(ArchivoDemasiadoGrande)
+async def archivo_demasiado_grande_handler(request: Request, exc: ArchivoDemasiadoGrande):
+    return JSONResponse(status_code=413, content={"detail": str(exc)})
+
+
+@app.exception_handler(TesisIdInvalido)
+async def tesis_id_invalido_handler(request: Request, exc: TesisIdInvalido):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(ReglasDesconocidas)
+async def reglas_desconocidas_handler(request: Request, exc: ReglasDesconocidas):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(PerfiladoNoAutorizado)
+async def perfilado_no_autorizado_handler(request: Request, exc: PerfiladoNoAutorizado):
+    return JSONResponse(status_code=403, content={"detail": str(exc)})
+
+
+@app.exception_handler(ColaLlena)
+async def cola_llena_handler(request: Request, exc: ColaLlena):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Servicio ocupado, intente nuevamente en unos segundos"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(PoolNoDisponible)
+async def pool_no_disponible_handler(request: Request, exc: PoolNoDisponible):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Servicio de procesamiento no disponible temporalmente"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def ejecutar_tarea(
+    modo_perfil: Optional[str], fn: Callable[..., Any], *args: Any
+) -> Tuple[Any, Optional[str]]:
+    """
+    Ejecuta la tarea en el pool. Con `modo_perfil` la ejecuta bajo el
+    perfilador, guarda el perfil y retorna también su id.
+    """
+    if modo_perfil is None:
+        return await get_ejecutor().ejecutar(fn, *args), None
+    resultado, perfil = await get_ejecutor().ejecutar(
+        tarea_perfilada, modo_perfil, get_settings().profiling_intervalo_ms, fn, *args
+    )
+    guardar_perfil(perfil)
+    return resultado, perfil.id
+
+
 @app.get("/")
 async def root():
     return {"message": "Document Service - Sistema de Tesis UNAP"}
@@ -36,8 +167,25 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de exposición de texto de Prometheus."""
+    metricas = get_metricas()
+    metricas.actualizar_pool(get_ejecutor())
+    metricas.actualizar_cache(get_cache())
+    return Response(content=metricas.exponer(), media_type=CONTENT_TYPE_METRICAS)
+
+
 @app.post("/validar", response_model=ValidacionResultado)
-async def validar_documento(file: UploadFile = File(...)):
+async def validar_documento(
+    response: Response,
+    file: UploadFile = File(...),
+    tesis_id: Optional[str] = None,
+    reglas: Optional[str] = None,
+    perfilar: Optional[str] = None,
+    x_perfilar: Optional[str] = Header(None),
+    x_perfilado_token: Optional[str] = Header(None),
+):
     """
     Valida un documento Word (.docx) según la Guía UNAP 2.0.
 
@@ -49,48 +197,131 @@ async def validar_documento(file: UploadFile = File(...)):
     - Sangría primera línea (1.25 cm)
     - Estructura de capítulos
     - Secciones obligatorias
+
+    Con `reglas` se valida con el conjunto de reglas de esa escuela o
+    facultad (GET /reglas lista los disponibles) en lugar del de la guía.
+
+    Con `tesis_id` se conserva lo calculado para cada hijo del cuerpo (y
+    cada encabezado, pie y parte de notas) de la última versión de esa tesis
+    y, en la siguiente subida, solo se vuelven a leer los que cambiaron (el
+    resultado es el mismo que una validación completa). La cabecera
+    X-Parrafos-Revalidados indica cuántos párrafos fueron. El linaje avanza
+    también cuando el resultado sale de la caché.
+
+    Con `perfilar=determinista|muestreo` y la cabecera X-Perfilado-Token la
+    validación se perfila (sin usar la caché) y el id del perfil viaja en la
+    cabecera X-Perfil-Id.
     """
     if not file.filename.endswith(".docx"):
         raise HTTPException(
             status_code=400,
             detail="Solo se permiten archivos .docx"
         )
+    modo_perfil = modo_solicitado(perfilar or x_perfilar, x_perfilado_token)
+    if tesis_id is not None:
+        tesis_id = validar_tesis_id(tesis_id)
+    plan = get_reglas().plan(reglas)
 
     try:
-        # Guardar archivo temporal
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp:
-            content = await file.read()
-            tmp.write(content)
-            tmp_path = tmp.name
-
-        # Cargar y validar documento
-        doc = Document(tmp_path)
-        resultado = validar_documento_completo(doc)
+        # Leer el archivo en memoria y validar en el pool de procesos,
+        # salvo que el mismo archivo ya se haya validado con esta configuración
+        cache = get_cache()
+        async with recibir_documento(file) as subido:
+            if modo_perfil is None:
+                resultado = await cache.obtener(subido.sha256, plan)
+                if resultado is not None:
+                    if tesis_id is not None:
+                        # El linaje avanza a esta versión aunque no haga falta validarla
+                        previo = await run_in_threadpool(obtener_linaje, tesis_id)
+                        estado, revalidados, total = await get_ejecutor().ejecutar(
+                            tarea_linaje, subido.fuente(), previo
+                        )
+                        await run_in_threadpool(guardar_linaje, tesis_id, estado)
+                        response.headers["X-Parrafos-Revalidados"] = f"{revalidados}/{total}"
+                    response.headers["X-Cache"] = "HIT"
+                    return resultado
 
-        # Limpiar archivo temporal
-        os.unlink(tmp_path)
+            if tesis_id is None:
+                resultado, perfil_id = await ejecutar_tarea(
+                    modo_perfil, tarea_validar, subido.fuente(), plan.id
+                )
+            else:
+                previo = await run_in_threadpool(obtener_linaje, tesis_id)
+                (resultado, estado, revalidados, total), perfil_id = await ejecutar_tarea(
+                    modo_perfil,
+                    tarea_validar_incremental,
+                    subido.fuente(),
+                    previo,
+                    plan.id,
+                )
+                await run_in_threadpool(guardar_linaje, tesis_id, estado)
+                response.headers["X-Parrafos-Revalidados"] = f"{revalidados}/{total}"
+            await cache.guardar(subido.sha256, resultado, plan)
+            response.headers["X-Cache"] = "MISS"
+            if perfil_id is not None:
+                response.headers["X-Perfil-Id"] = perfil_id
+            return resultado
 
-        return resultado
+    except (ColaLlena, PoolNoDisponible, ArchivoDemasiadoGrande, ReglasDesconocidas):
+        raise
 
     except Exception as e:
-        # Asegurar limpieza del archivo temporal
-        if 'tmp_path' in locals():
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
-
         raise HTTPException(
             status_code=500,
             detail=f"Error al procesar el documento: {str(e)}"
         )
 
 
+@app.post("/validar/lote")
+async def validar_lote_endpoint(
+    files: List[UploadFile] = File(...), reglas: Optional[str] = None
+):
+    """
+    Valida varios documentos .docx (o archivos .zip que los contengan) en
+    paralelo con las mismas reglas que /validar (o las de `reglas`).
+
+    Responde application/x-ndjson: una línea por documento a medida que
+    termina (`tipo` "resultado" o "error") y una línea final de `resumen`.
+    """
+    settings = get_settings()
+    plan = get_reglas().plan(reglas)
+    entradas: List[EntradaSubida] = []
+    try:
+        for file in files:
+            es_zip = file.filename.lower().endswith(".zip")
+            limite = settings.batch_max_zip_bytes if es_zip else settings.upload_max_bytes
+            try:
+                entradas.append(EntradaSubida(file.filename, await leer_upload(file, limite)))
+            except ArchivoDemasiadoGrande as e:
+                entradas.append(EntradaSubida(file.filename, error=e))
+    except BaseException:
+        for entrada in entradas:
+            entrada.cerrar()
+        raise
+
+    return StreamingResponse(
+        validar_lote(
+            entradas,
+            get_ejecutor(),
+            get_cache(),
+            settings.upload_max_bytes,
+            settings.batch_max_files,
+            plan,
+        ),
+        media_type="application/x-ndjson",
+    )
+
+
 @app.post("/formatear", response_model=FormateoResultado)
 async def formatear_documento_endpoint(
+    response: Response,
     file: UploadFile = File(...),
     titulo: Optional[str] = None,
     autor: Optional[str] = None,
+    descargar: bool = False,
+    perfilar: Optional[str] = None,
+    x_perfilar: Optional[str] = Header(None),
+    x_perfilado_token: Optional[str] = Header(None),
 ):
     """
     Aplica el formato correcto según la Guía UNAP 2.0 a un documento Word.
@@ -101,75 +332,271 @@ async def formatear_documento_endpoint(
     - Interlineado doble
     - Sangría de primera línea
     - Formato de títulos
+
+    Con `descargar=true` la respuesta es el propio .docx formateado y la lista
+    de cambios viaja en la cabecera X-Cambios-Realizados; no se escribe nada
+    en disco.
+
+    Admite el mismo perfilado bajo demanda que /validar.
     """
     if not file.filename.endswith(".docx"):
         raise HTTPException(
             status_code=400,
             detail="Solo se permiten archivos .docx"
         )
+    modo_perfil = modo_solicitado(perfilar or x_perfilar, x_perfilado_token)
 
     try:
-        # Guardar archivo temporal de entrada
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp_in:
-            content = await file.read()
-            tmp_in.write(content)
-            tmp_in_path = tmp_in.name
+        datos = {}
+        if titulo:
+            datos["titulo"] = titulo
+        if autor:
+            datos["autor"] = autor
+
+        async with recibir_documento(file) as subido:
+            if descargar:
+                (resultado, contenido), perfil_id = await ejecutar_tarea(
+                    modo_perfil, tarea_formatear_bytes, subido.fuente(), datos
+                )
+                if perfil_id is not None:
+                    response.headers["X-Perfil-Id"] = perfil_id
+                if not resultado.exito:
+                    return resultado
+                descarga = respuesta_documento(
+                    contenido, file.filename, resultado.cambios_realizados
+                )
+                if perfil_id is not None:
+                    descarga.headers["X-Perfil-Id"] = perfil_id
+                return descarga
+
+            # Crear ruta para archivo de salida
+            fd, tmp_out_path = tempfile.mkstemp(
+                suffix="_formateado.docx", dir=get_settings().upload_tmp_dir
+            )
+            os.close(fd)
+
+            # Aplicar formateo en el pool de procesos
+            try:
+                resultado, perfil_id = await ejecutar_tarea(
+                    modo_perfil, tarea_formatear, subido.fuente(), tmp_out_path, datos
+                )
+            except BaseException:
+                os.unlink(tmp_out_path)
+                raise
+
+            if perfil_id is not None:
+                response.headers["X-Perfil-Id"] = perfil_id
+
+            if not resultado.exito:
+                os.unlink(tmp_out_path)
+
+            return resultado
+
+    except (ColaLlena, PoolNoDisponible, ArchivoDemasiadoGrande, ReglasDesconocidas):
+        raise
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error al formatear el documento: {str(e)}"
+        )
 
-        # Crear ruta para archivo de salida
-        tmp_out_path = tmp_in_path.replace(".docx", "_formateado.docx")
 
-        # Cargar documento
-        doc = Document(tmp_in_path)
+@app.post("/procesar", response_model=ProcesamientoResultado)
+async def procesar_documento(
+    file: UploadFile = File(...),
+    titulo: Optional[str] = None,
+    autor: Optional[str] = None,
+    revalidar: bool = False,
+    reglas: Optional[str] = None,
+):
+    """
+    Valida y formatea un documento con una sola subida y una sola carga.
+    Las validaciones usan las reglas de `reglas` si se indica.
 
-        # Aplicar formateo
+    Responde multipart/form-data con la parte "resultado" (JSON con la
+    validación inicial, el formateo y, con `revalidar=true`, la validación
+    del documento ya formateado) y la parte "documento" (el .docx).
+    Si el formateo falla se responde solo el JSON.
+    """
+    if not file.filename.endswith(".docx"):
+        raise HTTPException(
+            status_code=400,
+            detail="Solo se permiten archivos .docx"
+        )
+
+    plan = get_reglas().plan(reglas)
+    try:
         datos = {}
         if titulo:
             datos["titulo"] = titulo
         if autor:
             datos["autor"] = autor
 
-        resultado = formatear_documento(doc, tmp_out_path, datos)
+        cache = get_cache()
+        async with recibir_documento(file) as subido:
+            validacion = await cache.obtener(subido.sha256, plan)
+            desde_cache = validacion is not None
 
-        # Limpiar archivo de entrada
-        os.unlink(tmp_in_path)
+            resultado, contenido = await get_ejecutor().ejecutar(
+                tarea_procesar, subido.fuente(), datos, validacion, revalidar, plan.id
+            )
 
-        return resultado
+            if not desde_cache:
+                await cache.guardar(subido.sha256, resultado.validacion, plan)
 
-    except Exception as e:
-        # Asegurar limpieza
-        if 'tmp_in_path' in locals():
-            try:
-                os.unlink(tmp_in_path)
-            except:
-                pass
+        if contenido is None:
+            return resultado
+
+        # El documento formateado ya queda validado para una próxima subida
+        if resultado.validacion_final is not None:
+            await cache.guardar(
+                hashlib.sha256(contenido).hexdigest(), resultado.validacion_final, plan
+            )
+
+        return respuesta_multipart(
+            resultado.model_dump_json(), contenido, file.filename
+        )
 
+    except (ColaLlena, PoolNoDisponible, ArchivoDemasiadoGrande, ReglasDesconocidas):
+        raise
+
+    except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Error al formatear el documento: {str(e)}"
+            detail=f"Error al procesar el documento: {str(e)}"
+        )
+
+
+@app.post("/jobs", response_model=Trabajo, status_code=202)
+async def crear_trabajo(
+    file: UploadFile = File(...),
+    tipo: TipoTrabajo = TipoTrabajo.VALIDAR,
+    titulo: Optional[str] = None,
+    autor: Optional[str] = None,
+    revalidar: bool = False,
+    reglas: Optional[str] = None,
+):
+    """
+    Encola un trabajo de validación, formateo o ambos y responde de inmediato.
+    Las validaciones usan las reglas de `reglas` si se indica.
+
+    El estado y el resultado se consultan con GET /jobs/{id}; el documento
+    formateado, con GET /jobs/{id}/documento.
+    """
+    if not file.filename.endswith(".docx"):
+        raise HTTPException(
+            status_code=400,
+            detail="Solo se permiten archivos .docx"
+        )
+
+    plan = get_reglas().plan(reglas)
+    datos = {}
+    if titulo:
+        datos["titulo"] = titulo
+    if autor:
+        datos["autor"] = autor
+
+    async with recibir_documento(file) as subido:
+        contenido = await run_in_threadpool(subido.contenido)
+        return await get_gestor_trabajos().encolar(
+            tipo, contenido, file.filename, subido.sha256, datos, revalidar, plan.id
         )
 
 
+@app.get("/jobs/{trabajo_id}", response_model=Trabajo)
+async def obtener_trabajo(trabajo_id: str):
+    """Estado, tiempos por etapa y resultado de un trabajo."""
+    trabajo = await get_gestor_trabajos().obtener(trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+
+@app.get("/jobs/{trabajo_id}/documento")
+async def descargar_documento_trabajo(trabajo_id: str):
+    """Documento formateado por un trabajo completado."""
+    gestor = get_gestor_trabajos()
+    trabajo = await gestor.obtener(trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    contenido = await gestor.documento(trabajo_id) if trabajo.tiene_documento else None
+    if contenido is None:
+        raise HTTPException(status_code=404, detail="El trabajo no tiene documento generado")
+    cambios = (trabajo.resultado or {}).get("cambios_realizados") or (
+        (trabajo.resultado or {}).get("formateo", {}).get("cambios_realizados", [])
+    )
+    return respuesta_documento(contenido, trabajo.nombre_archivo, cambios)
+
+
+@app.post("/jobs/{trabajo_id}/cancelar", response_model=Trabajo)
+async def cancelar_trabajo(trabajo_id: str):
+    """Cancela un trabajo en cola o descarta el resultado de uno en proceso."""
+    trabajo = await get_gestor_trabajos().cancelar(trabajo_id)
+    if trabajo is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+
+@app.get("/perfiles/{perfil_id}")
+async def obtener_perfil(perfil_id: str, x_perfilado_token: Optional[str] = Header(None)):
+    """Resumen de un perfil: tiempo por función de validators/formatters y asignaciones."""
+    verificar_token(x_perfilado_token)
+    resumen = leer_resumen(perfil_id)
+    if resumen is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return resumen
+
+
+@app.get("/perfiles/{perfil_id}/datos")
+async def descargar_perfil(perfil_id: str, x_perfilado_token: Optional[str] = Header(None)):
+    """
+    Volcado completo del perfil: pstats (`python -m pstats archivo`) en modo
+    determinista o pilas colapsadas (flamegraph/speedscope) en modo muestreo.
+    """
+    verificar_token(x_perfilado_token)
+    ruta = ruta_datos(perfil_id)
+    if ruta is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    return FileResponse(ruta, filename=os.path.basename(ruta))
+
+
 @app.get("/config")
-async def get_config():
-    """Retorna la configuración de formato actual"""
-    settings = get_settings()
+async def get_config(reglas: Optional[str] = None):
+    """Retorna la configuración de formato actual (o la del conjunto `reglas`)"""
+    plan = get_reglas().plan(reglas)
     return {
+        "reglas": plan.id,
         "pagina": {
-            "ancho_cm": settings.page_width_cm,
-            "alto_cm": settings.page_height_cm,
+            "ancho_cm": plan.pagina.ancho_cm,
+            "alto_cm": plan.pagina.alto_cm,
         },
         "margenes": {
-            "superior_cm": settings.margin_top_cm,
-            "inferior_cm": settings.margin_bottom_cm,
-            "izquierdo_cm": settings.margin_left_cm,
-            "derecho_cm": settings.margin_right_cm,
+            "superior_cm": plan.margenes.superior_cm,
+            "inferior_cm": plan.margenes.inferior_cm,
+            "izquierdo_cm": plan.margenes.izquierdo_cm,
+            "derecho_cm": plan.margenes.derecho_cm,
         },
         "fuente": {
-            "nombre": settings.font_name,
-            "tamano_pt": settings.font_size_pt,
+            "nombre": plan.fuente.nombre,
+            "tamano_pt": plan.tamano_pt,
         },
         "parrafo": {
-            "interlineado": settings.line_spacing,
-            "sangria_primera_linea_cm": settings.first_line_indent_cm,
+            "interlineado": plan.parrafo.interlineado,
+            "sangria_primera_linea_cm": plan.parrafo.sangria_cm,
         },
+        "paginas": plan.paginas.model_dump(),
     }
+
+
+@app.get("/reglas")
+async def listar_reglas():
+    """Conjuntos de reglas de validación disponibles (para ?reglas=)."""
+    registro = get_reglas()
+    return {"por_defecto": registro.settings.rules_default, "reglas": registro.disponibles()}
+
+
+@app.get("/reglas/{reglas_id}")
+async def obtener_reglas(reglas_id: str):
+    """Reglas resueltas de un conjunto, con la herencia y los valores por defecto aplicados."""
+    return get_reglas().plan(reglas_id).reglas.model_dump(mode="json")
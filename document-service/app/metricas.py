@@ -0,0 +1,279 @@
+"""
+Métricas del servicio en formato de exposición de texto de Prometheus.
+
+Registro propio y mínimo (contadores, medidores e histogramas con etiquetas)
+para no depender de un servicio ni de un paquete externo. Las observaciones
+se hacen siempre en el proceso principal: las etapas medidas dentro del pool
+llegan junto con el resultado de cada tarea (ver etapas.ejecutar_medido).
+
+GET /metrics devuelve `exponer()`.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+BUCKETS_SEGUNDOS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+BUCKETS_BYTES = tuple(float(2 ** n) for n in range(14, 31, 2))  # 16 KB .. 1 GB
+BUCKETS_CONTEO = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+Etiquetas = Tuple[str, ...]
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_numero(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+def _etiquetas_texto(nombres: Sequence[str], valores: Sequence[str]) -> str:
+    if not nombres:
+        return ""
+    pares = ",".join(f'{n}="{_escapar(str(v))}"' for n, v in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+
+    def _clave(self, etiquetas: Dict[str, str]) -> Etiquetas:
+        return tuple(str(etiquetas.get(n, "")) for n in self.etiquetas)
+
+    def _lineas(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def exponer(self) -> List[str]:
+        return [
+            f"# HELP {self.nombre} {self.ayuda}",
+            f"# TYPE {self.nombre} {self.tipo}",
+            *self._lineas(),
+        ]
+
+
+class Contador(_Metrica):
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores: Dict[Etiquetas, float] = {}
+
+    def inc(self, valor: float = 1.0, **etiquetas: str) -> None:
+        clave = self._clave(etiquetas)
+        self._valores[clave] = self._valores.get(clave, 0.0) + valor
+
+    def fijar(self, valor: float, **etiquetas: str) -> None:
+        """Copia un valor que se lleva en otro lugar (p. ej. los contadores de la caché)."""
+        self._valores[self._clave(etiquetas)] = valor
+
+    def _lineas(self) -> Iterable[str]:
+        for clave, valor in sorted(self._valores.items()):
+            yield f"{self.nombre}{_etiquetas_texto(self.etiquetas, clave)} {_formatear_numero(valor)}"
+
+
+class Medidor(Contador):
+    tipo = "gauge"
+
+    def dec(self, valor: float = 1.0, **etiquetas: str) -> None:
+        self.inc(-valor, **etiquetas)
+
+
+class Histograma(_Metrica):
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nombre: str,
+        ayuda: str,
+        etiquetas: Sequence[str] = (),
+        buckets: Sequence[float] = BUCKETS_SEGUNDOS,
+    ):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # Por serie: conteos por bucket (no acumulados), suma y total
+        self._series: Dict[Etiquetas, Tuple[List[int], List[float]]] = {}
+
+    def observar(self, valor: float, **etiquetas: str) -> None:
+        clave = self._clave(etiquetas)
+        serie = self._series.get(clave)
+        if serie is None:
+            serie = ([0] * (len(self.buckets) + 1), [0.0, 0.0])
+            self._series[clave] = serie
+        conteos, totales = serie
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                conteos[i] += 1
+                break
+        else:
+            conteos[-1] += 1
+        totales[0] += valor
+        totales[1] += 1
+
+    def _lineas(self) -> Iterable[str]:
+        nombres_le = self.etiquetas + ("le",)
+        for clave, (conteos, (suma, total)) in sorted(self._series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (math.inf,), conteos):
+                acumulado += conteo
+                etiquetas = _etiquetas_texto(nombres_le, clave + (_formatear_numero(limite),))
+                yield f"{self.nombre}_bucket{etiquetas} {acumulado}"
+            etiquetas = _etiquetas_texto(self.etiquetas, clave)
+            yield f"{self.nombre}_sum{etiquetas} {_formatear_numero(suma)}"
+            yield f"{self.nombre}_count{etiquetas} {_formatear_numero(total)}"
+
+
+class MetricasServicio:
+    """Métricas del Document Service."""
+
+    def __init__(self, prefijo: str = "docservice"):
+        p = prefijo
+        self.etapa_duracion = Histograma(
+            f"{p}_etapa_duracion_segundos",
+            "Duración de cada etapa del procesamiento (lectura, carga, validadores, formateadores, guardado)",
+            ("etapa",),
+        )
+        self.tarea_duracion = Histograma(
+            f"{p}_tarea_duracion_segundos",
+            "Duración de las tareas ejecutadas en el pool, incluida la espera en cola",
+            ("tarea",),
+        )
+        self.tareas = Contador(
+            f"{p}_tareas_total",
+            "Tareas ejecutadas en el pool por resultado",
+            ("tarea", "resultado"),
+        )
+        self.tarea_pico_memoria = Histograma(
+            f"{p}_tarea_pico_memoria_bytes",
+            "Pico de memoria residente del proceso que ejecutó la tarea",
+            ("tarea",),
+            BUCKETS_BYTES,
+        )
+        self.documento_tamano = Histograma(
+            f"{p}_documento_tamano_bytes",
+            "Tamaño de los documentos recibidos",
+            buckets=BUCKETS_BYTES,
+        )
+        self.documento_parrafos = Histograma(
+            f"{p}_documento_parrafos",
+            "Párrafos por documento procesado",
+            buckets=BUCKETS_CONTEO,
+        )
+        self.documento_runs = Histograma(
+            f"{p}_documento_runs",
+            "Runs por documento procesado",
+            buckets=BUCKETS_CONTEO,
+        )
+        self.documento_omitido = Histograma(
+            f"{p}_documento_omitido_bytes",
+            "Bytes de imágenes y objetos incrustados que la validación no leyó",
+            buckets=BUCKETS_BYTES,
+        )
+        self.arranque = Medidor(
+            f"{p}_arranque_segundos",
+            "Tiempo de arranque del servidor por fase (importacion, precalentado, worker)",
+            ("fase",),
+        )
+        self.peticiones_en_curso = Medidor(
+            f"{p}_peticiones_en_curso",
+            "Peticiones HTTP que se están atendiendo",
+        )
+        self.peticion_duracion = Histograma(
+            f"{p}_peticion_duracion_segundos",
+            "Duración de las peticiones HTTP hasta el inicio de la respuesta",
+            ("metodo", "ruta", "estado"),
+        )
+        self.pool_pendientes = Medidor(
+            f"{p}_pool_tareas_pendientes",
+            "Tareas admitidas en el pool (en ejecución + en espera)",
+        )
+        self.pool_capacidad = Medidor(
+            f"{p}_pool_capacidad_cola",
+            "Máximo de tareas admitidas en el pool",
+        )
+        self.cache_consultas = Contador(
+            f"{p}_cache_consultas_total",
+            "Consultas a la caché de validaciones por resultado",
+            ("resultado",),
+        )
+        self.cache_ratio_aciertos = Medidor(
+            f"{p}_cache_ratio_aciertos",
+            "Fracción de consultas a la caché de validaciones resueltas sin validar",
+        )
+        self._metricas: List[_Metrica] = [
+            self.etapa_duracion,
+            self.tarea_duracion,
+            self.tareas,
+            self.tarea_pico_memoria,
+            self.documento_tamano,
+            self.documento_parrafos,
+            self.documento_runs,
+            self.documento_omitido,
+            self.arranque,
+            self.peticiones_en_curso,
+            self.peticion_duracion,
+            self.pool_pendientes,
+            self.pool_capacidad,
+            self.cache_consultas,
+            self.cache_ratio_aciertos,
+        ]
+
+    def registrar_tarea(self, tarea: str, segundos: float, medicion=None) -> None:
+        """Tarea terminada en el pool con su medición (ver etapas.Medicion)."""
+        self.tareas.inc(tarea=tarea, resultado="ok")
+        self.tarea_duracion.observar(segundos, tarea=tarea)
+        if medicion is None:
+            return
+        for etapa, duracion in medicion.etapas.items():
+            self.etapa_duracion.observar(duracion, etapa=etapa)
+        if "parrafos" in medicion.valores:
+            self.documento_parrafos.observar(medicion.valores["parrafos"])
+        if "runs" in medicion.valores:
+            self.documento_runs.observar(medicion.valores["runs"])
+        if "bytes_omitidos" in medicion.valores:
+            self.documento_omitido.observar(medicion.valores["bytes_omitidos"])
+        if medicion.pico_memoria_bytes is not None:
+            self.tarea_pico_memoria.observar(medicion.pico_memoria_bytes, tarea=tarea)
+
+    def registrar_fallo(self, tarea: str, resultado: str = "error") -> None:
+        self.tareas.inc(tarea=tarea, resultado=resultado)
+
+    def actualizar_pool(self, ejecutor) -> None:
+        self.pool_pendientes.fijar(ejecutor.pendientes)
+        self.pool_capacidad.fijar(ejecutor.max_queue)
+
+    def actualizar_cache(self, cache) -> None:
+        self.cache_consultas.fijar(cache.aciertos_lru, resultado="lru")
+        self.cache_consultas.fijar(cache.aciertos_backend, resultado="compartida")
+        self.cache_consultas.fijar(cache.fallos, resultado="fallo")
+        aciertos = cache.aciertos_lru + cache.aciertos_backend
+        total = aciertos + cache.fallos
+        self.cache_ratio_aciertos.fijar(aciertos / total if total else 0.0)
+
+    def exponer(self) -> str:
+        lineas: List[str] = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+_metricas: Optional[MetricasServicio] = None
+
+
+def get_metricas() -> MetricasServicio:
+    """Retorna las métricas del proceso, creándolas si aún no existen."""
+    global _metricas
+    if _metricas is None:
+        _metricas = MetricasServicio()
+    return _metricas
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from datetime import datetime
 from enum import Enum
 
 
@@ -19,6 +20,7 @@ class ValidacionItem(BaseModel):
     mensaje: Optional[str] = None
     severidad: Severidad = Severidad.ERROR
     sugerencia: Optional[str] = None
+    pagina: Optional[int] = None  # página estimada (ver validators/maquetacion.py)
 
 
 class ValidacionResultado(BaseModel):
@@ -41,3 +43,42 @@ class FormateoResultado(BaseModel):
     archivo_formateado: Optional[str] = None
     mensaje: str
     cambios_realizados: List[str] = []
+
+
+class ProcesamientoResultado(BaseModel):
+    validacion: ValidacionResultado
+    formateo: FormateoResultado
+    validacion_final: Optional[ValidacionResultado] = None
+
+
+class TipoTrabajo(str, Enum):
+    VALIDAR = "validar"
+    FORMATEAR = "formatear"
+    PROCESAR = "procesar"
+
+
+class EstadoTrabajo(str, Enum):
+    EN_COLA = "EN_COLA"
+    EN_PROCESO = "EN_PROCESO"
+    COMPLETADO = "COMPLETADO"
+    FALLIDO = "FALLIDO"
+    CANCELADO = "CANCELADO"
+
+
+class Trabajo(BaseModel):
+    id: str
+    tipo: TipoTrabajo
+    estado: EstadoTrabajo = EstadoTrabajo.EN_COLA
+    nombre_archivo: str
+    sha256: str
+    datos: Dict[str, Any] = {}
+    revalidar: bool = False
+    reglas: Optional[str] = None  # id del conjunto de reglas de validación
+    creado_en: datetime
+    iniciado_en: Optional[datetime] = None
+    finalizado_en: Optional[datetime] = None
+    # Segundos por etapa (espera, carga, validacion, formateo, guardado, ...)
+    tiempos: Dict[str, float] = {}
+    resultado: Optional[Dict[str, Any]] = None
+    tiene_documento: bool = False
+    error: Optional[str] = None
@@ -0,0 +1,132 @@
+"""
+Carga del paquete .docx solo para validar, sin imágenes ni objetos incrustados.
+
+`Document()` lee del zip todas las partes alcanzables desde las relaciones:
+cada imagen, objeto OLE, gráfico, hoja de Excel incrustada, fuente incrustada
+y la miniatura, aunque ninguna sirve para validar márgenes, fuentes,
+interlineado o estructura. En una tesis con figuras eso son decenas de MB por
+petición.
+
+`abrir_para_validar` arma el mismo Document con un lector del zip que solo
+sigue las relaciones de las partes que usan los validadores (document.xml,
+styles.xml, settings.xml, numbering.xml, el tema, encabezados, pies y notas).
+Las demás relaciones se presentan a python-docx como externas: sus r:id siguen
+existiendo pero la parte nunca se lee ni se descomprime. De cada parte omitida
+solo se anota la ruta, el tipo de relación y el tamaño que declara el zip.
+
+El Document resultante es de solo lectura en la práctica: guardarlo
+perdería las partes omitidas. Para formatear se usa `Document()` completo.
+"""
+import io
+import posixpath
+import zipfile
+from typing import IO, List, NamedTuple, Optional, Tuple, Union
+
+from docx.document import Document as DocumentoDocx
+from docx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from docx.opc.package import Unmarshaller
+from docx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from docx.opc.part import PartFactory
+from docx.opc.pkgreader import PackageReader, _ContentTypeMap
+from docx.package import Package
+from lxml import etree
+
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+# Relaciones que se siguen; el resto de las partes no se lee
+RELACIONES_VALIDACION = frozenset(
+    {
+        RT.OFFICE_DOCUMENT,
+        RT.CORE_PROPERTIES,
+        RT.STYLES,
+        RT.SETTINGS,
+        RT.NUMBERING,
+        RT.THEME,
+        RT.HEADER,
+        RT.FOOTER,
+        RT.FOOTNOTES,
+        RT.ENDNOTES,
+    }
+)
+
+
+class ParteOmitida(NamedTuple):
+    ruta: str  # dentro del zip
+    tipo: str  # último segmento del tipo de relación: image, oleObject, package, chart, ...
+    tamano: int  # bytes sin comprimir, según el directorio del zip
+
+
+class _LectorSinMedia:
+    """
+    Lector del zip con la interfaz de PhysPkgReader de python-docx que marca
+    como externas las relaciones hacia partes que no usa la validación.
+    """
+
+    def __init__(self, archivo: Union[str, IO[bytes]]):
+        self._zip = zipfile.ZipFile(archivo, "r")
+        self.omitidas: List[ParteOmitida] = []
+        self._vistas = set()
+
+    def blob_for(self, pack_uri) -> bytes:
+        return self._zip.read(pack_uri.membername)
+
+    @property
+    def content_types_xml(self) -> bytes:
+        return self.blob_for(CONTENT_TYPES_URI)
+
+    def rels_xml_for(self, source_uri) -> Optional[bytes]:
+        try:
+            rels_xml = self.blob_for(source_uri.rels_uri)
+        except KeyError:
+            return None
+        rels = etree.fromstring(rels_xml)
+        omitio = False
+        for rel in rels.iter(_REL + "Relationship"):
+            if rel.get("TargetMode") == "External" or rel.get("Type") in RELACIONES_VALIDACION:
+                continue
+            rel.set("TargetMode", "External")
+            omitio = True
+            self._anotar(source_uri, rel)
+        return etree.tostring(rels) if omitio else rels_xml
+
+    def _anotar(self, source_uri, rel) -> None:
+        destino = rel.get("Target")
+        if destino.startswith("/"):
+            ruta = destino.lstrip("/")
+        else:
+            ruta = posixpath.normpath(posixpath.join(source_uri.baseURI, destino)).lstrip("/")
+        if ruta in self._vistas:
+            return
+        self._vistas.add(ruta)
+        try:
+            tamano = self._zip.getinfo(ruta).file_size
+        except KeyError:
+            return  # relación rota o hacia una parte que no existe
+        self.omitidas.append(ParteOmitida(ruta, rel.get("Type").rsplit("/", 1)[-1], tamano))
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+def abrir_para_validar(
+    fuente: Union[bytes, str, IO[bytes]],
+) -> Tuple[DocumentoDocx, List[ParteOmitida]]:
+    """
+    Document de python-docx con las partes que usan los validadores, y las
+    partes que no se leyeron (imágenes, objetos incrustados, ...).
+    """
+    archivo = io.BytesIO(fuente) if isinstance(fuente, (bytes, bytearray)) else fuente
+    lector = _LectorSinMedia(archivo)
+    try:
+        content_types = _ContentTypeMap.from_xml(lector.content_types_xml)
+        pkg_srels = PackageReader._srels_for(lector, PACKAGE_URI)
+        sparts = PackageReader._load_serialized_parts(lector, pkg_srels, content_types)
+    finally:
+        lector.close()
+
+    package = Package()
+    Unmarshaller.unmarshal(PackageReader(content_types, pkg_srels, sparts), package, PartFactory)
+    document_part = package.main_document_part
+    if document_part.content_type != CT.WML_DOCUMENT_MAIN:
+        raise ValueError(f"el archivo no es un documento de Word: {document_part.content_type}")
+    return document_part.document, lector.omitidas
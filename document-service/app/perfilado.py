@@ -0,0 +1,303 @@
+"""
+Perfilado bajo demanda de /validar y /formatear.
+
+Con `?perfilar=determinista|muestreo` (o la cabecera X-Perfilar) y el token
+de PROFILING_TOKEN en la cabecera X-Perfilado-Token, la tarea se ejecuta en
+el pool bajo un perfilador:
+
+- determinista: cProfile; se guarda el volcado pstats
+- muestreo: se muestrea la pila del hilo cada `profiling_intervalo_ms` y se
+  guardan las pilas colapsadas (formato de flamegraph.pl / speedscope)
+
+En ambos modos se activa tracemalloc para las asignaciones principales. El
+perfil se guarda en profiling_dir y la respuesta lleva su id en la cabecera
+X-Perfil-Id; GET /perfiles/{id} devuelve el resumen atribuido a las funciones
+de app/validators y app/formatters y GET /perfiles/{id}/datos el volcado.
+"""
+import cProfile
+import hmac
+import json
+import marshal
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from .config import Settings, get_settings
+
+MODOS = ("determinista", "muestreo")
+
+# Paquetes a los que se atribuye el tiempo en el resumen
+_APP = os.path.dirname(os.path.abspath(__file__))
+PAQUETES_ATRIBUIDOS = {
+    "validators": os.path.join(_APP, "validators") + os.sep,
+    "formatters": os.path.join(_APP, "formatters") + os.sep,
+}
+
+MAX_FUNCIONES_RESUMEN = 30
+MAX_ASIGNACIONES = 15
+
+
+class PerfiladoNoAutorizado(Exception):
+    """Se pidió perfilar sin un token válido (o el perfilado está desactivado)."""
+
+    def __init__(self):
+        super().__init__("Perfilado no autorizado")
+
+
+class Perfil(NamedTuple):
+    id: str
+    modo: str
+    resumen: Dict[str, Any]
+    datos: bytes  # volcado pstats o pilas colapsadas
+
+
+def verificar_token(token: Optional[str], settings: Optional[Settings] = None) -> None:
+    """Lanza PerfiladoNoAutorizado si `token` no coincide con profiling_token."""
+    esperado = (settings or get_settings()).profiling_token
+    if not esperado or not token or not hmac.compare_digest(token.encode(), esperado.encode()):
+        raise PerfiladoNoAutorizado()
+
+
+def modo_solicitado(
+    perfilar: Optional[str],
+    token: Optional[str],
+    settings: Optional[Settings] = None,
+) -> Optional[str]:
+    """
+    Modo de perfilado pedido en la petición, o None si no se pidió.
+
+    Lanza PerfiladoNoAutorizado si se pidió y el token no coincide con
+    profiling_token (o no hay token configurado).
+    """
+    if not perfilar:
+        return None
+    verificar_token(token, settings)
+    return perfilar if perfilar in MODOS else "determinista"
+
+
+def _paquete(archivo: str) -> Optional[str]:
+    archivo = os.path.abspath(archivo)
+    for nombre, ruta in PAQUETES_ATRIBUIDOS.items():
+        if archivo.startswith(ruta):
+            return nombre
+    return None
+
+
+def _relativa(archivo: str) -> str:
+    archivo = os.path.abspath(archivo)
+    base = os.path.dirname(_APP)
+    return os.path.relpath(archivo, base) if archivo.startswith(base) else archivo
+
+
+# -- Muestreo -------------------------------------------------------------
+
+
+class _Muestreador(threading.Thread):
+    """Toma la pila del hilo `hilo_id` cada `intervalo` segundos."""
+
+    def __init__(self, hilo_id: int, intervalo: float):
+        super().__init__(name="perfilado-muestreo", daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas: Counter = Counter()
+        self._parar = threading.Event()
+
+    def run(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            marcos = []
+            while frame is not None:
+                code = frame.f_code
+                marcos.append((code.co_filename, code.co_name))
+                frame = frame.f_back
+            if marcos:
+                self.pilas[tuple(reversed(marcos))] += 1
+
+    def detener(self) -> None:
+        self._parar.set()
+        self.join()
+
+
+def _colapsadas(pilas: Counter) -> bytes:
+    lineas = []
+    for pila, muestras in pilas.most_common():
+        marcos = ";".join(f"{_relativa(archivo)}:{funcion}" for archivo, funcion in pila)
+        lineas.append(f"{marcos} {muestras}")
+    return ("\n".join(lineas) + "\n").encode()
+
+
+def _resumen_muestreo(pilas: Counter, intervalo: float) -> List[Dict[str, Any]]:
+    # Muestras en las que aparece cada función (tiempo inclusivo) y en la cima (propio)
+    inclusivas: Counter = Counter()
+    propias: Counter = Counter()
+    for pila, muestras in pilas.items():
+        for marco in set(pila):
+            if _paquete(marco[0]):
+                inclusivas[marco] += muestras
+        if _paquete(pila[-1][0]):
+            propias[pila[-1]] += muestras
+    return [
+        {
+            "paquete": _paquete(archivo),
+            "funcion": f"{_relativa(archivo)}:{funcion}",
+            "muestras": muestras,
+            "tiempo_acumulado_s": round(muestras * intervalo, 6),
+            "tiempo_propio_s": round(propias[(archivo, funcion)] * intervalo, 6),
+        }
+        for (archivo, funcion), muestras in inclusivas.most_common(MAX_FUNCIONES_RESUMEN)
+    ]
+
+
+# -- cProfile -------------------------------------------------------------
+
+
+def _resumen_cprofile(stats: Dict) -> List[Dict[str, Any]]:
+    filas = []
+    for (archivo, linea, funcion), (_, llamadas, propio, acumulado, _) in stats.items():
+        paquete = _paquete(archivo)
+        if paquete is None:
+            continue
+        filas.append(
+            {
+                "paquete": paquete,
+                "funcion": f"{_relativa(archivo)}:{linea}:{funcion}",
+                "llamadas": llamadas,
+                "tiempo_acumulado_s": round(acumulado, 6),
+                "tiempo_propio_s": round(propio, 6),
+            }
+        )
+    filas.sort(key=lambda f: f["tiempo_acumulado_s"], reverse=True)
+    return filas[:MAX_FUNCIONES_RESUMEN]
+
+
+# -- Ejecución en el pool -------------------------------------------------
+
+
+def _asignaciones(snapshot: tracemalloc.Snapshot) -> Dict[str, List[Dict[str, Any]]]:
+    def filas(estadisticas) -> List[Dict[str, Any]]:
+        return [
+            {
+                "ubicacion": f"{_relativa(e.traceback[0].filename)}:{e.traceback[0].lineno}",
+                "tamano_bytes": e.size,
+                "bloques": e.count,
+            }
+            for e in estadisticas[:MAX_ASIGNACIONES]
+        ]
+
+    estadisticas = snapshot.statistics("lineno")
+    propias = [e for e in estadisticas if _paquete(e.traceback[0].filename)]
+    return {"principales": filas(estadisticas), "validators_formatters": filas(propias)}
+
+
+def tarea_perfilada(
+    modo: str,
+    intervalo_ms: float,
+    fn: Callable[..., Any],
+    *args: Any,
+) -> Tuple[Any, Perfil]:
+    """Ejecuta fn(*args) bajo el perfilador de `modo` y retorna (resultado, perfil)."""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        if modo == "muestreo":
+            intervalo = max(intervalo_ms, 0.1) / 1000
+            muestreador = _Muestreador(threading.get_ident(), intervalo)
+            muestreador.start()
+            try:
+                resultado = fn(*args)
+            finally:
+                muestreador.detener()
+            funciones = _resumen_muestreo(muestreador.pilas, intervalo)
+            datos = _colapsadas(muestreador.pilas)
+        else:
+            perfilador = cProfile.Profile()
+            perfilador.enable()
+            try:
+                resultado = fn(*args)
+            finally:
+                perfilador.disable()
+            perfilador.create_stats()
+            funciones = _resumen_cprofile(perfilador.stats)
+            # Mismo formato que pstats.Stats.dump_stats
+            datos = marshal.dumps(perfilador.stats)
+        duracion = time.perf_counter() - inicio
+        asignaciones = _asignaciones(tracemalloc.take_snapshot())
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    resumen = {
+        "tarea": getattr(fn, "__name__", "tarea"),
+        "modo": modo,
+        "duracion_s": round(duracion, 6),
+        "pico_tracemalloc_bytes": pico,
+        "funciones": funciones,
+        "asignaciones": asignaciones,
+    }
+    return resultado, Perfil(uuid.uuid4().hex, modo, resumen, datos)
+
+
+# -- Almacenamiento -------------------------------------------------------
+
+
+def _directorio(settings: Settings) -> str:
+    return settings.profiling_dir or os.path.join(tempfile.gettempdir(), "tesis-perfiles")
+
+
+def _extension(modo: str) -> str:
+    return ".folded" if modo == "muestreo" else ".pstats"
+
+
+def guardar_perfil(perfil: Perfil, settings: Optional[Settings] = None) -> None:
+    """Guarda el resumen y el volcado, conservando los profiling_max_perfiles más recientes."""
+    settings = settings or get_settings()
+    directorio = _directorio(settings)
+    os.makedirs(directorio, exist_ok=True)
+    with open(os.path.join(directorio, perfil.id + _extension(perfil.modo)), "wb") as f:
+        f.write(perfil.datos)
+    with open(os.path.join(directorio, perfil.id + ".json"), "w", encoding="utf-8") as f:
+        json.dump(perfil.resumen, f, ensure_ascii=False, indent=2)
+
+    resumenes = sorted(
+        (e for e in os.scandir(directorio) if e.name.endswith(".json")),
+        key=lambda e: e.stat().st_mtime,
+    )
+    for entrada in resumenes[: max(len(resumenes) - settings.profiling_max_perfiles, 0)]:
+        perfil_id = entrada.name[:-5]
+        for extension in (".json", ".pstats", ".folded"):
+            try:
+                os.unlink(os.path.join(directorio, perfil_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+def _ruta(perfil_id: str, extension: str, settings: Settings) -> Optional[str]:
+    # Los ids son uuid4 en hexadecimal; cualquier otra cosa no es un perfil
+    if len(perfil_id) != 32 or not all(c in "0123456789abcdef" for c in perfil_id):
+        return None
+    ruta = os.path.join(_directorio(settings), perfil_id + extension)
+    return ruta if os.path.exists(ruta) else None
+
+
+def leer_resumen(perfil_id: str, settings: Optional[Settings] = None) -> Optional[Dict[str, Any]]:
+    ruta = _ruta(perfil_id, ".json", settings or get_settings())
+    if ruta is None:
+        return None
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ruta_datos(perfil_id: str, settings: Optional[Settings] = None) -> Optional[str]:
+    """Ruta del volcado pstats o de las pilas colapsadas del perfil."""
+    settings = settings or get_settings()
+    for modo in MODOS:
+        ruta = _ruta(perfil_id, _extension(modo), settings)
+        if ruta is not None:
+            return ruta
+    return None
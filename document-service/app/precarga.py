@@ -0,0 +1,25 @@
+"""
+Precarga del forkserver de los pools de procesos (ver
+ejecucion._contexto_multiproceso).
+
+El forkserver importa este módulo una vez al arrancar: carga las tareas,
+precalienta validando y formateando un documento mínimo y congela el heap
+(`gc.freeze`), igual que el master de app.servidor antes de forkear los
+workers HTTP. Cada proceso del pool (también los que reemplazan a los
+reciclados por max_tasks_per_child) nace de ese estado, sin volver a
+compilar patrones ni autómatas y sin copiar esas páginas al recolectar.
+"""
+import gc
+import logging
+
+from . import tareas  # noqa: F401
+from .ejecucion import precalentar
+
+try:
+    precalentar()
+except Exception:
+    # Un error aquí dejaría sin forkserver al pool: los procesos arrancan fríos
+    logging.getLogger(__name__).exception("No se pudo precalentar el forkserver")
+
+gc.collect()
+gc.freeze()
@@ -0,0 +1,102 @@
+"""
+Respuestas HTTP que devuelven el documento generado.
+
+El contenido se envía por bloques desde memoria, sin pasar por archivos
+temporales.
+"""
+import json
+import uuid
+from typing import Iterator, List
+from urllib.parse import quote
+
+from fastapi.responses import StreamingResponse
+
+MEDIA_TYPE_DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TAMANO_BLOQUE = 64 * 1024
+
+
+def iterar_bloques(contenido: bytes, tamano: int = TAMANO_BLOQUE) -> Iterator[bytes]:
+    vista = memoryview(contenido)
+    for inicio in range(0, len(vista), tamano):
+        yield bytes(vista[inicio:inicio + tamano])
+
+
+def nombre_formateado(nombre_original: str) -> str:
+    """tesis.docx -> tesis_formateado.docx"""
+    base = nombre_original[:-5] if nombre_original.lower().endswith(".docx") else nombre_original
+    return f"{base or 'documento'}_formateado.docx"
+
+
+def content_disposition(nombre: str) -> str:
+    # filename en ASCII para clientes antiguos y filename* (RFC 5987) con el nombre real
+    ascii_nombre = nombre.encode("ascii", "replace").decode().replace('"', "")
+    return f"attachment; filename=\"{ascii_nombre}\"; filename*=UTF-8''{quote(nombre)}"
+
+
+def respuesta_documento(
+    contenido: bytes,
+    nombre_original: str,
+    cambios_realizados: List[str],
+) -> StreamingResponse:
+    """
+    Documento formateado como descarga.
+
+    La lista de cambios viaja en la cabecera X-Cambios-Realizados como JSON
+    (escapado a ASCII, ya que las cabeceras HTTP no admiten UTF-8).
+    """
+    return StreamingResponse(
+        iterar_bloques(contenido),
+        media_type=MEDIA_TYPE_DOCX,
+        headers={
+            "Content-Length": str(len(contenido)),
+            "Content-Disposition": content_disposition(nombre_formateado(nombre_original)),
+            "X-Cambios-Realizados": json.dumps(cambios_realizados),
+            "Access-Control-Expose-Headers": "X-Cambios-Realizados, Content-Disposition",
+        },
+    )
+
+
+def respuesta_multipart(
+    resultado_json: str,
+    contenido: bytes,
+    nombre_original: str,
+) -> StreamingResponse:
+    """
+    Respuesta multipart/form-data con dos partes:
+    - "resultado": el JSON con los reportes
+    - "documento": el .docx formateado
+
+    En el frontend se lee con `await response.formData()`.
+    """
+    boundary = uuid.uuid4().hex
+    nombre = nombre_formateado(nombre_original)
+
+    cabecera_resultado = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="resultado"\r\n'
+        "Content-Type: application/json; charset=utf-8\r\n\r\n"
+    ).encode()
+    cabecera_documento = (
+        f"\r\n--{boundary}\r\n"
+        f"Content-Disposition: form-data; name=\"documento\"; filename=\"{quote(nombre)}\"\r\n"
+        f"Content-Type: {MEDIA_TYPE_DOCX}\r\n\r\n"
+    ).encode()
+    cierre = f"\r\n--{boundary}--\r\n".encode()
+    cuerpo_resultado = resultado_json.encode()
+
+    def partes() -> Iterator[bytes]:
+        yield cabecera_resultado
+        yield cuerpo_resultado
+        yield cabecera_documento
+        yield from iterar_bloques(contenido)
+        yield cierre
+
+    longitud = (
+        len(cabecera_resultado) + len(cuerpo_resultado)
+        + len(cabecera_documento) + len(contenido) + len(cierre)
+    )
+    return StreamingResponse(
+        partes(),
+        media_type=f"multipart/form-data; boundary={boundary}",
+        headers={"Content-Length": str(longitud)},
+    )
@@ -0,0 +1,339 @@
+"""
+Servidor de producción: un master que pre-forkea workers de uvicorn.
+
+    python -m app.servidor
+
+El master abre el socket, importa la aplicación (FastAPI, pydantic, docx,
+lxml, validadores y formateadores) y la precalienta validando y formateando
+un documento mínimo, de modo que los patrones compilados, los autómatas de
+secciones y las clases de lxml/python-docx ya están en memoria. Luego
+congela el heap (`gc.freeze`) y hace fork de los workers: todos comparten
+esas páginas copy-on-write y cada uno arranca sin volver a importar nada.
+
+- Número de workers: settings.server_workers, o según las CPUs disponibles
+  (afinidad y cuota del cgroup) acotado por la memoria del contenedor y
+  server_worker_memory_mb. Las CPUs se reparten entre los pools de procesos
+  de los workers si pool_workers no está fijado.
+- Reciclado: cada worker termina ordenadamente tras server_max_requests
+  peticiones (más un jitter) y el master lo reemplaza con un fork nuevo.
+  SIGHUP recicla todos los workers de a uno: arranca el reemplazo, espera a
+  que acepte peticiones (lo avisa por un pipe) y recién entonces detiene al
+  worker viejo. SIGTERM/SIGINT los detienen esperando las peticiones en curso
+  (server_graceful_timeout_s).
+- Al arrancar se informa el tiempo de importación, de precalentado y de
+  cada worker hasta quedar listo, también en /metrics
+  (docservice_arranque_segundos).
+
+Cada worker levanta su propio pool, caché LRU y gestor de trabajos en el
+lifespan de la aplicación, después del fork. Por eso con más de un worker los
+trabajos deben usar un backend compartido (sqlite): cada trabajo en proceso
+lleva el pid de su worker y un lease, así que un worker reciclado o nuevo no
+repite los trabajos de los demás (ver trabajos.py). En plataformas sin fork
+se ejecuta un único uvicorn.
+
+Los pools de procesos de cada worker arrancan sus procesos desde un
+forkserver propio, no desde el master; el forkserver se precalienta y congela
+su heap igual al arrancar (ver precarga.py).
+"""
+import gc
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+from .config import Settings, get_settings
+from .ejecucion import cpus_disponibles, precalentar
+
+logger = logging.getLogger("app.servidor")
+
+# Reintento tras un worker que muere al poco de arrancar
+ESPERA_REINICIO_S = 1.0
+ARRANQUE_MINIMO_S = 5.0
+
+
+def memoria_disponible() -> Optional[int]:
+    """Límite de memoria del cgroup, o la memoria total del equipo (bytes)."""
+    for ruta in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(ruta) as f:
+                valor = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 sin límite reporta un número enorme
+        if valor != "max" and int(valor) < 1 << 60:
+            return int(valor)
+        break
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def numero_workers_servidor(settings: Settings) -> int:
+    """Workers HTTP: los configurados, o uno por CPU mientras quepan en memoria."""
+    if settings.server_workers is not None:
+        return max(settings.server_workers, 1)
+    workers = cpus_disponibles()
+    memoria = memoria_disponible()
+    if memoria is not None and settings.server_worker_memory_mb > 0:
+        workers = min(workers, memoria // (settings.server_worker_memory_mb * 1024 * 1024))
+    return max(int(workers), 1)
+
+
+def ajustar_settings(settings: Settings, workers: int) -> None:
+    """Reparte las CPUs entre los pools y exige un backend de trabajos compartido."""
+    if settings.pool_workers is None and workers > 1:
+        settings.pool_workers = max(1, cpus_disponibles() // workers)
+    if workers > 1 and settings.jobs_backend == "memory":
+        logger.warning(
+            "JOBS_BACKEND=memory no se comparte entre %d workers; se usa sqlite (%s)",
+            workers,
+            settings.jobs_sqlite_path,
+        )
+        settings.jobs_backend = "sqlite"
+
+
+def _socket_escucha(host: str, puerto: int) -> socket.socket:
+    familia = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(familia, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, puerto))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Master:
+    """Master pre-fork: precalienta, forkea los workers y los reemplaza al salir."""
+
+    def __init__(self, settings: Settings, workers: int):
+        self.settings = settings
+        self.workers = workers
+        self.arranque: Dict[str, float] = {}
+        self._hijos: Dict[int, float] = {}  # pid -> instante del fork
+        self._avisos: Dict[int, int] = {}  # pid -> pipe por el que avisa que está listo
+        self._por_reciclar: List[int] = []  # workers viejos que esperan su reemplazo
+        self._reemplazo: Optional[int] = None  # reemplazo en arranque del primero
+        self._senales: List[int] = []
+        self._deteniendo = False
+        self._sock: Optional[socket.socket] = None
+        self._app = None
+
+    def ejecutar(self) -> int:
+        inicio = time.perf_counter()
+        self._sock = _socket_escucha(self.settings.server_host, self.settings.server_port)
+
+        from .main import app
+
+        self._app = app
+        self.arranque["importacion"] = time.perf_counter() - inicio
+        t = time.perf_counter()
+        precalentar()
+        self.arranque["precalentado"] = time.perf_counter() - t
+
+        # Lo creado hasta aquí no lo recorre más el GC: no se copian sus
+        # páginas en los workers al actualizar contadores de generación
+        gc.collect()
+        gc.freeze()
+
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+            signal.signal(sig, self._recibir_senal)
+        for _ in range(self.workers):
+            self._forkear()
+        logger.info(
+            "Master %d escuchando en %s:%d con %d workers (pool_workers=%s c/u): "
+            "importación %.2f s, precalentado %.2f s",
+            os.getpid(),
+            self.settings.server_host,
+            self.settings.server_port,
+            self.workers,
+            self.settings.pool_workers,
+            self.arranque["importacion"],
+            self.arranque["precalentado"],
+        )
+
+        while self._hijos:
+            time.sleep(0.5)
+            while self._senales:
+                self._atender(self._senales.pop(0))
+            self._recoger()
+            self._reciclar()
+        return 0
+
+    # -- Señales -----------------------------------------------------------
+
+    def _recibir_senal(self, sig, _frame) -> None:
+        self._senales.append(sig)
+
+    def _atender(self, sig: int) -> None:
+        if sig == signal.SIGHUP and not self._deteniendo:
+            viejos = [
+                pid for pid in self._hijos
+                if pid != self._reemplazo and pid not in self._por_reciclar
+            ]
+            logger.info("Reciclando %d workers de a uno", len(viejos))
+            self._por_reciclar.extend(viejos)
+            self._reciclar()
+            return
+        if not self._deteniendo:
+            logger.info("Deteniendo workers")
+            self._deteniendo = True
+            self._por_reciclar.clear()
+            for pid in list(self._hijos):
+                self._senalar(pid, signal.SIGTERM)
+            limite = time.monotonic() + self.settings.server_graceful_timeout_s + 5
+            while self._hijos and time.monotonic() < limite:
+                time.sleep(0.1)
+                self._recoger()
+            for pid in list(self._hijos):
+                self._senalar(pid, signal.SIGKILL)
+
+    def _senalar(self, pid: int, sig: int) -> None:
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    # -- Workers -----------------------------------------------------------
+
+    def _reciclar(self) -> None:
+        """
+        Avanza el reciclado por SIGHUP: un reemplazo a la vez, y el worker
+        viejo recibe SIGTERM solo cuando su reemplazo ya acepta peticiones.
+        """
+        while self._por_reciclar and not self._deteniendo:
+            viejo = self._por_reciclar[0]
+            if viejo not in self._hijos:
+                # Terminó por su cuenta (p. ej. max_requests) y ya se reemplazó
+                self._por_reciclar.pop(0)
+                continue
+            if self._reemplazo is None or self._reemplazo not in self._hijos:
+                self._reemplazo = self._forkear()
+                return
+            if not self._listo(self._reemplazo):
+                return
+            logger.info("Worker %d reemplazado por %d", viejo, self._reemplazo)
+            self._reemplazo = None
+            self._por_reciclar.pop(0)
+            self._senalar(viejo, signal.SIGTERM)
+
+    def _listo(self, pid: int) -> bool:
+        """Si el worker ya avisó que acepta peticiones (sin esperar)."""
+        aviso = self._avisos.get(pid)
+        if aviso is None:
+            return True
+        if not select.select([aviso], [], [], 0)[0] or os.read(aviso, 1) != b"1":
+            # Sigue arrancando, o terminó antes de estar listo (_recoger lo quita)
+            return False
+        os.close(self._avisos.pop(pid))
+        return True
+
+    def _recoger(self) -> None:
+        while self._hijos:
+            try:
+                pid, estado = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._hijos.clear()
+                return
+            if pid == 0:
+                return
+            inicio = self._hijos.pop(pid, None)
+            aviso = self._avisos.pop(pid, None)
+            if aviso is not None:
+                os.close(aviso)
+            if inicio is None or self._deteniendo:
+                continue
+            codigo = os.waitstatus_to_exitcode(estado)
+            vivio = time.monotonic() - inicio
+            # uvicorn vuelve a lanzar la señal tras cerrar ordenadamente
+            if codigo not in (0, -signal.SIGTERM, -signal.SIGINT):
+                logger.warning("Worker %d terminó con código %d tras %.1f s", pid, codigo, vivio)
+                if vivio < ARRANQUE_MINIMO_S:
+                    time.sleep(ESPERA_REINICIO_S)
+            # Los reciclados por SIGHUP ya tienen reemplazo
+            if len(self._hijos) < self.workers:
+                self._forkear()
+
+    def _forkear(self) -> int:
+        max_requests = self.settings.server_max_requests
+        if max_requests:
+            max_requests += random.randint(0, max(self.settings.server_max_requests_jitter, 0))
+        inicio = time.monotonic()
+        lectura, escritura = os.pipe()
+        pid = os.fork()
+        if pid:
+            os.close(escritura)
+            self._hijos[pid] = inicio
+            self._avisos[pid] = lectura
+            return pid
+        codigo = 1
+        try:
+            os.close(lectura)
+            for aviso in self._avisos.values():
+                os.close(aviso)
+            codigo = _ejecutar_worker(
+                self._app, self._sock, self.settings, max_requests, self.arranque, escritura
+            )
+        except BaseException:
+            logger.exception("Error en el worker %d", os.getpid())
+        finally:
+            os._exit(codigo)
+
+
+def _ejecutar_worker(
+    app, sock: socket.socket, settings: Settings, max_requests, arranque, aviso: int
+) -> int:
+    import uvicorn
+
+    from .metricas import get_metricas
+
+    inicio = time.perf_counter()
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP):
+        signal.signal(sig, signal.SIG_DFL)
+    random.seed()
+
+    class ServidorWorker(uvicorn.Server):
+        async def startup(self, sockets=None) -> None:
+            await super().startup(sockets=sockets)
+            if self.should_exit:
+                return
+            # El master espera este aviso para detener al worker que reemplaza
+            os.write(aviso, b"1")
+            os.close(aviso)
+            listo = time.perf_counter() - inicio
+            metricas = get_metricas()
+            for fase, segundos in arranque.items():
+                metricas.arranque.fijar(segundos, fase=fase)
+            metricas.arranque.fijar(listo, fase="worker")
+            logger.info("Worker %d listo en %.2f s", os.getpid(), listo)
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        limit_max_requests=max_requests or None,
+        timeout_graceful_shutdown=settings.server_graceful_timeout_s,
+    )
+    ServidorWorker(config).run(sockets=[sock])
+    return 0
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:     %(message)s")
+    settings = get_settings()
+    if not hasattr(os, "fork"):
+        import uvicorn
+
+        uvicorn.run("app.main:app", host=settings.server_host, port=settings.server_port)
+        return 0
+    workers = numero_workers_servidor(settings)
+    ajustar_settings(settings, workers)
+    return Master(settings, workers).ejecutar()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
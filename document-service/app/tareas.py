@@ -0,0 +1,195 @@
+"""
+Tareas que se ejecutan dentro de los procesos del pool.
+
+Deben ser funciones de nivel de módulo (serializables con pickle) y recibir
+solo argumentos simples, ya que se envían a otro proceso.
+"""
+import io
+from typing import Any, Dict, Optional, Tuple
+
+from .models import (
+    ValidacionResultado,
+    FormateoResultado,
+    ProcesamientoResultado,
+    TipoTrabajo,
+)
+from .config import get_settings
+from .validators import (
+    validar_documento_completo,
+    validar_snapshot,
+    construir_snapshot_xml,
+    construir_snapshot_incremental,
+    plan_reglas,
+    serializar_estado,
+    deserializar_estado,
+)
+from .formatters import formatear_documento
+from .ingesta import (
+    FuenteDocumento,
+    abrir_documento,
+    abrir_documento_validacion,
+    guardar_documento,
+)
+from .etapas import Cronometro
+
+
+def _motor_xml() -> bool:
+    return get_settings().validation_engine == "xml"
+
+
+def tarea_validar(fuente: FuenteDocumento, reglas: Optional[str] = None) -> ValidacionResultado:
+    """Carga el documento y ejecuta todas las validaciones con las reglas indicadas."""
+    plan = plan_reglas(reglas)
+    if _motor_xml():
+        return validar_snapshot(construir_snapshot_xml(fuente), plan)
+    doc = abrir_documento_validacion(fuente)
+    return validar_documento_completo(doc, plan)
+
+
+def tarea_validar_incremental(
+    fuente: FuenteDocumento,
+    estado: Optional[bytes] = None,
+    reglas: Optional[str] = None,
+) -> Tuple[ValidacionResultado, bytes, int, int]:
+    """
+    Valida una nueva versión reutilizando los párrafos sin cambios del
+    estado guardado de la versión anterior.
+
+    Retorna (resultado, estado nuevo, párrafos revalidados, párrafos totales).
+    """
+    snapshot, nuevo, revalidados = construir_snapshot_incremental(
+        fuente, deserializar_estado(estado)
+    )
+    resultado = validar_snapshot(snapshot, plan_reglas(reglas))
+    total = len(snapshot.parrafos) + len(snapshot.adicionales)
+    return resultado, serializar_estado(nuevo), revalidados, total
+
+
+def tarea_linaje(
+    fuente: FuenteDocumento, estado: Optional[bytes] = None
+) -> Tuple[bytes, int, int]:
+    """
+    Solo actualiza el linaje a una versión cuyo resultado ya está en la
+    caché, sin validarla.
+
+    Retorna (estado nuevo, párrafos revalidados, párrafos totales).
+    """
+    snapshot, nuevo, revalidados = construir_snapshot_incremental(
+        fuente, deserializar_estado(estado)
+    )
+    total = len(snapshot.parrafos) + len(snapshot.adicionales)
+    return serializar_estado(nuevo), revalidados, total
+
+
+def tarea_formatear(
+    fuente: FuenteDocumento,
+    ruta_salida: str,
+    datos: Optional[Dict] = None,
+) -> FormateoResultado:
+    """Carga el documento, aplica el formato y lo guarda en ruta_salida."""
+    doc = abrir_documento(fuente)
+    return formatear_documento(doc, ruta_salida, datos, fuente)
+
+
+def tarea_formatear_bytes(
+    fuente: FuenteDocumento,
+    datos: Optional[Dict] = None,
+) -> Tuple[FormateoResultado, Optional[bytes]]:
+    """Igual que tarea_formatear, pero retorna el documento en memoria."""
+    doc = abrir_documento(fuente)
+    salida = io.BytesIO()
+    resultado = formatear_documento(doc, salida, datos, fuente)
+    return resultado, salida.getvalue() if resultado.exito else None
+
+
+def tarea_procesar(
+    fuente: FuenteDocumento,
+    datos: Optional[Dict] = None,
+    validacion: Optional[ValidacionResultado] = None,
+    revalidar: bool = False,
+    reglas: Optional[str] = None,
+) -> Tuple[ProcesamientoResultado, Optional[bytes]]:
+    """
+    Valida, formatea y (opcionalmente) vuelve a validar con una sola carga.
+
+    Si se recibe `validacion` (p. ej. desde la caché) no se repite la
+    validación inicial. La revalidación usa el mismo árbol ya formateado en
+    memoria, sin volver a leer el archivo generado.
+    """
+    plan = plan_reglas(reglas)
+    doc = abrir_documento(fuente)
+    if validacion is None:
+        validacion = validar_documento_completo(doc, plan)
+
+    salida = io.BytesIO()
+    formateo = formatear_documento(doc, salida, datos, fuente)
+    if not formateo.exito:
+        return ProcesamientoResultado(validacion=validacion, formateo=formateo), None
+
+    validacion_final = validar_documento_completo(doc, plan) if revalidar else None
+    resultado = ProcesamientoResultado(
+        validacion=validacion,
+        formateo=formateo,
+        validacion_final=validacion_final,
+    )
+    return resultado, salida.getvalue()
+
+
+def tarea_trabajo(
+    tipo: TipoTrabajo,
+    fuente: FuenteDocumento,
+    datos: Optional[Dict] = None,
+    revalidar: bool = False,
+    reglas: Optional[str] = None,
+) -> Tuple[Dict[str, Any], Optional[bytes], Dict[str, float]]:
+    """
+    Ejecuta un trabajo asíncrono midiendo cada etapa.
+
+    Retorna (resultado serializado, documento generado o None, tiempos).
+    """
+    cron = Cronometro()
+    plan = plan_reglas(reglas)
+    if tipo == TipoTrabajo.VALIDAR and _motor_xml():
+        with cron.etapa("carga"):
+            snapshot = construir_snapshot_xml(fuente)
+        with cron.etapa("validacion"):
+            validacion = validar_snapshot(snapshot, plan)
+        return validacion.model_dump(mode="json"), None, cron.etapas
+
+    if tipo == TipoTrabajo.VALIDAR:
+        with cron.etapa("carga"):
+            doc = abrir_documento_validacion(fuente)
+        with cron.etapa("validacion"):
+            validacion = validar_documento_completo(doc, plan)
+        return validacion.model_dump(mode="json"), None, cron.etapas
+
+    with cron.etapa("carga"):
+        doc = abrir_documento(fuente)
+
+    validacion = None
+    if tipo == TipoTrabajo.PROCESAR:
+        with cron.etapa("validacion"):
+            validacion = validar_documento_completo(doc, plan)
+
+    with cron.etapa("formateo"):
+        formateo = formatear_documento(doc, None, datos)
+
+    contenido = None
+    if formateo.exito:
+        with cron.etapa("guardado"):
+            contenido = guardar_documento(doc, fuente)
+
+    if tipo == TipoTrabajo.FORMATEAR:
+        return formateo.model_dump(mode="json"), contenido, cron.etapas
+
+    validacion_final = None
+    if revalidar and formateo.exito:
+        with cron.etapa("revalidacion"):
+            validacion_final = validar_documento_completo(doc, plan)
+
+    resultado = ProcesamientoResultado(
+        validacion=validacion,
+        formateo=formateo,
+        validacion_final=validacion_final,
+    )
+    return resultado.model_dump(mode="json"), contenido, cron.etapas
@@ -0,0 +1,569 @@
+"""
+Trabajos asíncronos de validación y formateo.
+
+POST /jobs encola el documento y responde de inmediato con el id; un grupo de
+consumidores toma los trabajos de la cola y los ejecuta en el pool de
+procesos (ver ejecucion.py). El estado, el resultado y el documento generado
+se guardan en un backend intercambiable:
+
+- BackendTrabajosMemoria: en el propio proceso (se pierde al reiniciar)
+- BackendTrabajosSQLite: archivo local, sobrevive a reinicios y se comparte
+  entre los workers de app.servidor
+
+Cada trabajo EN_PROCESO tiene un dueño (el pid que lo tomó) y un lease que
+el dueño renueva mientras lo ejecuta. Solo vuelven a la cola los trabajos
+cuyo dueño terminó o cuyo lease venció, así que un worker que arranca no
+repite los trabajos que otro sigue ejecutando. Los consumidores revisan la
+tabla cada jobs_poll_s aunque nadie los despierte, para tomar lo que encolan
+otros workers o lo que dejó uno que terminó.
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Deque, Dict, List, Optional, Protocol
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import Settings, get_settings
+from .ejecucion import ColaLlena, PoolNoDisponible, get_ejecutor
+from .models import EstadoTrabajo, TipoTrabajo, Trabajo
+from .tareas import tarea_trabajo
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_FINALES = (
+    EstadoTrabajo.COMPLETADO,
+    EstadoTrabajo.FALLIDO,
+    EstadoTrabajo.CANCELADO,
+)
+
+
+def _ahora() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _proceso_vivo(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class BackendTrabajos(Protocol):
+    """Almacén de trabajos y cola de pendientes."""
+
+    def crear(self, trabajo: Trabajo, contenido: bytes) -> None: ...
+
+    def obtener(self, trabajo_id: str) -> Optional[Trabajo]: ...
+
+    def actualizar(self, trabajo: Trabajo) -> None:
+        """Guarda el trabajo, salvo que el almacenado ya esté en un estado final."""
+        ...
+
+    def siguiente(self) -> Optional[str]:
+        """Toma el siguiente trabajo en cola; nadie más lo recibirá."""
+        ...
+
+    def reencolar(self, trabajo_id: str) -> None: ...
+
+    def renovar(self, trabajo_id: str) -> bool:
+        """Renueva el lease del trabajo; False si ya no está EN_PROCESO a cargo de este proceso."""
+        ...
+
+    def recuperar(self, vencido_antes: datetime) -> int:
+        """Devuelve a la cola los trabajos EN_PROCESO cuyo dueño terminó o cuyo lease venció."""
+        ...
+
+    def contenido(self, trabajo_id: str) -> Optional[bytes]: ...
+
+    def guardar_documento(self, trabajo_id: str, documento: bytes) -> None: ...
+
+    def documento(self, trabajo_id: str) -> Optional[bytes]: ...
+
+    def purgar(self, antes_de: datetime) -> int: ...
+
+    def cerrar(self) -> None: ...
+
+
+class BackendTrabajosMemoria:
+    """
+    Backend en memoria, para desarrollo local y pruebas. Lo usan los hilos
+    de run_in_threadpool, así que cada operación toma el lock.
+    """
+
+    def __init__(self):
+        self._trabajos: Dict[str, Trabajo] = {}
+        self._contenidos: Dict[str, bytes] = {}
+        self._documentos: Dict[str, bytes] = {}
+        self._cola: Deque[str] = deque()
+        self._lock = threading.Lock()
+
+    def crear(self, trabajo: Trabajo, contenido: bytes) -> None:
+        with self._lock:
+            self._trabajos[trabajo.id] = trabajo
+            self._contenidos[trabajo.id] = contenido
+            self._cola.append(trabajo.id)
+
+    def obtener(self, trabajo_id: str) -> Optional[Trabajo]:
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return trabajo.model_copy() if trabajo is not None else None
+
+    def actualizar(self, trabajo: Trabajo) -> None:
+        with self._lock:
+            actual = self._trabajos.get(trabajo.id)
+            if actual is not None and actual.estado in ESTADOS_FINALES:
+                return
+            self._trabajos[trabajo.id] = trabajo.model_copy()
+            if trabajo.estado in ESTADOS_FINALES:
+                self._contenidos.pop(trabajo.id, None)
+
+    def siguiente(self) -> Optional[str]:
+        with self._lock:
+            while self._cola:
+                trabajo_id = self._cola.popleft()
+                trabajo = self._trabajos.get(trabajo_id)
+                if trabajo is not None and trabajo.estado == EstadoTrabajo.EN_COLA:
+                    return trabajo_id
+            return None
+
+    def reencolar(self, trabajo_id: str) -> None:
+        with self._lock:
+            self._cola.appendleft(trabajo_id)
+
+    def renovar(self, trabajo_id: str) -> bool:
+        with self._lock:
+            trabajo = self._trabajos.get(trabajo_id)
+            return trabajo is not None and trabajo.estado == EstadoTrabajo.EN_PROCESO
+
+    def recuperar(self, vencido_antes: datetime) -> int:
+        # Un solo proceso: sus trabajos en proceso siempre tienen dueño
+        return 0
+
+    def contenido(self, trabajo_id: str) -> Optional[bytes]:
+        with self._lock:
+            return self._contenidos.get(trabajo_id)
+
+    def guardar_documento(self, trabajo_id: str, documento: bytes) -> None:
+        with self._lock:
+            self._documentos[trabajo_id] = documento
+
+    def documento(self, trabajo_id: str) -> Optional[bytes]:
+        with self._lock:
+            return self._documentos.get(trabajo_id)
+
+    def purgar(self, antes_de: datetime) -> int:
+        with self._lock:
+            viejos = [
+                t.id
+                for t in self._trabajos.values()
+                if t.estado in ESTADOS_FINALES and t.finalizado_en and t.finalizado_en < antes_de
+            ]
+            for trabajo_id in viejos:
+                self._trabajos.pop(trabajo_id, None)
+                self._contenidos.pop(trabajo_id, None)
+                self._documentos.pop(trabajo_id, None)
+            return len(viejos)
+
+    def cerrar(self) -> None:
+        pass
+
+
+class BackendTrabajosSQLite:
+    """
+    Backend en un archivo SQLite local, que pueden compartir varios procesos:
+    cada trabajo EN_PROCESO guarda el pid de su dueño y el instante en que
+    este renovó el lease por última vez.
+    """
+
+    def __init__(self, ruta: str):
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS trabajos (
+                    id TEXT PRIMARY KEY,
+                    estado TEXT NOT NULL,
+                    creado_en TEXT NOT NULL,
+                    finalizado_en TEXT,
+                    datos TEXT NOT NULL,
+                    contenido BLOB,
+                    documento BLOB,
+                    propietario INTEGER,
+                    renovado_en TEXT
+                )
+                """
+            )
+            columnas = {fila[1] for fila in self._conn.execute("PRAGMA table_info(trabajos)")}
+            for columna, tipo in (("propietario", "INTEGER"), ("renovado_en", "TEXT")):
+                if columna not in columnas:
+                    self._conn.execute(f"ALTER TABLE trabajos ADD COLUMN {columna} {tipo}")
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos (estado, creado_en)"
+            )
+
+    def _guardar(self, trabajo: Trabajo) -> None:
+        # Un trabajo cancelado (o terminado) mientras se ejecutaba no cambia más
+        self._conn.execute(
+            f"""
+            UPDATE trabajos SET estado = ?, finalizado_en = ?, datos = ?
+            WHERE id = ? AND estado NOT IN ({", ".join("?" * len(ESTADOS_FINALES))})
+            """,
+            (
+                trabajo.estado.value,
+                trabajo.finalizado_en.isoformat() if trabajo.finalizado_en else None,
+                trabajo.model_dump_json(),
+                trabajo.id,
+                *(estado.value for estado in ESTADOS_FINALES),
+            ),
+        )
+
+    def crear(self, trabajo: Trabajo, contenido: bytes) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO trabajos (id, estado, creado_en, datos, contenido) VALUES (?, ?, ?, ?, ?)",
+                (
+                    trabajo.id,
+                    trabajo.estado.value,
+                    trabajo.creado_en.isoformat(),
+                    trabajo.model_dump_json(),
+                    contenido,
+                ),
+            )
+
+    def obtener(self, trabajo_id: str) -> Optional[Trabajo]:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT estado, datos FROM trabajos WHERE id = ?", (trabajo_id,)
+            ).fetchone()
+        if fila is None:
+            return None
+        # La columna estado es la fuente de verdad (siguiente() la cambia sin tocar datos)
+        trabajo = Trabajo.model_validate_json(fila[1])
+        trabajo.estado = EstadoTrabajo(fila[0])
+        return trabajo
+
+    def actualizar(self, trabajo: Trabajo) -> None:
+        with self._lock, self._conn:
+            self._guardar(trabajo)
+            if trabajo.estado in ESTADOS_FINALES:
+                self._conn.execute(
+                    "UPDATE trabajos SET contenido = NULL WHERE id = ?", (trabajo.id,)
+                )
+
+    def siguiente(self) -> Optional[str]:
+        # Tomar el trabajo de forma atómica, por si varios procesos comparten el archivo
+        with self._lock, self._conn:
+            fila = self._conn.execute(
+                """
+                UPDATE trabajos SET estado = ?, propietario = ?, renovado_en = ?
+                WHERE id = (
+                    SELECT id FROM trabajos WHERE estado = ? ORDER BY creado_en LIMIT 1
+                )
+                RETURNING id
+                """,
+                (
+                    EstadoTrabajo.EN_PROCESO.value,
+                    os.getpid(),
+                    _ahora().isoformat(),
+                    EstadoTrabajo.EN_COLA.value,
+                ),
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def reencolar(self, trabajo_id: str) -> None:
+        # La cola es la propia tabla: basta con que siga EN_COLA
+        pass
+
+    def renovar(self, trabajo_id: str) -> bool:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE trabajos SET renovado_en = ? WHERE id = ? AND estado = ? AND propietario = ?",
+                (_ahora().isoformat(), trabajo_id, EstadoTrabajo.EN_PROCESO.value, os.getpid()),
+            )
+        return cursor.rowcount == 1
+
+    def recuperar(self, vencido_antes: datetime) -> int:
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT id, propietario, renovado_en FROM trabajos WHERE estado = ?",
+                (EstadoTrabajo.EN_PROCESO.value,),
+            ).fetchall()
+        limite = vencido_antes.isoformat()
+        perdidos = [
+            fila
+            for fila in filas
+            if fila[2] is None or fila[2] < limite or not _proceso_vivo(fila[1])
+        ]
+        recuperados = 0
+        for trabajo_id, propietario, renovado_en in perdidos:
+            # Solo si nadie lo tomó o renovó desde la lectura
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    """
+                    UPDATE trabajos SET estado = ?, propietario = NULL
+                    WHERE id = ? AND estado = ? AND propietario IS ? AND renovado_en IS ?
+                    """,
+                    (
+                        EstadoTrabajo.EN_COLA.value,
+                        trabajo_id,
+                        EstadoTrabajo.EN_PROCESO.value,
+                        propietario,
+                        renovado_en,
+                    ),
+                )
+            recuperados += cursor.rowcount
+        if recuperados:
+            logger.warning("%d trabajos abandonados vuelven a la cola", recuperados)
+        return recuperados
+
+    def contenido(self, trabajo_id: str) -> Optional[bytes]:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT contenido FROM trabajos WHERE id = ?", (trabajo_id,)
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def guardar_documento(self, trabajo_id: str, documento: bytes) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE trabajos SET documento = ? WHERE id = ?", (documento, trabajo_id)
+            )
+
+    def documento(self, trabajo_id: str) -> Optional[bytes]:
+        with self._lock:
+            fila = self._conn.execute(
+                "SELECT documento FROM trabajos WHERE id = ?", (trabajo_id,)
+            ).fetchone()
+        return fila[0] if fila else None
+
+    def purgar(self, antes_de: datetime) -> int:
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM trabajos WHERE finalizado_en IS NOT NULL AND finalizado_en < ?",
+                (antes_de.isoformat(),),
+            )
+        return cursor.rowcount
+
+    def cerrar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class GestorTrabajos:
+    """
+    Recibe trabajos, los encola y los ejecuta con `concurrencia` consumidores,
+    que renuevan el lease (`lease` segundos) de lo que ejecutan y revisan la
+    cola cada `sondeo` segundos.
+
+    Toda llamada al backend (SQLite y contenidos de hasta max_file_size_mb)
+    pasa por run_in_threadpool para no bloquear el event loop.
+    """
+
+    def __init__(
+        self,
+        backend: BackendTrabajos,
+        concurrencia: int = 1,
+        ttl: int = 86400,
+        lease: float = 60,
+        sondeo: float = 1.0,
+    ):
+        self.backend = backend
+        self.concurrencia = max(concurrencia, 1)
+        self.ttl = ttl
+        self.lease = lease
+        self.sondeo = sondeo
+        self._hay_trabajo = asyncio.Event()
+        self._consumidores: List[asyncio.Task] = []
+
+    def iniciar(self) -> None:
+        if self._consumidores:
+            return
+        self._hay_trabajo = asyncio.Event()
+        self._hay_trabajo.set()  # revisar trabajos pendientes de una ejecución anterior
+        self._consumidores = [
+            asyncio.create_task(self._consumir()) for _ in range(self.concurrencia)
+        ]
+
+    async def detener(self) -> None:
+        for tarea in self._consumidores:
+            tarea.cancel()
+        await asyncio.gather(*self._consumidores, return_exceptions=True)
+        self._consumidores = []
+        await run_in_threadpool(self.backend.cerrar)
+
+    async def encolar(
+        self,
+        tipo: TipoTrabajo,
+        contenido: bytes,
+        nombre_archivo: str,
+        sha256: str,
+        datos: Optional[Dict] = None,
+        revalidar: bool = False,
+        reglas: Optional[str] = None,
+    ) -> Trabajo:
+        await run_in_threadpool(self.backend.purgar, _ahora() - timedelta(seconds=self.ttl))
+        trabajo = Trabajo(
+            id=uuid.uuid4().hex,
+            tipo=tipo,
+            nombre_archivo=nombre_archivo,
+            sha256=sha256,
+            datos=datos or {},
+            revalidar=revalidar,
+            reglas=reglas,
+            creado_en=_ahora(),
+        )
+        await run_in_threadpool(self.backend.crear, trabajo, contenido)
+        self._hay_trabajo.set()
+        return trabajo
+
+    async def obtener(self, trabajo_id: str) -> Optional[Trabajo]:
+        return await run_in_threadpool(self.backend.obtener, trabajo_id)
+
+    async def documento(self, trabajo_id: str) -> Optional[bytes]:
+        return await run_in_threadpool(self.backend.documento, trabajo_id)
+
+    async def cancelar(self, trabajo_id: str) -> Optional[Trabajo]:
+        """
+        Cancela el trabajo. Si ya está en proceso no se interrumpe el proceso
+        que lo ejecuta, pero su resultado se descarta.
+        """
+        trabajo = await run_in_threadpool(self.backend.obtener, trabajo_id)
+        if trabajo is None or trabajo.estado in ESTADOS_FINALES:
+            return trabajo
+        trabajo.estado = EstadoTrabajo.CANCELADO
+        trabajo.finalizado_en = _ahora()
+        await run_in_threadpool(self.backend.actualizar, trabajo)
+        return trabajo
+
+    async def _consumir(self) -> None:
+        while True:
+            trabajo_id = await run_in_threadpool(self.backend.siguiente)
+            if trabajo_id is None:
+                vencido_antes = _ahora() - timedelta(seconds=self.lease)
+                if await run_in_threadpool(self.backend.recuperar, vencido_antes):
+                    continue
+                self._hay_trabajo.clear()
+                # Otros procesos también encolan: revisar cada tanto aunque nadie avise
+                try:
+                    async with asyncio.timeout(self.sondeo):
+                        await self._hay_trabajo.wait()
+                except TimeoutError:
+                    pass
+                continue
+            await self._ejecutar(trabajo_id)
+
+    async def _renovar(self, trabajo_id: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await run_in_threadpool(self.backend.renovar, trabajo_id)
+
+    async def _ejecutar(self, trabajo_id: str) -> None:
+        trabajo = await run_in_threadpool(self.backend.obtener, trabajo_id)
+        if trabajo is None or trabajo.estado in ESTADOS_FINALES:
+            return
+        contenido = await run_in_threadpool(self.backend.contenido, trabajo_id)
+        if contenido is None:
+            await self._finalizar(trabajo, EstadoTrabajo.FALLIDO, error="Contenido no disponible")
+            return
+
+        trabajo.estado = EstadoTrabajo.EN_PROCESO
+        trabajo.iniciado_en = _ahora()
+        trabajo.tiempos["espera"] = (trabajo.iniciado_en - trabajo.creado_en).total_seconds()
+        await run_in_threadpool(self.backend.actualizar, trabajo)
+
+        ejecutor = get_ejecutor()
+        latido = asyncio.create_task(self._renovar(trabajo_id))
+        try:
+            resultado, documento, tiempos = await ejecutor.ejecutar(
+                tarea_trabajo,
+                trabajo.tipo,
+                contenido,
+                trabajo.datos,
+                trabajo.revalidar,
+                trabajo.reglas,
+            )
+        except (ColaLlena, PoolNoDisponible) as e:
+            # El pool está saturado por peticiones síncronas: devolver a la cola
+            if await run_in_threadpool(self.backend.renovar, trabajo_id):
+                trabajo.estado = EstadoTrabajo.EN_COLA
+                trabajo.iniciado_en = None
+                await run_in_threadpool(self.backend.actualizar, trabajo)
+                await run_in_threadpool(self.backend.reencolar, trabajo.id)
+            await asyncio.sleep(e.retry_after)
+            return
+        except Exception as e:
+            logger.exception("Trabajo %s fallido", trabajo.id)
+            if await run_in_threadpool(self.backend.renovar, trabajo_id):
+                await self._finalizar(trabajo, EstadoTrabajo.FALLIDO, error=str(e))
+            return
+        finally:
+            latido.cancel()
+
+        # Cancelado, o recuperado por otro proceso: el resultado se descarta
+        if not await run_in_threadpool(self.backend.renovar, trabajo_id):
+            return
+
+        trabajo.tiempos.update(tiempos)
+        if documento is not None:
+            await run_in_threadpool(self.backend.guardar_documento, trabajo.id, documento)
+        trabajo.tiene_documento = documento is not None
+        trabajo.resultado = resultado
+        await self._finalizar(trabajo, EstadoTrabajo.COMPLETADO)
+
+    async def _finalizar(
+        self,
+        trabajo: Trabajo,
+        estado: EstadoTrabajo,
+        error: Optional[str] = None,
+    ) -> None:
+        trabajo.estado = estado
+        trabajo.error = error
+        trabajo.finalizado_en = _ahora()
+        if trabajo.iniciado_en is not None:
+            trabajo.tiempos["total"] = (trabajo.finalizado_en - trabajo.creado_en).total_seconds()
+        await run_in_threadpool(self.backend.actualizar, trabajo)
+
+
+def _crear_backend(settings: Settings) -> BackendTrabajos:
+    if settings.jobs_backend == "sqlite":
+        return BackendTrabajosSQLite(settings.jobs_sqlite_path)
+    return BackendTrabajosMemoria()
+
+
+_gestor: Optional[GestorTrabajos] = None
+
+
+def get_gestor_trabajos() -> GestorTrabajos:
+    """Retorna el gestor de trabajos del proceso, creándolo si aún no existe."""
+    global _gestor
+    if _gestor is None:
+        settings = get_settings()
+        concurrencia = settings.jobs_concurrency or max(get_ejecutor().workers, 1)
+        _gestor = GestorTrabajos(
+            _crear_backend(settings),
+            concurrencia,
+            settings.jobs_ttl_s,
+            settings.jobs_lease_s,
+            settings.jobs_poll_s,
+        )
+    _gestor.iniciar()
+    return _gestor
+
+
+async def detener_gestor_trabajos() -> None:
+    global _gestor
+    if _gestor is not None:
+        await _gestor.detener()
+        _gestor = None
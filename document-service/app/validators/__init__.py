@@ -2,12 +2,38 @@ from .margenes import validar_margenes
 from .fuentes import validar_fuentes
 from .interlineado import validar_interlineado
 from .estructura import validar_estructura
-from .completo import validar_documento_completo
+from .paginas import validar_paginas
+from .completo import validar_documento_completo, validar_snapshot
+from .snapshot import DocumentoSnapshot, construir_snapshot
+from .motor_xml import construir_snapshot_xml
+from .maquetacion import Maquetacion, maquetar
+from .reglas import PlanReglas, ReglasDesconocidas, get_reglas, plan_reglas
+from .incremental import (
+    EstadoLinaje,
+    construir_snapshot_incremental,
+    serializar_estado,
+    deserializar_estado,
+)
 
 __all__ = [
     "validar_margenes",
     "validar_fuentes",
     "validar_interlineado",
     "validar_estructura",
+    "validar_paginas",
     "validar_documento_completo",
+    "validar_snapshot",
+    "DocumentoSnapshot",
+    "construir_snapshot",
+    "construir_snapshot_xml",
+    "Maquetacion",
+    "maquetar",
+    "PlanReglas",
+    "ReglasDesconocidas",
+    "get_reglas",
+    "plan_reglas",
+    "EstadoLinaje",
+    "construir_snapshot_incremental",
+    "serializar_estado",
+    "deserializar_estado",
 ]
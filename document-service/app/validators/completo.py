@@ -1,23 +1,47 @@
 from docx import Document
-from typing import List
+from typing import List, Optional
 from ..models import ValidacionItem, ValidacionResultado, Severidad
 from .margenes import validar_margenes
 from .fuentes import validar_fuentes
 from .interlineado import validar_interlineado
 from .estructura import validar_estructura
+from .paginas import validar_paginas
+from .reglas import PlanReglas, plan_reglas
+from .snapshot import DocumentoSnapshot, construir_snapshot
+from ..etapas import etapa
 
 
-def validar_documento_completo(doc: Document) -> ValidacionResultado:
+def validar_documento_completo(
+    doc: Document, plan: Optional[PlanReglas] = None
+) -> ValidacionResultado:
     """
     Ejecuta todas las validaciones del documento y genera un resultado completo.
     """
+    # Recorrer el documento una sola vez y compartir la instantánea
+    return validar_snapshot(construir_snapshot(doc), plan)
+
+
+def validar_snapshot(
+    snapshot: DocumentoSnapshot, plan: Optional[PlanReglas] = None
+) -> ValidacionResultado:
+    """
+    Ejecuta todas las validaciones sobre una instantánea ya construida
+    (con python-docx o con el motor XML), con las reglas de `plan` (por
+    defecto, las de settings.rules_default).
+    """
+    plan = plan or plan_reglas()
     todos_los_items: List[ValidacionItem] = []
 
     # Ejecutar todas las validaciones
-    todos_los_items.extend(validar_margenes(doc))
-    todos_los_items.extend(validar_fuentes(doc))
-    todos_los_items.extend(validar_interlineado(doc))
-    todos_los_items.extend(validar_estructura(doc))
+    for validador in (
+        validar_margenes,
+        validar_fuentes,
+        validar_interlineado,
+        validar_estructura,
+        validar_paginas,
+    ):
+        with etapa(validador.__name__):
+            todos_los_items.extend(validador(snapshot, plan))
 
     # Calcular estadísticas
     total = len(todos_los_items)
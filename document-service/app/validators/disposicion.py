@@ -0,0 +1,125 @@
+"""
+Datos de disposición en página que se leen del XML al armar la instantánea.
+
+La maquetación aproximada (maquetacion.py) necesita, además del texto y el
+formato de cada párrafo, lo que fuerza o consume espacio vertical: saltos de
+página, fin de sección, imágenes en línea y los bloques del cuerpo que no son
+párrafos (tablas y controles de contenido, p. ej. una tabla de contenido).
+Estas funciones trabajan sobre elementos lxml, así que sirven para el árbol
+de python-docx y para el motor XML en streaming.
+"""
+from typing import NamedTuple, Optional, Tuple
+
+from .estilos import twips
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_WP = "{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}"
+
+W_P = _W + "p"
+W_T = _W + "t"
+W_BR = _W + "br"
+W_PPR = _W + "pPr"
+W_SECTPR = _W + "sectPr"
+W_TBL = _W + "tbl"
+W_TR = _W + "tr"
+W_TC = _W + "tc"
+W_TCPR = _W + "tcPr"
+W_TCW = _W + "tcW"
+W_TYPE = _W + "type"
+W_PGNUMTYPE = _W + "pgNumType"
+WP_INLINE = _WP + "inline"
+WP_EXTENT = _WP + "extent"
+
+A_VAL = _W + "val"
+A_TYPE = _W + "type"
+A_W = _W + "w"
+A_FMT = _W + "fmt"
+
+EMU_POR_PT = 12700
+
+
+class DisposicionParrafo(NamedTuple):
+    salto_antes: bool = False  # w:pageBreakBefore o salto de página antes del texto
+    salto_despues: bool = False  # salto de página después del texto
+    alto_objetos_pt: float = 0.0  # imágenes y objetos en línea
+    fin_seccion: bool = False  # el párrafo lleva el w:sectPr de su sección
+
+
+SIN_DISPOSICION = DisposicionParrafo()
+
+# Celda de un bloque: (ancho en twips o 0 si no se conoce, caracteres de cada párrafo)
+Celda = Tuple[int, Tuple[int, ...]]
+
+
+class BloqueSnapshot(NamedTuple):
+    """Tabla o control de contenido del cuerpo, ubicado antes del párrafo `antes_de`."""
+
+    antes_de: int
+    filas: Tuple[Tuple[Celda, ...], ...]
+
+
+def disposicion_parrafo(p, salto_estilo: bool = False) -> DisposicionParrafo:
+    """Saltos, objetos en línea y fin de sección de un w:p (`salto_estilo`: pageBreakBefore efectivo)."""
+    salto_antes = salto_estilo
+    salto_despues = False
+    alto = 0
+    hay_texto = False
+    for elem in p.iter(W_T, W_BR, WP_INLINE):
+        tag = elem.tag
+        if tag == W_T:
+            hay_texto = hay_texto or bool(elem.text and elem.text.strip())
+        elif tag == W_BR:
+            if elem.get(A_TYPE) == "page":
+                if hay_texto:
+                    salto_despues = True
+                else:
+                    salto_antes = True
+        else:
+            extent = elem.find(WP_EXTENT)
+            if extent is not None:
+                alto += int(extent.get("cy") or 0)
+    pPr = p.find(W_PPR)
+    fin_seccion = pPr is not None and pPr.find(W_SECTPR) is not None
+    if not (salto_antes or salto_despues or alto or fin_seccion):
+        return SIN_DISPOSICION
+    # Un párrafo sin texto con solo un salto de página (add_page_break) deja
+    # la página: lo que sigue empieza en la próxima
+    if salto_antes and not hay_texto and not salto_estilo:
+        salto_antes, salto_despues = False, True
+    return DisposicionParrafo(salto_antes, salto_despues, alto / EMU_POR_PT, fin_seccion)
+
+
+def _caracteres(p) -> int:
+    return sum(len(t.text or "") for t in p.iter(W_T))
+
+
+def bloque_xml(elem, antes_de: int) -> Optional[BloqueSnapshot]:
+    """Filas de una tabla (o párrafos de un control de contenido) del cuerpo."""
+    filas = []
+    if elem.tag == W_TBL:
+        for tr in elem.iterchildren(W_TR):
+            celdas = []
+            for tc in tr.iterchildren(W_TC):
+                tcW = tc.find(f"{W_TCPR}/{W_TCW}")
+                ancho = 0
+                if tcW is not None and tcW.get(A_TYPE, "dxa") == "dxa":
+                    valor = twips(tcW.get(A_W))
+                    ancho = valor.twips if valor is not None else 0
+                celdas.append((ancho, tuple(_caracteres(p) for p in tc.iter(W_P))))
+            if celdas:
+                filas.append(tuple(celdas))
+    else:
+        filas = [((0, (_caracteres(p),)),) for p in elem.iter(W_P)]
+    if not filas:
+        return None
+    return BloqueSnapshot(antes_de, tuple(filas))
+
+
+def inicio_y_numeracion(sectPr) -> Tuple[Optional[str], Optional[str]]:
+    """w:type (nextPage, continuous, ...) y formato de numeración de páginas de una sección."""
+    tipo = sectPr.find(W_TYPE)
+    numeracion = sectPr.find(W_PGNUMTYPE)
+    return (
+        tipo.get(A_VAL) if tipo is not None else None,
+        numeracion.get(A_FMT) if numeracion is not None else None,
+    )
@@ -0,0 +1,368 @@
+"""
+Propiedades efectivas de párrafos y runs.
+
+Word aplica el formato en capas: docDefaults -> estilo de párrafo (y sus
+basedOn) -> estilo de carácter -> formato directo. Los validadores necesitan
+el valor que realmente se ve, no solo el formato directo, así que este módulo
+resuelve la cadena de estilos una sola vez por estilo y memoiza el resultado
+de cada combinación de formato directo. Con decenas de miles de runs las
+combinaciones distintas son pocas y cada consulta es una búsqueda en un dict.
+
+Trabaja sobre elementos lxml, por lo que sirve igual para el árbol de
+python-docx (`para._p.pPr`, `run._r.rPr`) y para el motor XML en streaming.
+"""
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from docx.enum.text import WD_LINE_SPACING
+from docx.opc.constants import RELATIONSHIP_TYPE as RT
+from docx.oxml.simpletypes import ST_HpsMeasure, ST_TwipsMeasure
+from docx.shared import Length
+from docx.styles import BabelFish
+from docx.text.parfmt import ParagraphFormat
+from lxml import etree
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+
+W_STYLE = _W + "style"
+W_NAME = _W + "name"
+W_BASED_ON = _W + "basedOn"
+W_DOC_DEFAULTS = _W + "docDefaults"
+W_PPR_DEFAULT = _W + "pPrDefault"
+W_RPR_DEFAULT = _W + "rPrDefault"
+W_PPR = _W + "pPr"
+W_RPR = _W + "rPr"
+W_RSTYLE = _W + "rStyle"
+W_SPACING = _W + "spacing"
+W_IND = _W + "ind"
+W_PAGE_BREAK_BEFORE = _W + "pageBreakBefore"
+W_RFONTS = _W + "rFonts"
+W_SZ = _W + "sz"
+
+A_VAL = _W + "val"
+A_TYPE = _W + "type"
+A_STYLE_ID = _W + "styleId"
+A_DEFAULT = _W + "default"
+A_ASCII = _W + "ascii"
+A_ASCII_THEME = _W + "asciiTheme"
+A_LINE = _W + "line"
+A_LINE_RULE = _W + "lineRule"
+A_BEFORE = _W + "before"
+A_AFTER = _W + "after"
+A_FIRST_LINE = _W + "firstLine"
+A_HANGING = _W + "hanging"
+
+_RULES_XML = {
+    "auto": WD_LINE_SPACING.MULTIPLE,
+    "exact": WD_LINE_SPACING.EXACTLY,
+    "atLeast": WD_LINE_SPACING.AT_LEAST,
+}
+
+# Fuente del tema según el sufijo de w:asciiTheme (majorHAnsi, minorBidi, ...)
+_SCRIPT_TEMA = {"Ascii": "latin", "HAnsi": "latin", "EastAsia": "ea", "Bidi": "cs"}
+
+
+class PropiedadesParrafo(NamedTuple):
+    interlineado: Optional[float]  # en múltiplos de línea
+    sangria_cm: Optional[float]  # sangría de primera línea
+    espacio_antes_pt: Optional[float]
+    espacio_despues_pt: Optional[float]
+    # Regla de w:lineRule (MULTIPLE, EXACTLY o AT_LEAST), sin normalizar a SINGLE/DOUBLE
+    regla_interlineado: Optional[WD_LINE_SPACING] = None
+    salto_pagina_antes: bool = False  # w:pageBreakBefore
+
+
+class PropiedadesRun(NamedTuple):
+    fuente: Optional[str]
+    tamano_pt: Optional[float]
+
+
+def twips_to_pt(twips: int) -> float:
+    """Convertir twips a puntos"""
+    return twips / 20.0
+
+
+def calcular_interlineado(line_spacing, line_rule) -> Optional[float]:
+    """Interlineado expresado en múltiplos de línea (2.0 = doble espacio)."""
+    if line_rule == WD_LINE_SPACING.DOUBLE:
+        return 2.0
+    elif line_rule == WD_LINE_SPACING.ONE_POINT_FIVE:
+        return 1.5
+    elif line_rule == WD_LINE_SPACING.SINGLE:
+        return 1.0
+    elif line_rule == WD_LINE_SPACING.MULTIPLE and line_spacing:
+        return line_spacing
+    elif line_rule == WD_LINE_SPACING.EXACTLY and line_spacing:
+        # Convertir de puntos a múltiplo aproximado (12pt base)
+        return twips_to_pt(line_spacing.twips) / 12.0
+    elif line_spacing:
+        return line_spacing
+    return None
+
+
+def twips(valor: Optional[str]) -> Optional[Length]:
+    """Atributo ST_TwipsMeasure (o ST_SignedTwipsMeasure, se leen igual)."""
+    if valor is None:
+        return None
+    return ST_TwipsMeasure.convert_from_xml(valor)
+
+
+def _atributos_ppr(pPr) -> Tuple:
+    """Atributos crudos del formato de párrafo que interesan, como clave de caché."""
+    if pPr is None:
+        return ()
+    spacing = pPr.find(W_SPACING)
+    ind = pPr.find(W_IND)
+    salto = pPr.find(W_PAGE_BREAK_BEFORE)
+    return (
+        None if spacing is None else (
+            spacing.get(A_LINE), spacing.get(A_LINE_RULE),
+            spacing.get(A_BEFORE), spacing.get(A_AFTER),
+        ),
+        None if ind is None else (ind.get(A_FIRST_LINE), ind.get(A_HANGING)),
+        None if salto is None else salto.get(A_VAL, "1"),
+    )
+
+
+def _capa_ppr(atributos: Tuple) -> Dict:
+    """Propiedades que define una capa de formato de párrafo."""
+    capa = {}
+    if not atributos:
+        return capa
+    spacing, ind, salto = atributos
+    if spacing is not None:
+        line, line_rule, before, after = spacing
+        if line is not None:
+            # line y lineRule se heredan juntos
+            capa["line"] = (twips(line), _RULES_XML.get(line_rule) if line_rule else None)
+        if before is not None:
+            capa["before"] = twips(before)
+        if after is not None:
+            capa["after"] = twips(after)
+    if ind is not None:
+        first_line, hanging = ind
+        if hanging is not None:
+            capa["sangria"] = Length(-twips(hanging))
+        elif first_line is not None:
+            capa["sangria"] = twips(first_line)
+    if salto is not None:
+        capa["salto"] = salto not in ("0", "false", "off")
+    return capa
+
+
+def _atributos_rpr(rPr) -> Tuple:
+    if rPr is None:
+        return ()
+    rStyle = rPr.find(W_RSTYLE)
+    rFonts = rPr.find(W_RFONTS)
+    sz = rPr.find(W_SZ)
+    return (
+        None if rStyle is None else rStyle.get(A_VAL),
+        None if rFonts is None else (rFonts.get(A_ASCII), rFonts.get(A_ASCII_THEME)),
+        None if sz is None else sz.get(A_VAL),
+    )
+
+
+class ResolutorEstilos:
+    """Resuelve nombres de estilo y propiedades efectivas de un documento."""
+
+    def __init__(self, styles=None, theme=None):
+        """
+        `styles` es el elemento w:styles y `theme` el a:theme (ambos
+        opcionales, como elementos lxml).
+        """
+        self._estilos: Dict[str, object] = {}
+        self._defecto_parrafo = None
+        self._ppr_defecto: Dict = {}
+        self._rpr_defecto: Dict = {}
+        self._fuentes_tema: Dict[str, str] = {}
+
+        self._cache_nombres: Dict[Optional[str], Optional[str]] = {}
+        self._cache_ppr_estilo: Dict[Optional[str], Dict] = {}
+        self._cache_rpr_estilo: Dict[Tuple[Optional[str], Optional[str]], Dict] = {}
+        self._cache_parrafo: Dict[Tuple, PropiedadesParrafo] = {}
+        self._cache_run: Dict[Tuple, PropiedadesRun] = {}
+
+        if theme is not None:
+            self._leer_tema(theme)
+        if styles is not None:
+            self._leer_estilos(styles)
+
+    @classmethod
+    def desde_documento(cls, doc) -> "ResolutorEstilos":
+        """Resolutor para un Document de python-docx."""
+        theme = None
+        try:
+            theme = etree.fromstring(doc.part.part_related_by(RT.THEME).blob)
+        except KeyError:
+            pass
+        return cls(doc.styles.element, theme)
+
+    @classmethod
+    def desde_xml(
+        cls, styles_xml: Optional[bytes], theme_xml: Optional[bytes] = None
+    ) -> "ResolutorEstilos":
+        """Resolutor a partir del contenido de styles.xml y theme1.xml."""
+        styles = etree.fromstring(styles_xml) if styles_xml is not None else None
+        theme = etree.fromstring(theme_xml) if theme_xml is not None else None
+        return cls(styles, theme)
+
+    # -- Lectura de las partes --------------------------------------------
+
+    def _leer_tema(self, theme) -> None:
+        for grupo, prefijo in (("majorFont", "major"), ("minorFont", "minor")):
+            fuentes = theme.find(f"{_A}themeElements/{_A}fontScheme/{_A}{grupo}")
+            if fuentes is None:
+                continue
+            for script in ("latin", "ea", "cs"):
+                elemento = fuentes.find(_A + script)
+                if elemento is not None and elemento.get("typeface"):
+                    self._fuentes_tema[f"{prefijo}:{script}"] = elemento.get("typeface")
+
+    def _leer_estilos(self, styles) -> None:
+        for style in styles.iterchildren(W_STYLE):
+            style_id = style.get(A_STYLE_ID)
+            # Como python-docx: vale el primer estilo con cada id...
+            if style_id is not None and style_id not in self._estilos:
+                self._estilos[style_id] = style
+            # ...pero el último estilo de párrafo marcado por defecto
+            if style.get(A_TYPE) == "paragraph" and style.get(A_DEFAULT) in ("1", "true", "on"):
+                self._defecto_parrafo = style
+
+        defaults = styles.find(W_DOC_DEFAULTS)
+        if defaults is not None:
+            pPr = defaults.find(f"{W_PPR_DEFAULT}/{W_PPR}")
+            rPr = defaults.find(f"{W_RPR_DEFAULT}/{W_RPR}")
+            self._ppr_defecto = _capa_ppr(_atributos_ppr(pPr))
+            self._rpr_defecto = self._capa_rpr(_atributos_rpr(rPr))
+
+    def _fuente_tema(self, valor: str) -> Optional[str]:
+        for prefijo in ("major", "minor"):
+            if valor.startswith(prefijo):
+                script = _SCRIPT_TEMA.get(valor[len(prefijo):], "latin")
+                return self._fuentes_tema.get(f"{prefijo}:{script}")
+        return None
+
+    def _capa_rpr(self, atributos: Tuple) -> Dict:
+        capa = {}
+        if not atributos:
+            return capa
+        _, fuentes, sz = atributos
+        if fuentes is not None:
+            ascii_, ascii_tema = fuentes
+            # asciiTheme tiene prioridad sobre ascii en el mismo elemento
+            fuente = self._fuente_tema(ascii_tema) if ascii_tema else None
+            if fuente is None:
+                fuente = ascii_
+            if fuente is not None:
+                capa["fuente"] = fuente
+        if sz is not None:
+            capa["tamano"] = ST_HpsMeasure.convert_from_xml(sz)
+        return capa
+
+    # -- Estilos ----------------------------------------------------------
+
+    def _estilo_parrafo(self, style_id: Optional[str]):
+        """Estilo de párrafo aplicado; el de por defecto si el id no es válido."""
+        style = self._estilos.get(style_id) if style_id else None
+        if style is None or style.get(A_TYPE) != "paragraph":
+            return self._defecto_parrafo
+        return style
+
+    def _cadena(self, style, tipo: str):
+        """Estilo y sus basedOn del mismo tipo, del más general al más concreto."""
+        cadena = []
+        vistos = set()
+        while style is not None and id(style) not in vistos and style.get(A_TYPE) == tipo:
+            vistos.add(id(style))
+            cadena.append(style)
+            based_on = style.find(W_BASED_ON)
+            style = self._estilos.get(based_on.get(A_VAL)) if based_on is not None else None
+        cadena.reverse()
+        return cadena
+
+    def nombre_estilo(self, style_id: Optional[str]) -> Optional[str]:
+        """Nombre del estilo de párrafo, como `doc.part.get_style(...).name`."""
+        if style_id not in self._cache_nombres:
+            style = self._estilo_parrafo(style_id)
+            nombre = None
+            if style is not None:
+                name = style.find(W_NAME)
+                if name is not None and name.get(A_VAL) is not None:
+                    nombre = BabelFish.internal2ui(name.get(A_VAL))
+            self._cache_nombres[style_id] = nombre
+        return self._cache_nombres[style_id]
+
+    def _ppr_estilo(self, style_id: Optional[str]) -> Dict:
+        """docDefaults + cadena del estilo de párrafo, resuelto una vez por estilo."""
+        if style_id not in self._cache_ppr_estilo:
+            props = dict(self._ppr_defecto)
+            for style in self._cadena(self._estilo_parrafo(style_id), "paragraph"):
+                props.update(_capa_ppr(_atributos_ppr(style.find(W_PPR))))
+            self._cache_ppr_estilo[style_id] = props
+        return self._cache_ppr_estilo[style_id]
+
+    def _rpr_estilo(self, style_id: Optional[str], estilo_caracter: Optional[str]) -> Dict:
+        """docDefaults + estilo de párrafo + estilo de carácter."""
+        clave = (style_id, estilo_caracter)
+        if clave not in self._cache_rpr_estilo:
+            props = dict(self._rpr_defecto)
+            for style in self._cadena(self._estilo_parrafo(style_id), "paragraph"):
+                props.update(self._capa_rpr(_atributos_rpr(style.find(W_RPR))))
+            caracter = self._estilos.get(estilo_caracter) if estilo_caracter else None
+            for style in self._cadena(caracter, "character"):
+                props.update(self._capa_rpr(_atributos_rpr(style.find(W_RPR))))
+            self._cache_rpr_estilo[clave] = props
+        return self._cache_rpr_estilo[clave]
+
+    # -- Consultas --------------------------------------------------------
+
+    def parrafo(self, style_id: Optional[str], pPr) -> PropiedadesParrafo:
+        """Propiedades efectivas de un párrafo con estilo `style_id` y formato directo `pPr`."""
+        atributos = _atributos_ppr(pPr)
+        clave = (style_id, atributos)
+        resultado = self._cache_parrafo.get(clave)
+        if resultado is None:
+            props = dict(self._ppr_estilo(style_id))
+            props.update(_capa_ppr(atributos))
+
+            interlineado = None
+            rule = None
+            if "line" in props:
+                line, rule = props["line"]
+                if rule is None:
+                    rule = WD_LINE_SPACING.MULTIPLE
+                interlineado = calcular_interlineado(
+                    ParagraphFormat._line_spacing(line, rule),
+                    ParagraphFormat._line_spacing_rule(line, rule),
+                )
+            sangria = props.get("sangria")
+            antes = props.get("before")
+            despues = props.get("after")
+            resultado = PropiedadesParrafo(
+                interlineado=interlineado,
+                sangria_cm=sangria.cm if sangria else None,
+                espacio_antes_pt=antes.pt if antes else None,
+                espacio_despues_pt=despues.pt if despues else None,
+                regla_interlineado=rule,
+                salto_pagina_antes=props.get("salto", False),
+            )
+            self._cache_parrafo[clave] = resultado
+        return resultado
+
+    def run(self, style_id: Optional[str], rPr) -> PropiedadesRun:
+        """Propiedades efectivas de un run dentro de un párrafo con estilo `style_id`."""
+        atributos = _atributos_rpr(rPr)
+        clave = (style_id, atributos)
+        resultado = self._cache_run.get(clave)
+        if resultado is None:
+            estilo_caracter = atributos[0] if atributos else None
+            props = dict(self._rpr_estilo(style_id, estilo_caracter))
+            props.update(self._capa_rpr(atributos))
+            tamano = props.get("tamano")
+            resultado = PropiedadesRun(
+                fuente=props.get("fuente"),
+                tamano_pt=tamano.pt if tamano else None,
+            )
+            self._cache_run[clave] = resultado
+        return resultado
@@ -1,121 +1,73 @@
 from docx import Document
-from typing import List, Set
-import re
+from typing import List, Optional, Set, Union
+from ..clasificacion import TipoParrafo, normalizar_texto
 from ..models import ValidacionItem, Severidad
+from .reglas import PlanReglas, plan_reglas
+from .snapshot import DocumentoSnapshot, clasificar_snapshot, obtener_snapshot
 
 
-# Secciones obligatorias según Guía UNAP 2.0
-SECCIONES_OBLIGATORIAS = [
-    "RESUMEN",
-    "ABSTRACT",
-    "INTRODUCCION",
-    "REVISION DE LITERATURA",
-    "MATERIALES Y METODOS",
-    "RESULTADOS Y DISCUSION",
-    "CONCLUSIONES",
-    "RECOMENDACIONES",
-    "REFERENCIAS BIBLIOGRAFICAS",
-]
-
-# Patrones para detectar capítulos
-PATRON_CAPITULO = re.compile(
-    r"^(CAPITULO|CAPÍTULO)\s+(I|II|III|IV|V|VI|VII|VIII|IX|X|\d+)",
-    re.IGNORECASE,
-)
-
-# Estructura esperada de capítulos
-CAPITULOS_ESPERADOS = [
-    ("I", "INTRODUCCION"),
-    ("II", "REVISION DE LITERATURA"),
-    ("III", "MATERIALES Y METODOS"),
-    ("IV", "RESULTADOS Y DISCUSION"),
-    ("V", "CONCLUSIONES"),
-]
-
-
-def normalizar_texto(texto: str) -> str:
-    """Normaliza texto para comparación"""
-    texto = texto.upper().strip()
-    # Remover acentos comunes
-    texto = texto.replace("Á", "A").replace("É", "E").replace("Í", "I")
-    texto = texto.replace("Ó", "O").replace("Ú", "U").replace("Ñ", "N")
-    return texto
-
-
-def validar_estructura(doc: Document) -> List[ValidacionItem]:
+def validar_estructura(
+    doc: Union[Document, DocumentoSnapshot], plan: Optional[PlanReglas] = None
+) -> List[ValidacionItem]:
     """
     Valida la estructura del documento según la Guía UNAP 2.0:
     - Capítulos I, II, III, IV, V
     - Secciones obligatorias
     - Niveles de títulos
     """
+    plan = plan or plan_reglas()
+    reglas = plan.estructura
     resultados = []
+    buscador = plan.buscador
+    obligatorias = buscador.obligatorias
+    minimo = reglas.minimo_capitulos
 
     # Extraer todos los títulos/encabezados del documento
     titulos_encontrados: List[str] = []
-    capitulos_encontrados: List[str] = []
+    capitulos_numeros: List[str] = []
     secciones_encontradas: Set[str] = set()
 
-    for para in doc.paragraphs:
-        texto = para.text.strip()
-        if not texto:
+    snapshot = obtener_snapshot(doc)
+    for para, clase in zip(snapshot.parrafos, clasificar_snapshot(snapshot)):
+        # Las entradas de un índice repiten los títulos pero no son secciones
+        if clase.tipo in (TipoParrafo.VACIO, TipoParrafo.ENTRADA_INDICE):
             continue
-
-        texto_normalizado = normalizar_texto(texto)
-
-        # Detectar si es un título (basado en estilo o formato)
-        es_titulo = False
-        if para.style and para.style.name:
-            style_name = para.style.name.lower()
-            if "heading" in style_name or "titulo" in style_name:
-                es_titulo = True
-
-        # Detectar por formato (todo mayúsculas, negrita, etc.)
-        if texto.isupper() and len(texto) < 100:
-            es_titulo = True
+        texto = para.texto
 
         # Detectar capítulos
-        match_capitulo = PATRON_CAPITULO.match(texto)
-        if match_capitulo:
-            capitulos_encontrados.append(texto)
-            es_titulo = True
+        if clase.nivel is TipoParrafo.CAPITULO:
+            capitulos_numeros.append(clase.capitulo)
 
-        if es_titulo:
+        # Título por estilo, mayúsculas, capítulo o numeración
+        if clase.es_titulo:
             titulos_encontrados.append(texto)
 
-            # Verificar secciones obligatorias
-            for seccion in SECCIONES_OBLIGATORIAS:
-                if seccion in texto_normalizado or texto_normalizado in seccion:
-                    secciones_encontradas.add(seccion)
+            # Verificar secciones obligatorias (y sus variantes) en una pasada
+            secciones_encontradas.update(buscador.secciones(normalizar_texto(texto)))
 
     # Validar presencia de capítulos
-    capitulos_numeros = []
-    for cap in capitulos_encontrados:
-        match = PATRON_CAPITULO.match(cap)
-        if match:
-            numero = match.group(2)
-            capitulos_numeros.append(numero)
-
     if capitulos_numeros:
         resultados.append(
             ValidacionItem(
                 tipo="Estructura",
                 categoria="Capítulos",
-                es_valido=len(capitulos_numeros) >= 4,
+                es_valido=len(capitulos_numeros) >= minimo,
                 valor_actual=f"{len(capitulos_numeros)} capítulos: {', '.join(capitulos_numeros)}",
-                valor_esperado="Mínimo 4 capítulos (I-IV o más)",
+                valor_esperado=f"Mínimo {minimo} capítulos ({plan.capitulos[0]}-{plan.capitulos[minimo - 1]} o más)"
+                if 0 < minimo <= len(plan.capitulos)
+                else f"Mínimo {minimo} capítulos",
                 mensaje=f"Se encontraron {len(capitulos_numeros)} capítulos"
-                if len(capitulos_numeros) >= 4
+                if len(capitulos_numeros) >= minimo
                 else f"Faltan capítulos: solo se encontraron {len(capitulos_numeros)}",
-                severidad=Severidad.ERROR if len(capitulos_numeros) < 4 else Severidad.SUGERENCIA,
+                severidad=Severidad.ERROR if len(capitulos_numeros) < minimo else Severidad.SUGERENCIA,
                 sugerencia="Verificar que todos los capítulos estén correctamente numerados"
-                if len(capitulos_numeros) < 4
+                if len(capitulos_numeros) < minimo
                 else None,
             )
         )
 
         # Verificar secuencia de capítulos
-        secuencia_esperada = ["I", "II", "III", "IV", "V"]
+        secuencia_esperada = plan.capitulos
         secuencia_correcta = True
         for i, esperado in enumerate(secuencia_esperada[: len(capitulos_numeros)]):
             if i < len(capitulos_numeros) and capitulos_numeros[i] != esperado:
@@ -129,10 +81,10 @@ def validar_estructura(doc: Document) -> List[ValidacionItem]:
                     categoria="Numeración",
                     es_valido=False,
                     valor_actual=", ".join(capitulos_numeros),
-                    valor_esperado="I, II, III, IV, V",
+                    valor_esperado=", ".join(secuencia_esperada),
                     mensaje="La numeración de capítulos no es secuencial",
                     severidad=Severidad.ADVERTENCIA,
-                    sugerencia="Verificar que los capítulos sigan la secuencia I, II, III, IV, V",
+                    sugerencia=f"Verificar que los capítulos sigan la secuencia {', '.join(secuencia_esperada)}",
                 )
             )
     else:
@@ -142,7 +94,7 @@ def validar_estructura(doc: Document) -> List[ValidacionItem]:
                 categoria="Capítulos",
                 es_valido=False,
                 valor_actual="No encontrados",
-                valor_esperado="CAPITULO I, II, III, IV, V",
+                valor_esperado=f"CAPITULO {', '.join(plan.capitulos)}",
                 mensaje="No se detectaron capítulos en el documento",
                 severidad=Severidad.ERROR,
                 sugerencia="Agregar títulos de capítulos con formato: CAPITULO I, CAPITULO II, etc.",
@@ -151,7 +103,7 @@ def validar_estructura(doc: Document) -> List[ValidacionItem]:
 
     # Validar secciones obligatorias
     secciones_faltantes = []
-    for seccion in SECCIONES_OBLIGATORIAS:
+    for seccion in obligatorias:
         if seccion not in secciones_encontradas:
             secciones_faltantes.append(seccion)
 
@@ -161,7 +113,7 @@ def validar_estructura(doc: Document) -> List[ValidacionItem]:
                 tipo="Estructura",
                 categoria="Secciones",
                 es_valido=False,
-                valor_actual=f"{len(SECCIONES_OBLIGATORIAS) - len(secciones_faltantes)}/{len(SECCIONES_OBLIGATORIAS)} secciones",
+                valor_actual=f"{len(obligatorias) - len(secciones_faltantes)}/{len(obligatorias)} secciones",
                 valor_esperado="Todas las secciones obligatorias",
                 mensaje=f"Secciones faltantes: {', '.join(secciones_faltantes[:5])}",
                 severidad=Severidad.ERROR,
@@ -174,16 +126,16 @@ def validar_estructura(doc: Document) -> List[ValidacionItem]:
                 tipo="Estructura",
                 categoria="Secciones",
                 es_valido=True,
-                valor_actual=f"{len(SECCIONES_OBLIGATORIAS)}/{len(SECCIONES_OBLIGATORIAS)} secciones",
+                valor_actual=f"{len(obligatorias)}/{len(obligatorias)} secciones",
                 valor_esperado="Todas las secciones obligatorias",
                 mensaje="Todas las secciones obligatorias están presentes",
                 severidad=Severidad.SUGERENCIA,
             )
         )
 
-    # Validar presencia de RESUMEN y ABSTRACT
-    tiene_resumen = "RESUMEN" in secciones_encontradas
-    tiene_abstract = "ABSTRACT" in secciones_encontradas
+    # Validar presencia de RESUMEN y ABSTRACT (si la configuración los exige)
+    tiene_resumen = "RESUMEN" in secciones_encontradas or "RESUMEN" not in obligatorias
+    tiene_abstract = "ABSTRACT" in secciones_encontradas or "ABSTRACT" not in obligatorias
 
     if not tiene_resumen:
         resultados.append(
@@ -209,14 +161,13 @@ def validar_estructura(doc: Document) -> List[ValidacionItem]:
             )
         )
 
-    # Validar presencia de referencias
-    tiene_referencias = "REFERENCIAS BIBLIOGRAFICAS" in secciones_encontradas
-    if not tiene_referencias:
-        # Buscar variantes
-        for seccion in secciones_encontradas:
-            if "REFERENCIA" in seccion or "BIBLIOGRAFIA" in seccion:
-                tiene_referencias = True
-                break
+    # Validar presencia de referencias (las variantes ya cuentan como la sección)
+    exige_referencias = any(
+        "REFERENCIA" in seccion or "BIBLIOGRAFIA" in seccion for seccion in obligatorias
+    )
+    tiene_referencias = not exige_referencias or any(
+        "REFERENCIA" in seccion or "BIBLIOGRAFIA" in seccion for seccion in secciones_encontradas
+    )
 
     if not tiene_referencias:
         resultados.append(
@@ -235,15 +186,15 @@ def validar_estructura(doc: Document) -> List[ValidacionItem]:
         ValidacionItem(
             tipo="Estructura",
             categoria="Títulos",
-            es_valido=len(titulos_encontrados) >= 10,
+            es_valido=len(titulos_encontrados) >= reglas.minimo_titulos,
             valor_actual=f"{len(titulos_encontrados)} títulos detectados",
-            valor_esperado="Mínimo 10 títulos/secciones",
+            valor_esperado=f"Mínimo {reglas.minimo_titulos} títulos/secciones",
             mensaje=f"Se detectaron {len(titulos_encontrados)} títulos en el documento",
             severidad=Severidad.ADVERTENCIA
-            if len(titulos_encontrados) < 10
+            if len(titulos_encontrados) < reglas.minimo_titulos
             else Severidad.SUGERENCIA,
             sugerencia="Verificar que todas las secciones tengan títulos apropiados"
-            if len(titulos_encontrados) < 10
+            if len(titulos_encontrados) < reglas.minimo_titulos
             else None,
         )
     )
@@ -1,67 +1,40 @@
 from docx import Document
-from docx.shared import Pt
-from typing import List, Dict
+from typing import List, Optional, Union
 from collections import Counter
 from ..models import ValidacionItem, Severidad
-from ..config import get_settings
+from .historias import HISTORIA_CUERPO
+from .maquetacion import maquetar
+from .reglas import PlanReglas, plan_reglas
+from .snapshot import DocumentoSnapshot, obtener_snapshot
+from .tabla import tabla_formato
 
 
-def validar_fuentes(doc: Document) -> List[ValidacionItem]:
+def validar_fuentes(
+    doc: Union[Document, DocumentoSnapshot], plan: Optional[PlanReglas] = None
+) -> List[ValidacionItem]:
     """
     Valida las fuentes del documento según la Guía UNAP 2.0:
     - Fuente: Times New Roman
     - Tamaño: 12pt (texto normal)
     """
-    settings = get_settings()
+    plan = plan or plan_reglas()
+    reglas = plan.fuente
+    snapshot = obtener_snapshot(doc)
     resultados = []
 
-    # Contadores para estadísticas
-    fuentes_encontradas: Counter = Counter()
-    tamanos_encontrados: Counter = Counter()
-    parrafos_con_error_fuente = []
-    parrafos_con_error_tamano = []
-
-    for i, para in enumerate(doc.paragraphs):
-        if not para.text.strip():
-            continue
-
-        for run in para.runs:
-            if not run.text.strip():
-                continue
-
-            # Verificar fuente
-            font_name = run.font.name
-            if font_name:
-                fuentes_encontradas[font_name] += 1
-                if font_name != settings.font_name:
-                    parrafos_con_error_fuente.append(
-                        {
-                            "parrafo": i + 1,
-                            "texto": run.text[:50],
-                            "fuente": font_name,
-                        }
-                    )
-
-            # Verificar tamaño
-            font_size = run.font.size
-            if font_size:
-                size_pt = font_size.pt
-                tamanos_encontrados[size_pt] += 1
-                # Permitir variación para títulos (14, 16pt) y notas (10pt)
-                if size_pt not in [10, 12, 14, 16, 18]:
-                    parrafos_con_error_tamano.append(
-                        {
-                            "parrafo": i + 1,
-                            "texto": run.text[:50],
-                            "tamano": size_pt,
-                        }
-                    )
+    # Estadísticas sobre la tabla columnar (una fila por run con texto)
+    tabla = tabla_formato(snapshot)
+    fuentes_encontradas: Counter = Counter(
+        {tabla.fuentes[i]: conteo for i, conteo in tabla.histograma(tabla.r_fuente).items()}
+    )
+    tamanos_encontrados: Counter = tabla.histograma(tabla.r_tamano)
+    errores_fuente = sum(fuentes_encontradas.values()) - fuentes_encontradas[reglas.nombre]
 
     # Resumen de fuentes
     fuente_principal = fuentes_encontradas.most_common(1)
     if fuente_principal:
         nombre_fuente, conteo = fuente_principal[0]
-        es_correcta = nombre_fuente == settings.font_name
+        es_correcta = nombre_fuente == reglas.nombre
         total_fuentes = sum(fuentes_encontradas.values())
         porcentaje = (conteo / total_fuentes * 100) if total_fuentes > 0 else 0
 
@@ -69,19 +42,19 @@ def validar_fuentes(doc: Document) -> List[ValidacionItem]:
             ValidacionItem(
                 tipo="Fuente",
                 categoria="Principal",
-                es_valido=es_correcta and porcentaje > 90,
+                es_valido=es_correcta and porcentaje > reglas.minimo_principal_pct,
                 valor_actual=f"{nombre_fuente} ({porcentaje:.1f}%)",
-                valor_esperado=settings.font_name,
+                valor_esperado=reglas.nombre,
                 mensaje=f"Fuente principal: {nombre_fuente}"
                 if es_correcta
-                else f"Fuente incorrecta: {nombre_fuente} (esperado: {settings.font_name})",
+                else f"Fuente incorrecta: {nombre_fuente} (esperado: {reglas.nombre})",
                 severidad=Severidad.ERROR if not es_correcta else Severidad.SUGERENCIA,
-                sugerencia=f"Cambiar fuente a {settings.font_name}" if not es_correcta else None,
+                sugerencia=f"Cambiar fuente a {reglas.nombre}" if not es_correcta else None,
             )
         )
 
     # Verificar si hay múltiples fuentes
-    if len(fuentes_encontradas) > 2:
+    if len(fuentes_encontradas) > reglas.maximo_fuentes:
         fuentes_lista = ", ".join(
             [f"{f} ({c})" for f, c in fuentes_encontradas.most_common(5)]
         )
@@ -91,10 +64,10 @@ def validar_fuentes(doc: Document) -> List[ValidacionItem]:
                 categoria="Consistencia",
                 es_valido=False,
                 valor_actual=f"{len(fuentes_encontradas)} fuentes diferentes",
-                valor_esperado="1-2 fuentes",
+                valor_esperado=f"1-{reglas.maximo_fuentes} fuentes",
                 mensaje=f"Se encontraron múltiples fuentes: {fuentes_lista}",
                 severidad=Severidad.ADVERTENCIA,
-                sugerencia="Unificar fuentes usando Times New Roman",
+                sugerencia=f"Unificar fuentes usando {reglas.nombre}",
             )
         )
 
@@ -102,7 +75,7 @@ def validar_fuentes(doc: Document) -> List[ValidacionItem]:
     tamano_principal = tamanos_encontrados.most_common(1)
     if tamano_principal:
         tamano, conteo = tamano_principal[0]
-        es_correcto = tamano == settings.font_size_pt
+        es_correcto = tamano == plan.tamano_pt
         total_tamanos = sum(tamanos_encontrados.values())
         porcentaje = (conteo / total_tamanos * 100) if total_tamanos > 0 else 0
 
@@ -110,45 +83,49 @@ def validar_fuentes(doc: Document) -> List[ValidacionItem]:
             ValidacionItem(
                 tipo="Fuente",
                 categoria="Tamaño",
-                es_valido=es_correcto and porcentaje > 80,
+                es_valido=es_correcto and porcentaje > reglas.minimo_tamano_pct,
                 valor_actual=f"{tamano}pt ({porcentaje:.1f}%)",
-                valor_esperado=f"{settings.font_size_pt}pt",
+                valor_esperado=f"{plan.tamano_pt}pt",
                 mensaje=f"Tamaño principal: {tamano}pt"
                 if es_correcto
-                else f"Tamaño incorrecto: {tamano}pt (esperado: {settings.font_size_pt}pt)",
+                else f"Tamaño incorrecto: {tamano}pt (esperado: {plan.tamano_pt}pt)",
                 severidad=Severidad.ERROR if not es_correcto else Severidad.SUGERENCIA,
-                sugerencia=f"Ajustar tamaño de fuente a {settings.font_size_pt}pt"
+                sugerencia=f"Ajustar tamaño de fuente a {plan.tamano_pt}pt"
                 if not es_correcto
                 else None,
             )
         )
 
-    # Errores específicos (limitados a los primeros 5)
-    if parrafos_con_error_fuente:
-        for error in parrafos_con_error_fuente[:3]:
+    # Errores específicos (limitados a los primeros reglas.errores_listados)
+    if errores_fuente:
+        filas = tabla.posiciones_distintas(tabla.r_fuente, tabla.id_fuente(reglas.nombre))
+        for para, run in tabla.primeras(filas, reglas.errores_listados):
+            ubicacion = para.descripcion
+            en_cuerpo = para.historia == HISTORIA_CUERPO and not para.ubicacion
             resultados.append(
                 ValidacionItem(
                     tipo="Fuente",
                     categoria="Error específico",
-                    elemento=f"Párrafo {error['parrafo']}",
+                    elemento=ubicacion[0].upper() + ubicacion[1:],
                     es_valido=False,
-                    valor_actual=error["fuente"],
-                    valor_esperado=settings.font_name,
-                    mensaje=f"Fuente incorrecta en párrafo {error['parrafo']}: '{error['texto']}...'",
+                    valor_actual=run.fuente,
+                    valor_esperado=reglas.nombre,
+                    mensaje=f"Fuente incorrecta en {ubicacion}: '{run.texto[:50]}...'",
                     severidad=Severidad.ERROR,
-                    sugerencia=f"Cambiar fuente a {settings.font_name}",
+                    sugerencia=f"Cambiar fuente a {reglas.nombre}",
+                    pagina=maquetar(snapshot).pagina(para.indice) if en_cuerpo else None,
                 )
             )
 
-        if len(parrafos_con_error_fuente) > 3:
+        if errores_fuente > reglas.errores_listados:
             resultados.append(
                 ValidacionItem(
                     tipo="Fuente",
                     categoria="Resumen errores",
                     es_valido=False,
-                    mensaje=f"Se encontraron {len(parrafos_con_error_fuente)} párrafos con fuente incorrecta",
+                    mensaje=f"Se encontraron {errores_fuente} párrafos con fuente incorrecta",
                     severidad=Severidad.ADVERTENCIA,
-                    sugerencia="Seleccionar todo el texto y aplicar Times New Roman",
+                    sugerencia=f"Seleccionar todo el texto y aplicar {reglas.nombre}",
                 )
             )
 
@@ -0,0 +1,180 @@
+"""
+Recorrido de todos los párrafos del documento, en todas sus historias.
+
+`doc.paragraphs` solo ve los párrafos sueltos del cuerpo. Las fuentes y el
+interlineado suelen estar mal justamente en lo que queda fuera: celdas de
+tablas (también anidadas), controles de contenido, cuadros de texto,
+encabezados, pies de página y notas. Este módulo los recorre con
+generadores sobre los elementos lxml, sin armar listas ni objetos proxy de
+python-docx, y etiqueta cada w:p con su historia y su ubicación:
+
+    ParrafoUbicado("cuerpo", "", p)
+    ParrafoUbicado("cuerpo", "tabla 2, fila 3, celda 1", p)
+    ParrafoUbicado("encabezado", "cuadro de texto", p)
+    ParrafoUbicado("nota al pie", "nota 4", p)
+
+El orden es el del documento: el cuerpo, luego encabezados y pies en el
+orden de las secciones, luego notas al pie y notas finales. Sirve para el
+árbol de python-docx (`iterar_historias`) y para el motor XML en streaming
+(`parrafos_hijos` sobre los hijos de w:body a medida que se cierran).
+"""
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from lxml import etree
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+W_P = _W + "p"
+W_TBL = _W + "tbl"
+W_TR = _W + "tr"
+W_TC = _W + "tc"
+W_SDT = _W + "sdt"
+W_SDT_CONTENT = _W + "sdtContent"
+W_CUSTOM_XML = _W + "customXml"
+W_TXBX_CONTENT = _W + "txbxContent"
+W_SECTPR = _W + "sectPr"
+W_HEADER_REFERENCE = _W + "headerReference"
+W_FOOTER_REFERENCE = _W + "footerReference"
+W_FOOTNOTE = _W + "footnote"
+W_ENDNOTE = _W + "endnote"
+MC_FALLBACK = _MC + "Fallback"
+
+A_TYPE = _W + "type"
+A_ID = _W + "id"
+A_R_ID = _R + "id"
+
+HISTORIA_CUERPO = "cuerpo"
+HISTORIA_ENCABEZADO = "encabezado"
+HISTORIA_PIE = "pie de página"
+HISTORIA_NOTA_PIE = "nota al pie"
+HISTORIA_NOTA_FINAL = "nota final"
+
+TIPO_HEADER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/header"
+TIPO_FOOTER = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footer"
+TIPO_FOOTNOTES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/footnotes"
+TIPO_ENDNOTES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/endnotes"
+
+# Notas que Word usa como separadores, no escritas por el autor
+_NOTAS_ESPECIALES = ("separator", "continuationSeparator", "continuationNotice")
+
+
+class ParrafoUbicado(NamedTuple):
+    historia: str
+    ubicacion: str  # "" para un párrafo suelto de su historia
+    elemento: object  # w:p
+
+
+def _dentro(ubicacion: str, lugar: str) -> str:
+    return f"{ubicacion} > {lugar}" if ubicacion else lugar
+
+
+def _cuadros_texto(p) -> Iterator:
+    """w:txbxContent del párrafo, sin los anidados ni la copia de mc:Fallback."""
+    for txbx in p.iter(W_TXBX_CONTENT):
+        padre = txbx.getparent()
+        while padre is not None and padre is not p:
+            if padre.tag == W_TXBX_CONTENT or padre.tag == MC_FALLBACK:
+                break
+            padre = padre.getparent()
+        else:
+            yield txbx
+
+
+def parrafos_bloque(contenedor, historia: str, ubicacion: str = "") -> Iterator[ParrafoUbicado]:
+    """Párrafos de un contenedor de bloques (w:body, w:tc, w:txbxContent, w:hdr, una nota, ...)."""
+    return parrafos_hijos(contenedor.iterchildren(), historia, ubicacion)
+
+
+def parrafos_hijos(hijos: Iterable, historia: str, ubicacion: str = "") -> Iterator[ParrafoUbicado]:
+    """
+    Párrafos de una secuencia de elementos de bloque hermanos, en orden.
+
+    `hijos` puede ser un iterador en streaming: cada elemento se termina de
+    recorrer antes de pedir el siguiente.
+    """
+    tablas = 0
+    for hijo in hijos:
+        tag = hijo.tag
+        if tag == W_P:
+            yield ParrafoUbicado(historia, ubicacion, hijo)
+            for txbx in _cuadros_texto(hijo):
+                yield from parrafos_bloque(txbx, historia, _dentro(ubicacion, "cuadro de texto"))
+        elif tag == W_TBL:
+            tablas += 1
+            for f, tr in enumerate(hijo.iterchildren(W_TR), 1):
+                for c, tc in enumerate(tr.iterchildren(W_TC), 1):
+                    lugar = _dentro(ubicacion, f"tabla {tablas}, fila {f}, celda {c}")
+                    yield from parrafos_bloque(tc, historia, lugar)
+        elif tag == W_SDT:
+            contenido = hijo.find(W_SDT_CONTENT)
+            if contenido is not None:
+                yield from parrafos_bloque(
+                    contenido, historia, _dentro(ubicacion, "control de contenido")
+                )
+        elif tag == W_CUSTOM_XML:
+            yield from parrafos_bloque(hijo, historia, ubicacion)
+
+
+def parrafos_parte(raiz, historia: str) -> Iterator[ParrafoUbicado]:
+    """Párrafos de una parte completa: w:hdr, w:ftr, w:footnotes o w:endnotes."""
+    if historia in (HISTORIA_NOTA_PIE, HISTORIA_NOTA_FINAL):
+        for nota in raiz:
+            if nota.tag not in (W_FOOTNOTE, W_ENDNOTE) or nota.get(A_TYPE) in _NOTAS_ESPECIALES:
+                continue
+            yield from parrafos_bloque(nota, historia, f"nota {nota.get(A_ID)}")
+    else:
+        yield from parrafos_bloque(raiz, historia)
+
+
+def referencias_secciones(sectPr) -> Iterator:
+    """(historia, r:id) de los encabezados y pies que referencia un w:sectPr."""
+    for referencia in sectPr:
+        if referencia.tag == W_HEADER_REFERENCE:
+            yield HISTORIA_ENCABEZADO, referencia.get(A_R_ID)
+        elif referencia.tag == W_FOOTER_REFERENCE:
+            yield HISTORIA_PIE, referencia.get(A_R_ID)
+
+
+def _elemento_parte(part):
+    """Raíz XML de una parte de python-docx (las que no conoce vienen como bytes)."""
+    elemento = getattr(part, "element", None)
+    if elemento is None:
+        elemento = etree.fromstring(part.blob)
+    return elemento
+
+
+def iterar_historias(doc, cuerpo: bool = True) -> Iterator[ParrafoUbicado]:
+    """
+    Todos los párrafos de un Document de python-docx, en orden del documento.
+
+    Con `cuerpo=False` se omiten los párrafos sueltos del cuerpo (los de
+    `doc.paragraphs`), pero no los de sus tablas, controles o cuadros de texto.
+    """
+    body = doc.element.body
+    for ubicado in parrafos_bloque(body, HISTORIA_CUERPO):
+        if cuerpo or ubicado.ubicacion or ubicado.elemento.getparent() is not body:
+            yield ubicado
+
+    partes = doc.part.related_parts
+    vistas = set()
+    for sectPr in body.iter(W_SECTPR):
+        for historia, r_id in referencias_secciones(sectPr):
+            part = partes.get(r_id)
+            if part is None or id(part) in vistas:
+                continue
+            vistas.add(id(part))
+            yield from parrafos_parte(_elemento_parte(part), historia)
+
+    for historia, tipo in ((HISTORIA_NOTA_PIE, TIPO_FOOTNOTES), (HISTORIA_NOTA_FINAL, TIPO_ENDNOTES)):
+        part = _parte_relacionada(doc.part, tipo)
+        if part is not None:
+            yield from parrafos_parte(_elemento_parte(part), historia)
+
+
+def _parte_relacionada(part, tipo: str) -> Optional[object]:
+    try:
+        return part.part_related_by(tipo)
+    except KeyError:
+        return None
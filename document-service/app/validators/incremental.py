@@ -0,0 +1,429 @@
+"""
+Revalidación incremental de nuevas versiones de un documento.
+
+Entre versiones de una tesis casi todo el cuerpo queda igual. word/document.xml
+se parte, sin parsearlo, en los bytes de cada hijo de w:body (_TrozosCuerpo) y
+por cada trozo se guarda lo que aportó a la instantánea (Trozo): sus párrafos y
+adicionales, secciones, encabezados y pies referenciados, tablas y su tramo de
+la tabla de formato (tabla.ParteTabla). En la siguiente versión solo se parsean
+y se resuelven contra los estilos los trozos cuyos bytes cambiaron; los demás
+se copian desplazando los índices. Los encabezados, pies y notas se reutilizan
+igual, por parte. Si cambian styles.xml, el tema o la etiqueta raíz (con los
+espacios de nombres) no se reutiliza nada.
+
+Lo que depende del orden de todo el documento (clasificación y estructura,
+capítulos de la tabla de formato, páginas estimadas) se vuelve a calcular
+sobre la instantánea armada, que es idéntica a la del motor XML, así que el
+ValidacionResultado es el mismo que el de una validación completa. Si el XML
+no se deja partir (un comentario entre los hijos de w:body, otra
+codificación), se recorre completo.
+
+El estado se guarda como JSON comprimido con zlib.
+"""
+import hashlib
+import io
+import json
+import re
+import zlib
+from itertools import chain
+from typing import IO, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from lxml import etree
+
+from ..config import get_settings
+from ..etapas import etapa, registrar
+from .disposicion import SIN_DISPOSICION, BloqueSnapshot, DisposicionParrafo
+from .estilos import ResolutorEstilos
+from .historias import HISTORIA_CUERPO
+from .motor_xml import FuentePaquete, PaqueteDocx, RecorridoCuerpo, abrir_paquete, parrafo_xml
+from .snapshot import (
+    DocumentoSnapshot,
+    ParrafoSnapshot,
+    RunSnapshot,
+    SeccionSnapshot,
+    registrar_tamano,
+)
+from .tabla import ParteTabla, parte_tabla, tabla_formato
+
+# Subir si cambia el contenido de la instantánea, la forma de resolverla o el
+# formato del estado (3: un trozo por hijo de w:body)
+VERSION_ESTADO = 3
+
+_BLOQUE_LECTURA = 1 << 20
+_CUERPO = re.compile(rb"<((?:[^\s<>/:]+:)?body)(?=[\s/>])")
+_ETIQUETA = re.compile(rb"<([^\s<>/?!][^\s<>/]*)")
+_BARRA = ord("/")
+
+
+class Trozo(NamedTuple):
+    """
+    Lo que aporta a la instantánea un hijo de w:body (o una parte de otra
+    historia). Índices y posiciones son relativos al trozo.
+    """
+
+    parrafos: Tuple[ParrafoSnapshot, ...]
+    adicionales: Tuple[ParrafoSnapshot, ...]
+    secciones: Tuple[SeccionSnapshot, ...]
+    referencias: Tuple[Tuple[str, str], ...]
+    bloques: Tuple[BloqueSnapshot, ...]
+    tabla: bool  # el hijo es una w:tbl: sus celdas se ubican como "tabla 1, ..."
+    parte: ParteTabla  # tramo de la tabla de formato de `parrafos`
+    parte_adicionales: ParteTabla  # y de `adicionales`
+
+
+class EstadoLinaje(NamedTuple):
+    """Lo que se conserva de la última versión validada de un documento."""
+
+    huella: str  # estilos, tema, etiqueta raíz y opciones
+    trozos: Dict[str, Trozo]  # huella de los bytes del trozo -> Trozo
+    lineas: Dict[str, str]  # los trozos leídos de un estado guardado, ya serializados
+
+
+class _SinTrozos(Exception):
+    """El XML no se deja partir en los hijos de w:body sin parsearlo."""
+
+
+class _TrozosCuerpo:
+    """
+    Bytes de cada hijo de w:body, leyendo el XML por bloques y sin parsearlo:
+    cada elemento termina donde se cierra la última etiqueta abierta con su
+    mismo nombre. `cabecera` (todo hasta la etiqueta de w:body) y `cierre`
+    permiten parsear un trozo solo, como si fuera el documento.
+    """
+
+    def __init__(self, xml: IO[bytes]):
+        self._xml = xml
+        self._datos = bytearray()
+        self._patrones: Dict[bytes, re.Pattern] = {}
+        while True:
+            cuerpo = _CUERPO.search(self._datos)
+            fin = self._datos.find(b">", cuerpo.end()) if cuerpo else -1
+            if fin != -1:
+                break
+            if not self._leer():
+                raise _SinTrozos()
+        raiz = _ETIQUETA.search(self._datos)
+        if self._datos[fin - 1] == _BARRA or raiz is None or raiz.start() >= cuerpo.start():
+            raise _SinTrozos()
+        self.cabecera = bytes(self._datos[: fin + 1])
+        self._fin_cuerpo = b"</" + cuerpo.group(1) + b">"
+        self.cierre = self._fin_cuerpo + b"</" + raiz.group(1) + b">"
+        self._pos = fin + 1
+
+    def _leer(self) -> bool:
+        bloque = self._xml.read(max(_BLOQUE_LECTURA, len(self._datos)))
+        self._datos += bloque
+        return bool(bloque)
+
+    def __iter__(self) -> Iterator[bytes]:
+        datos = self._datos
+        pos = self._pos
+        while True:
+            inicio = datos.find(b"<", pos)
+            fin = self._fin_elemento(inicio) if 0 <= inicio < len(datos) - 1 else None
+            if fin is None:
+                if not self._leer():
+                    raise _SinTrozos()
+                continue
+            if fin == 0:  # </w:body>
+                return
+            yield bytes(datos[inicio:fin])
+            pos = fin
+            if pos > _BLOQUE_LECTURA:
+                del datos[:pos]
+                pos = 0
+
+    def _fin_elemento(self, inicio: int) -> Optional[int]:
+        """Fin del elemento que empieza en `inicio`; 0 si es el cierre de w:body, None si faltan datos."""
+        datos = self._datos
+        siguiente = datos[inicio + 1]
+        if siguiente == _BARRA:
+            if len(datos) - inicio < len(self._fin_cuerpo):
+                return None
+            if not datos.startswith(self._fin_cuerpo, inicio):
+                raise _SinTrozos()
+            return 0
+        if siguiente in b"!?":
+            # Comentario o instrucción de procesamiento entre los hijos
+            raise _SinTrozos()
+        nombre = _ETIQUETA.match(datos, inicio)
+        if nombre is None or nombre.end() >= len(datos):
+            return None
+        patron = self._patrones.get(nombre.group(1))
+        if patron is None:
+            patron = self._patrones[nombre.group(1)] = re.compile(
+                rb"<(/?)" + re.escape(nombre.group(1)) + rb"[\s/>]"
+            )
+        profundidad = 0
+        for etiqueta in patron.finditer(datos, inicio):
+            fin = datos.find(b">", etiqueta.end() - 1)
+            if fin == -1:
+                return None
+            if etiqueta.group(1):
+                profundidad -= 1
+            elif datos[fin - 1] != _BARRA:
+                profundidad += 1
+            if profundidad == 0:
+                return fin + 1
+        return None
+
+
+def _huella(datos: bytes) -> str:
+    return hashlib.blake2b(datos, digest_size=16).hexdigest()
+
+
+def _huella_paquete(paquete: PaqueteDocx, cabecera: bytes, todas_las_historias: bool) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(b"%d:%d" % (VERSION_ESTADO, todas_las_historias))
+    for parte in (paquete.styles_xml, paquete.theme_xml, cabecera):
+        h.update(b"\0" if parte is None else b"\1%d:" % len(parte) + parte)
+    return h.hexdigest()
+
+
+def _trozo(recorrido: RecorridoCuerpo) -> Trozo:
+    return Trozo(
+        tuple(recorrido.parrafos),
+        tuple(recorrido.adicionales),
+        tuple(recorrido.secciones),
+        tuple(recorrido.referencias),
+        tuple(recorrido.bloques),
+        recorrido.tablas > 0,
+        parte_tabla(recorrido.parrafos),
+        parte_tabla(recorrido.adicionales),
+    )
+
+
+def _desplazar(filas: Sequence[ParrafoSnapshot], base: int, tabla: int = 1) -> Sequence[ParrafoSnapshot]:
+    """Filas de un trozo con el índice corrido en `base` y sus celdas en la tabla número `tabla`."""
+    if not base and tabla == 1:
+        return filas
+    resultado = []
+    for p in filas:
+        if tabla != 1 and p.ubicacion.startswith("tabla 1,"):
+            p = p._replace(ubicacion=f"tabla {tabla}" + p.ubicacion[len("tabla 1"):])
+        resultado.append(p._replace(indice=p.indice + base))
+    return resultado
+
+
+def _unir(cuerpo: List[Trozo], historias: List[Trozo]) -> Tuple[DocumentoSnapshot, List[ParteTabla]]:
+    """Instantánea de los trozos en orden, y los tramos de su tabla de formato."""
+    parrafos: List[ParrafoSnapshot] = []
+    adicionales: List[ParrafoSnapshot] = []
+    secciones: List[SeccionSnapshot] = []
+    bloques: List[BloqueSnapshot] = []
+    tablas = 0
+    for trozo in cuerpo:
+        if trozo.tabla:
+            tablas += 1
+        base = len(parrafos)
+        bloques.extend(b._replace(antes_de=b.antes_de + base) for b in trozo.bloques)
+        parrafos.extend(_desplazar(trozo.parrafos, base))
+        adicionales.extend(
+            _desplazar(trozo.adicionales, len(adicionales), tablas if trozo.tabla else 1)
+        )
+        secciones.extend(trozo.secciones)
+    for trozo in historias:
+        adicionales.extend(_desplazar(trozo.adicionales, len(adicionales)))
+
+    snapshot = DocumentoSnapshot(
+        parrafos=tuple(parrafos),
+        secciones=tuple(secciones),
+        adicionales=tuple(adicionales),
+        bloques=tuple(bloques),
+    )
+    # Mismo orden que con_texto(todas_las_historias=True): cuerpo y después adicionales
+    partes = [t.parte for t in cuerpo]
+    partes.extend(t.parte_adicionales for t in chain(cuerpo, historias))
+    return snapshot, partes
+
+
+class _Incremental:
+    """Trozos de una versión, reutilizando los de `previos` y calculando los que cambiaron."""
+
+    def __init__(self, paquete: PaqueteDocx, previos: Dict[str, Trozo], todas_las_historias: bool):
+        self.paquete = paquete
+        self.previos = previos
+        self.todas_las_historias = todas_las_historias
+        self.nuevos: Dict[str, Trozo] = {}
+        self.revalidados = 0
+        self._estilos: Optional[ResolutorEstilos] = None
+
+    def _construir(self, p, indice: int) -> ParrafoSnapshot:
+        # El resolutor solo se arma si algún trozo cambió
+        if self._estilos is None:
+            self._estilos = ResolutorEstilos.desde_xml(self.paquete.styles_xml, self.paquete.theme_xml)
+        return parrafo_xml(p, indice, self._estilos)
+
+    def _reutilizar(self, clave: str) -> Optional[Trozo]:
+        trozo = self.previos.get(clave) or self.nuevos.get(clave)
+        if trozo is not None:
+            self.nuevos[clave] = trozo
+        return trozo
+
+    def _calculado(self, clave: str, recorrido: RecorridoCuerpo) -> Trozo:
+        trozo = self.nuevos[clave] = _trozo(recorrido)
+        self.revalidados += len(trozo.parrafos) + len(trozo.adicionales)
+        return trozo
+
+    def cuerpo(self, trozos: _TrozosCuerpo) -> List[Trozo]:
+        resultado = []
+        for contenido in trozos:
+            clave = _huella(contenido)
+            trozo = self._reutilizar(clave)
+            if trozo is None:
+                recorrido = RecorridoCuerpo(self._construir, self.todas_las_historias)
+                recorrido.cuerpo(io.BytesIO(b"".join((trozos.cabecera, contenido, trozos.cierre))))
+                if recorrido.hijos > 1:
+                    raise _SinTrozos()
+                trozo = self._calculado(clave, recorrido)
+            resultado.append(trozo)
+        return resultado
+
+    def historias(self, referencias: List[Tuple[str, str]]) -> List[Trozo]:
+        resultado = []
+        for historia, contenido in self.paquete.historias(referencias):
+            clave = _huella(historia.encode() + b"\0" + contenido)
+            trozo = self._reutilizar(clave)
+            if trozo is None:
+                recorrido = RecorridoCuerpo(self._construir, True)
+                recorrido.historia(historia, contenido)
+                trozo = self._calculado(clave, recorrido)
+            resultado.append(trozo)
+        return resultado
+
+    def completo(self) -> Tuple[List[Trozo], List[Trozo]]:
+        """Todo el cuerpo como un solo trozo, que no se guarda."""
+        self.nuevos.clear()
+        recorrido = RecorridoCuerpo(self._construir, self.todas_las_historias)
+        with self.paquete.documento() as xml:
+            recorrido.cuerpo(xml)
+        trozo = _trozo(recorrido)
+        self.revalidados = len(trozo.parrafos) + len(trozo.adicionales)
+        return [trozo], []
+
+
+def construir_snapshot_incremental(
+    fuente: FuentePaquete,
+    previo: Optional[EstadoLinaje],
+    todas_las_historias: Optional[bool] = None,
+) -> Tuple[DocumentoSnapshot, EstadoLinaje, int]:
+    """
+    Instantánea del documento (la misma que construir_snapshot_xml)
+    reutilizando los trozos sin cambios de `previo`. Deja armada la tabla de
+    formato de la instantánea con los tramos de los trozos. Retorna
+    (instantánea, estado para la próxima versión, párrafos resueltos de nuevo).
+    """
+    if todas_las_historias is None:
+        todas_las_historias = get_settings().validation_stories
+    with etapa("snapshot_incremental"), abrir_paquete(fuente) as paquete:
+        huella = ""
+        incremental = _Incremental(paquete, {}, todas_las_historias)
+        try:
+            with paquete.documento() as xml:
+                trozos = _TrozosCuerpo(xml)
+                huella = _huella_paquete(paquete, trozos.cabecera, todas_las_historias)
+                if previo is not None and previo.huella == huella:
+                    incremental.previos = previo.trozos
+                cuerpo = incremental.cuerpo(trozos)
+        except (_SinTrozos, etree.XMLSyntaxError):
+            # Si el documento está mal formado, el recorrido completo lo informa
+            cuerpo, _ = incremental.completo()
+        historias: List[Trozo] = []
+        if todas_las_historias:
+            referencias = list(chain.from_iterable(t.referencias for t in cuerpo))
+            historias = incremental.historias(referencias)
+
+    snapshot, partes = _unir(cuerpo, historias)
+    tabla_formato(snapshot, partes)
+    registrar_tamano(snapshot)
+    registrar("parrafos_revalidados", incremental.revalidados)
+    # Las líneas del estado previo solo sirven si sus trozos se reutilizaron
+    lineas = previo.lineas if incremental.previos else {}
+    estado = EstadoLinaje(huella, incremental.nuevos, lineas)
+    return snapshot, estado, incremental.revalidados
+
+
+# -- Estado guardado ----------------------------------------------------------
+#
+# Una línea JSON de cabecera y una por trozo ("huella<TAB>json"), todo
+# comprimido con zlib. Las líneas de los trozos que vienen del estado previo se
+# vuelven a escribir tal cual, sin serializarlas de nuevo. Los tramos leídos
+# quedan con listas en lugar de array.array (TablaFormato solo los copia).
+
+
+def _fila(p: ParrafoSnapshot) -> list:
+    """
+    Párrafo como lista. El texto casi siempre es el de sus runs y se omite;
+    historia, ubicación y disposición solo van si no son las por defecto.
+    """
+    texto = None if p.texto == "".join(r.texto for r in p.runs).strip() else p.texto
+    fila = [p.indice, texto, *p[2:8]]
+    if p.disposicion != SIN_DISPOSICION:
+        fila.extend(p[8:])
+    elif p.historia != HISTORIA_CUERPO or p.ubicacion:
+        fila.extend(p[8:10])
+    return fila
+
+
+def _linea(trozo: Trozo) -> str:
+    # Las demás NamedTuple se escriben como listas y los array.array con `default`
+    return json.dumps(
+        [list(map(_fila, trozo.parrafos)), list(map(_fila, trozo.adicionales)), *trozo[2:]],
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=list,
+    )
+
+
+def serializar_estado(estado: EstadoLinaje) -> bytes:
+    lineas = [json.dumps({"version": VERSION_ESTADO, "huella": estado.huella})]
+    for clave, trozo in estado.trozos.items():
+        linea = estado.lineas.get(clave)
+        lineas.append(f"{clave}\t{linea if linea is not None else _linea(trozo)}")
+    return zlib.compress("\n".join(lineas).encode(), 1)
+
+
+def _parrafo(fila: list) -> ParrafoSnapshot:
+    indice, texto, estilo, interlineado, sangria, antes, despues, runs, *resto = fila
+    runs = tuple(map(RunSnapshot._make, runs))
+    if texto is None:
+        texto = "".join(r.texto for r in runs).strip()
+    if len(resto) == 3:
+        resto[2] = DisposicionParrafo._make(resto[2])
+    return ParrafoSnapshot(indice, texto, estilo, interlineado, sangria, antes, despues, runs, *resto)
+
+
+def _leer_trozo(linea: str) -> Trozo:
+    parrafos, adicionales, secciones, referencias, bloques, tabla, parte, parte_adicionales = json.loads(linea)
+    return Trozo(
+        tuple(map(_parrafo, parrafos)),
+        tuple(map(_parrafo, adicionales)),
+        tuple(map(SeccionSnapshot._make, secciones)),
+        tuple(map(tuple, referencias)),
+        tuple(
+            BloqueSnapshot(
+                antes_de,
+                tuple(tuple((ancho, tuple(caracteres)) for ancho, caracteres in fila) for fila in filas),
+            )
+            for antes_de, filas in bloques
+        ),
+        tabla,
+        ParteTabla._make(parte),
+        ParteTabla._make(parte_adicionales),
+    )
+
+
+def deserializar_estado(datos: Optional[bytes]) -> Optional[EstadoLinaje]:
+    """Estado guardado, o None si no hay o es de otra versión/ilegible."""
+    if not datos:
+        return None
+    try:
+        cabecera, *resto = zlib.decompress(datos).decode().split("\n")
+        crudo = json.loads(cabecera)
+        if crudo.get("version") != VERSION_ESTADO:
+            return None
+        lineas = dict(linea.split("\t", 1) for linea in resto)
+        trozos = {clave: _leer_trozo(linea) for clave, linea in lineas.items()}
+        return EstadoLinaje(crudo["huella"], trozos, lineas)
+    except (zlib.error, ValueError, TypeError, KeyError, AttributeError):
+        return None
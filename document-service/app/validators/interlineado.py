@@ -1,73 +1,34 @@
 from docx import Document
-from docx.shared import Pt, Cm, Twips
-from docx.enum.text import WD_LINE_SPACING
-from typing import List
+from typing import List, Optional, Union
 from collections import Counter
 from ..models import ValidacionItem, Severidad
-from ..config import get_settings
+from .reglas import PlanReglas, plan_reglas
+from .snapshot import DocumentoSnapshot, obtener_snapshot
+from .tabla import tabla_formato
 
 
-def twips_to_pt(twips: int) -> float:
-    """Convertir twips a puntos"""
-    return twips / 20.0
-
-
-def validar_interlineado(doc: Document) -> List[ValidacionItem]:
+def validar_interlineado(
+    doc: Union[Document, DocumentoSnapshot], plan: Optional[PlanReglas] = None
+) -> List[ValidacionItem]:
     """
     Valida el interlineado del documento según la Guía UNAP 2.0:
     - Interlineado: 2.0 (doble espacio)
     - Sangría primera línea: 1.25 cm
     """
-    settings = get_settings()
+    reglas = (plan or plan_reglas()).parrafo
+    tabla = tabla_formato(obtener_snapshot(doc))
     resultados = []
 
-    # Contadores
-    interlineados: Counter = Counter()
-    sangrias: Counter = Counter()
-    parrafos_analizados = 0
-    parrafos_con_interlineado_correcto = 0
-    parrafos_con_sangria_correcta = 0
-
-    tolerancia_sangria = 0.15  # 1.5mm de tolerancia
-
-    for i, para in enumerate(doc.paragraphs):
-        if not para.text.strip():
-            continue
-
-        parrafos_analizados += 1
-        pf = para.paragraph_format
+    tolerancia_sangria = reglas.tolerancia_sangria_cm
+    doble = reglas.interlineado == 2.0
 
-        # Verificar interlineado
-        line_spacing = pf.line_spacing
-        line_rule = pf.line_spacing_rule
-
-        interlineado_valor = None
-        if line_rule == WD_LINE_SPACING.DOUBLE:
-            interlineado_valor = 2.0
-        elif line_rule == WD_LINE_SPACING.ONE_POINT_FIVE:
-            interlineado_valor = 1.5
-        elif line_rule == WD_LINE_SPACING.SINGLE:
-            interlineado_valor = 1.0
-        elif line_rule == WD_LINE_SPACING.MULTIPLE and line_spacing:
-            interlineado_valor = line_spacing
-        elif line_rule == WD_LINE_SPACING.EXACTLY and line_spacing:
-            # Convertir de puntos a múltiplo aproximado (12pt base)
-            interlineado_valor = twips_to_pt(line_spacing.twips) / 12.0
-        elif line_spacing:
-            interlineado_valor = line_spacing
-
-        if interlineado_valor:
-            interlineados[round(interlineado_valor, 1)] += 1
-            if abs(interlineado_valor - settings.line_spacing) < 0.1:
-                parrafos_con_interlineado_correcto += 1
-
-        # Verificar sangría primera línea
-        first_line_indent = pf.first_line_indent
-        if first_line_indent:
-            sangria_cm = first_line_indent.cm if hasattr(first_line_indent, 'cm') else first_line_indent / 360000
-            sangrias[round(sangria_cm, 2)] += 1
-            if abs(sangria_cm - settings.first_line_indent_cm) <= tolerancia_sangria:
-                parrafos_con_sangria_correcta += 1
+    # Estadísticas sobre las columnas de la tabla (una fila por párrafo con texto)
+    parrafos_analizados = len(tabla.parrafos)
+    interlineados: Counter = tabla.histograma(tabla.p_interlineado, 1)
+    parrafos_con_interlineado_correcto = tabla.cumplen(
+        tabla.p_interlineado, reglas.interlineado, reglas.tolerancia_interlineado
+    )
+    sangrias: Counter = tabla.histograma(tabla.p_sangria, 2)
 
     # Resultados de interlineado
     if parrafos_analizados > 0:
@@ -78,20 +39,20 @@ def validar_interlineado(doc: Document) -> List[ValidacionItem]:
 
         if interlineado_principal:
             valor, conteo = interlineado_principal[0]
-            es_correcto = abs(valor - settings.line_spacing) < 0.1
+            es_correcto = abs(valor - reglas.interlineado) < reglas.tolerancia_interlineado
 
             resultados.append(
                 ValidacionItem(
                     tipo="Interlineado",
                     categoria="Principal",
-                    es_valido=es_correcto and porcentaje_interlineado > 80,
+                    es_valido=es_correcto and porcentaje_interlineado > reglas.minimo_interlineado_pct,
                     valor_actual=f"{valor}",
-                    valor_esperado=f"{settings.line_spacing} (doble espacio)",
+                    valor_esperado=f"{reglas.interlineado} (doble espacio)" if doble else f"{reglas.interlineado}",
                     mensaje=f"Interlineado principal: {valor}"
                     if es_correcto
-                    else f"Interlineado incorrecto: {valor} (esperado: {settings.line_spacing})",
+                    else f"Interlineado incorrecto: {valor} (esperado: {reglas.interlineado})",
                     severidad=Severidad.ERROR if not es_correcto else Severidad.SUGERENCIA,
-                    sugerencia="Aplicar interlineado doble (2.0) a todo el documento"
+                    sugerencia=f"Aplicar interlineado {'doble (2.0)' if doble else reglas.interlineado} a todo el documento"
                     if not es_correcto
                     else None,
                 )
@@ -102,15 +63,15 @@ def validar_interlineado(doc: Document) -> List[ValidacionItem]:
                 ValidacionItem(
                     tipo="Interlineado",
                     categoria="Cumplimiento",
-                    es_valido=porcentaje_interlineado > 80,
+                    es_valido=porcentaje_interlineado > reglas.minimo_interlineado_pct,
                     valor_actual=f"{porcentaje_interlineado:.1f}%",
-                    valor_esperado=">80%",
+                    valor_esperado=f">{reglas.minimo_interlineado_pct:g}%",
                     mensaje=f"{parrafos_con_interlineado_correcto} de {parrafos_analizados} párrafos tienen interlineado correcto",
                     severidad=Severidad.ADVERTENCIA
-                    if porcentaje_interlineado < 80
+                    if porcentaje_interlineado < reglas.minimo_interlineado_pct
                     else Severidad.SUGERENCIA,
                     sugerencia="Revisar y corregir interlineado en párrafos restantes"
-                    if porcentaje_interlineado < 80
+                    if porcentaje_interlineado < reglas.minimo_interlineado_pct
                     else None,
                 )
             )
@@ -120,7 +81,7 @@ def validar_interlineado(doc: Document) -> List[ValidacionItem]:
         sangria_principal = sangrias.most_common(1)
         if sangria_principal:
             valor, conteo = sangria_principal[0]
-            es_correcta = abs(valor - settings.first_line_indent_cm) <= tolerancia_sangria
+            es_correcta = abs(valor - reglas.sangria_cm) <= tolerancia_sangria
 
             resultados.append(
                 ValidacionItem(
@@ -128,33 +89,22 @@ def validar_interlineado(doc: Document) -> List[ValidacionItem]:
                     categoria="Primera línea",
                     es_valido=es_correcta,
                     valor_actual=f"{valor:.2f} cm",
-                    valor_esperado=f"{settings.first_line_indent_cm} cm",
+                    valor_esperado=f"{reglas.sangria_cm} cm",
                     mensaje=f"Sangría de primera línea: {valor:.2f} cm"
                     if es_correcta
-                    else f"Sangría incorrecta: {valor:.2f} cm (esperado: {settings.first_line_indent_cm} cm)",
+                    else f"Sangría incorrecta: {valor:.2f} cm (esperado: {reglas.sangria_cm} cm)",
                     severidad=Severidad.ERROR if not es_correcta else Severidad.SUGERENCIA,
-                    sugerencia=f"Ajustar sangría de primera línea a {settings.first_line_indent_cm} cm"
+                    sugerencia=f"Ajustar sangría de primera línea a {reglas.sangria_cm} cm"
                     if not es_correcta
                     else None,
                 )
             )
 
     # Verificar espaciado entre párrafos
-    espaciados_antes: Counter = Counter()
-    espaciados_despues: Counter = Counter()
-
-    for para in doc.paragraphs:
-        if not para.text.strip():
-            continue
-
-        pf = para.paragraph_format
-        if pf.space_before:
-            espaciados_antes[pf.space_before.pt if hasattr(pf.space_before, 'pt') else 0] += 1
-        if pf.space_after:
-            espaciados_despues[pf.space_after.pt if hasattr(pf.space_after, 'pt') else 0] += 1
+    espaciados_despues: Counter = tabla.histograma(tabla.p_espacio_despues)
 
     # Verificar consistencia de espaciado
-    if len(espaciados_despues) > 3:
+    if len(espaciados_despues) > reglas.maximo_espaciados:
         resultados.append(
             ValidacionItem(
                 tipo="Espaciado",
@@ -0,0 +1,323 @@
+"""
+Maquetación aproximada: en qué página cae cada párrafo del cuerpo.
+
+python-docx no sabe de páginas (las calcula Word al mostrar el documento),
+pero varias reglas de la guía hablan de ellas: la portada va sola, cada
+capítulo empieza en página nueva, las páginas preliminares van en romanos.
+Este módulo estima la paginación con lo que ya tiene la instantánea:
+
+- Anchos de carácter de Times New Roman y Arial (tablas métricas AFM de
+  Times-Roman y Helvetica, en milésimas de em). Las letras acentuadas usan
+  el ancho de su letra base; el resto de caracteres, un ancho promedio. El
+  ancho de cada palabra se memoiza por fuente.
+- Corte de líneas voraz sobre el ancho útil de la sección (con la sangría
+  de primera línea), con sumas acumuladas y bisect: una búsqueda por línea,
+  no una iteración por palabra.
+- Alto de línea = tamaño × 1.15 × interlineado, más el espaciado antes
+  (salvo al comienzo de página) y después de cada párrafo.
+- Saltos de página (manuales y pageBreakBefore), secciones que empiezan en
+  página nueva, imágenes en línea y filas de tablas, que se ubican enteras.
+
+No considera negritas, control de viudas y huérfanas, "conservar con el
+siguiente", encabezados, pies ni notas, así que las páginas son estimadas:
+alcanzan para ubicar un problema y para las reglas de inicio de página, no
+para reproducir la paginación de Word. Un documento de cientos de páginas
+se maqueta en unos pocos milisegundos.
+"""
+import unicodedata
+from array import array
+from bisect import bisect_right
+from itertools import accumulate, repeat
+from operator import add
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..etapas import etapa, registrar
+from .disposicion import BloqueSnapshot
+from .snapshot import DocumentoSnapshot, SeccionSnapshot, por_instantanea
+
+# Anchos AFM de los caracteres 32-126, en milésimas de em
+_TIMES_ASCII = (
+    250, 333, 408, 500, 500, 833, 778, 180, 333, 333, 500, 564, 250, 333, 250, 278,
+    500, 500, 500, 500, 500, 500, 500, 500, 500, 500, 278, 278, 564, 564, 564, 444,
+    921, 722, 667, 667, 722, 611, 556, 722, 722, 333, 389, 722, 611, 889, 722, 722,
+    556, 722, 667, 556, 611, 722, 722, 944, 722, 722, 611, 333, 278, 333, 469, 500,
+    333, 444, 500, 444, 500, 444, 333, 500, 500, 278, 278, 500, 278, 778, 500, 500,
+    500, 500, 333, 389, 278, 500, 500, 722, 500, 500, 444, 480, 200, 480, 541,
+)
+_HELVETICA_ASCII = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+)
+# Signos frecuentes en español fuera de ASCII
+_TIMES_EXTRA = {
+    "¿": 444, "¡": 333, "«": 500, "»": 500, "“": 444, "”": 444, "‘": 333, "’": 333,
+    "–": 500, "—": 1000, "…": 1000, "°": 400, "º": 310, "ª": 276, "•": 350, "\xa0": 250,
+}
+_HELVETICA_EXTRA = {
+    "¿": 611, "¡": 333, "«": 556, "»": 556, "“": 333, "”": 333, "‘": 222, "’": 222,
+    "–": 556, "—": 1000, "…": 1000, "°": 400, "º": 365, "ª": 370, "•": 350, "\xa0": 278,
+}
+_TABULACION = 3000  # tabulación por defecto: media pulgada a 12pt
+
+ALTO_LINEA_SENCILLA = 1.15  # alto de una línea sencilla, en ems (Times New Roman y Arial)
+
+# Familias sin serifa; las demás fuentes se miden con Times New Roman
+_SIN_SERIFA = ("arial", "helvetica", "calibri", "verdana", "tahoma", "segoe", "liberation sans")
+
+# Página Carta con márgenes de 1 pulgada (valores de Word si la sección no los define), en twips
+_PAGINA_WORD = SeccionSnapshot(1440, 1440, 1440, 1440, 12240, 15840)
+_RELLENO_CELDA_PT = 10.8  # márgenes izquierdo y derecho de celda por defecto
+
+
+class _Anchos(dict):
+    """Ancho de palabras de una fuente, en milésimas de em; se calcula una vez por palabra."""
+
+    def __init__(self, ascii_: Sequence[int], extra: Dict[str, int]):
+        super().__init__()
+        self.caracteres = {chr(32 + i): ancho for i, ancho in enumerate(ascii_)}
+        self.caracteres.update(extra)
+        self.caracteres["\t"] = _TABULACION
+        minusculas = ascii_[ord("a") - 32 : ord("z") - 32 + 1]
+        self.promedio = sum(minusculas) / len(minusculas)
+        self.espacio = self.caracteres[" "]
+
+    def caracter(self, c: str) -> float:
+        ancho = self.caracteres.get(c)
+        if ancho is None:
+            base = unicodedata.normalize("NFD", c)[0]
+            ancho = self.caracteres.get(base, self.promedio)
+            self.caracteres[c] = ancho
+        return ancho
+
+    def __missing__(self, palabra: str) -> float:
+        caracteres = self.caracteres
+        try:
+            ancho = sum(map(caracteres.__getitem__, palabra))
+        except KeyError:
+            ancho = sum(map(self.caracter, palabra))
+        self[palabra] = ancho
+        return ancho
+
+
+_TIMES = _Anchos(_TIMES_ASCII, _TIMES_EXTRA)
+_HELVETICA = _Anchos(_HELVETICA_ASCII, _HELVETICA_EXTRA)
+_METRICAS: Dict[Optional[str], _Anchos] = {}
+
+
+def metricas(fuente: Optional[str]) -> _Anchos:
+    """Tabla de anchos para la fuente `fuente` (Times New Roman si no se conoce)."""
+    tabla = _METRICAS.get(fuente)
+    if tabla is None:
+        nombre = (fuente or "").lower()
+        tabla = _HELVETICA if nombre.startswith(_SIN_SERIFA) else _TIMES
+        _METRICAS[fuente] = tabla
+    return tabla
+
+
+def contar_lineas(texto: str, anchos: _Anchos, ancho_em: float, primera_em: float) -> int:
+    """
+    Líneas que ocupa `texto` con corte voraz por palabras; `ancho_em` y
+    `primera_em` son los anchos disponibles (en milésimas de em) de las
+    líneas y de la primera línea de cada párrafo.
+    """
+    lineas = 0
+    espacio = anchos.espacio
+    disponible = primera_em
+    for segmento in texto.split("\n"):
+        palabras = segmento.split()
+        lineas += 1
+        if not palabras:
+            disponible = ancho_em
+            continue
+        # fin[j] = ancho de las palabras 0..j con un espacio detrás de cada una
+        fin = list(accumulate(map(add, map(anchos.__getitem__, palabras), repeat(espacio))))
+        inicio = 0.0
+        j = 0
+        n = len(palabras)
+        while True:
+            # Última palabra que entra en la línea (el espacio final no cuenta)
+            k = bisect_right(fin, inicio + disponible + espacio)
+            if k <= j:
+                # Palabra más larga que la línea: se parte en varias líneas
+                largo = fin[j] - inicio - espacio
+                lineas += int(largo // ancho_em)
+                k = j + 1
+            if k >= n:
+                break
+            lineas += 1
+            inicio = fin[k - 1]
+            j = k
+            disponible = ancho_em
+        disponible = ancho_em
+    return lineas
+
+
+class Maquetacion:
+    """Paginación estimada de los párrafos del cuerpo (páginas físicas, desde 1)."""
+
+    def __init__(self, paginas: array, arriba: array, secciones: array, inicio_secciones: List[int], total: int):
+        self.paginas = paginas  # página donde empieza cada párrafo de snapshot.parrafos
+        self.arriba = arriba  # 1 si el párrafo empieza al comienzo de su página
+        self.secciones = secciones  # sección de cada párrafo
+        self.inicio_secciones = inicio_secciones  # página donde empieza cada sección
+        self.total = total
+
+    def pagina(self, indice: int) -> Optional[int]:
+        """Página estimada del párrafo `indice` del cuerpo."""
+        return self.paginas[indice] if 0 <= indice < len(self.paginas) else None
+
+
+class _Flujo:
+    """Posición vertical en la página actual, en puntos."""
+
+    def __init__(self):
+        self.pagina = 1
+        self.y = 0.0
+        self.alto = 0.0  # alto útil de la página
+        self.pendiente = False  # salto de página a aplicar antes del próximo contenido
+
+    def nueva_pagina(self) -> None:
+        self.pagina += 1
+        self.y = 0.0
+        self.pendiente = False
+
+    def aplicar_pendiente(self) -> None:
+        if self.pendiente:
+            self.nueva_pagina()
+
+    def bloque(self, alto: float) -> None:
+        """Contenido que no se parte (imagen, fila de tabla)."""
+        if self.y > 0 and self.y + alto > self.alto:
+            self.nueva_pagina()
+        paginas, self.y = divmod(self.y + alto, self.alto)
+        self.pagina += int(paginas)
+
+    def lineas(self, cantidad: int, alto_linea: float) -> None:
+        """Líneas de texto; las que no entran pasan a las páginas siguientes."""
+        por_pagina = max(1, int(self.alto // alto_linea))
+        while cantidad:
+            entran = int((self.alto - self.y) // alto_linea)
+            if entran <= 0:
+                self.nueva_pagina()
+                entran = por_pagina
+            usadas = min(entran, cantidad)
+            self.y += usadas * alto_linea
+            cantidad -= usadas
+
+
+def _geometria(seccion: SeccionSnapshot) -> Tuple[float, float]:
+    """(ancho útil, alto útil) de la sección, en puntos."""
+    def valor(campo: str) -> int:
+        v = getattr(seccion, campo)
+        return v if v is not None else getattr(_PAGINA_WORD, campo)
+
+    ancho = valor("ancho_pagina") - valor("margen_izquierdo") - valor("margen_derecho")
+    alto = valor("alto_pagina") - valor("margen_superior") - valor("margen_inferior")
+    return max(ancho, 1440) / 20, max(alto, 1440) / 20
+
+
+def _ubicar_bloque(flujo: _Flujo, bloque: BloqueSnapshot, ancho_pt: float, anchos: _Anchos, tamano: float) -> None:
+    alto_linea = tamano * ALTO_LINEA_SENCILLA
+    promedio_pt = anchos.promedio * tamano / 1000
+    flujo.aplicar_pendiente()
+    for fila in bloque.filas:
+        alto_fila = 0.0
+        for ancho_twips, caracteres in fila:
+            ancho_celda = (ancho_twips / 20 if ancho_twips else ancho_pt / len(fila)) - _RELLENO_CELDA_PT
+            por_linea = max(1, int(max(ancho_celda, promedio_pt) // promedio_pt))
+            lineas = sum(max(1, -(-n // por_linea)) for n in caracteres)
+            alto_fila = max(alto_fila, lineas * alto_linea)
+        flujo.bloque(alto_fila)
+
+
+def _maquetar(snapshot: DocumentoSnapshot) -> Maquetacion:
+    secciones = snapshot.secciones or (_PAGINA_WORD,)
+    n = len(snapshot.parrafos)
+    paginas = array("i", bytes(4 * n))
+    arriba = array("B", bytes(n))
+    secciones_parrafo = array("i", bytes(4 * n))
+    inicio_secciones = [1]
+
+    flujo = _Flujo()
+    seccion = 0
+    ancho_pt, flujo.alto = _geometria(secciones[0])
+    bloques = iter(snapshot.bloques)
+    siguiente_bloque = next(bloques, None)
+    # Formato del último párrafo con texto, para los vacíos y las tablas
+    anchos, tamano, interlineado = _TIMES, 12.0, 1.0
+
+    for i, para in enumerate(snapshot.parrafos):
+        while siguiente_bloque is not None and siguiente_bloque.antes_de <= i:
+            _ubicar_bloque(flujo, siguiente_bloque, ancho_pt, anchos, tamano)
+            siguiente_bloque = next(bloques, None)
+
+        disposicion = para.disposicion
+        flujo.aplicar_pendiente()
+        if disposicion.salto_antes and flujo.y > 0:
+            flujo.nueva_pagina()
+
+        if para.texto:
+            run = next((r for r in para.runs if r.texto.strip()), None)
+            if run is not None:
+                anchos = metricas(run.fuente)
+                tamano = run.tamano_pt or tamano
+            interlineado = para.interlineado or 1.0
+        alto_linea = tamano * ALTO_LINEA_SENCILLA * interlineado
+
+        if flujo.y > 0:
+            flujo.y += para.espacio_antes_pt or 0.0
+        if flujo.y + alto_linea > flujo.alto:
+            flujo.nueva_pagina()
+        paginas[i] = flujo.pagina
+        arriba[i] = flujo.y == 0
+        secciones_parrafo[i] = seccion
+
+        if para.texto:
+            escala = 1000 / tamano
+            ancho_em = ancho_pt * escala
+            primera_em = ancho_em - (para.sangria_cm or 0.0) * 72 / 2.54 * escala
+            flujo.lineas(contar_lineas(para.texto, anchos, ancho_em, primera_em), alto_linea)
+        elif not disposicion.alto_objetos_pt:
+            flujo.lineas(1, alto_linea)
+        if disposicion.alto_objetos_pt:
+            flujo.bloque(disposicion.alto_objetos_pt)
+        flujo.y += para.espacio_despues_pt or 0.0
+        if disposicion.salto_despues:
+            flujo.pendiente = True
+
+        if disposicion.fin_seccion and seccion + 1 < len(secciones):
+            seccion += 1
+            nueva = secciones[seccion]
+            ancho_pt, flujo.alto = _geometria(nueva)
+            if nueva.inicio != "continuous":
+                flujo.aplicar_pendiente()
+                flujo.nueva_pagina()
+                # Página en blanco si la sección debe empezar en página par o impar
+                if (nueva.inicio == "oddPage" and flujo.pagina % 2 == 0) or (
+                    nueva.inicio == "evenPage" and flujo.pagina % 2 == 1
+                ):
+                    flujo.nueva_pagina()
+            inicio_secciones.append(flujo.pagina)
+
+    while siguiente_bloque is not None:
+        _ubicar_bloque(flujo, siguiente_bloque, ancho_pt, anchos, tamano)
+        siguiente_bloque = next(bloques, None)
+
+    total = flujo.pagina if flujo.y > 0 else max(flujo.pagina - 1, 1)
+    return Maquetacion(paginas, arriba, secciones_parrafo, inicio_secciones, total)
+
+
+def _maquetar_medido(snapshot: DocumentoSnapshot) -> Maquetacion:
+    with etapa("maquetacion"):
+        maquetacion = _maquetar(snapshot)
+    registrar("paginas_estimadas", maquetacion.total)
+    return maquetacion
+
+
+def maquetar(snapshot: DocumentoSnapshot) -> Maquetacion:
+    """Paginación estimada de la instantánea, calculada una vez por instantánea."""
+    return por_instantanea(snapshot, "maquetacion", _maquetar_medido)
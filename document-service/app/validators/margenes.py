@@ -1,8 +1,9 @@
 from docx import Document
-from docx.shared import Cm, Twips
-from typing import List
+from typing import List, Optional, Union
 from ..models import ValidacionItem, Severidad
-from ..config import get_settings
+from .maquetacion import maquetar
+from .reglas import PlanReglas, plan_reglas
+from .snapshot import DocumentoSnapshot, obtener_snapshot
 
 
 def twips_to_cm(twips: int) -> float:
@@ -10,7 +11,9 @@ def twips_to_cm(twips: int) -> float:
     return twips / 567.0
 
 
-def validar_margenes(doc: Document) -> List[ValidacionItem]:
+def validar_margenes(
+    doc: Union[Document, DocumentoSnapshot], plan: Optional[PlanReglas] = None
+) -> List[ValidacionItem]:
     """
     Valida los márgenes del documento según la Guía UNAP 2.0:
     - Superior: 3.5 cm
@@ -18,29 +21,35 @@ def validar_margenes(doc: Document) -> List[ValidacionItem]:
     - Izquierdo: 2.5 cm
     - Derecho: 2.5 cm
     """
-    settings = get_settings()
+    plan = plan or plan_reglas()
+    margenes = plan.margenes
+    snapshot = obtener_snapshot(doc)
     resultados = []
-    tolerancia = 0.2  # tolerancia de 2mm
+    tolerancia = margenes.tolerancia_cm
 
-    for i, section in enumerate(doc.sections):
-        section_name = f"Sección {i + 1}" if len(doc.sections) > 1 else "Documento"
+    inicio_secciones = maquetar(snapshot).inicio_secciones
+
+    for i, section in enumerate(snapshot.secciones):
+        section_name = f"Sección {i + 1}" if len(snapshot.secciones) > 1 else "Documento"
+        pagina = inicio_secciones[i] if i < len(inicio_secciones) else None
 
         # Margen superior
-        margin_top = twips_to_cm(section.top_margin.twips) if section.top_margin else 0
-        es_valido_top = abs(margin_top - settings.margin_top_cm) <= tolerancia
+        margin_top = twips_to_cm(section.margen_superior) if section.margen_superior else 0
+        es_valido_top = abs(margin_top - margenes.superior_cm) <= tolerancia
         resultados.append(
             ValidacionItem(
                 tipo="Margen",
                 categoria="Superior",
                 elemento=section_name,
+                pagina=pagina,
                 es_valido=es_valido_top,
                 valor_actual=f"{margin_top:.2f} cm",
-                valor_esperado=f"{settings.margin_top_cm} cm",
+                valor_esperado=f"{margenes.superior_cm} cm",
                 mensaje=f"Margen superior: {margin_top:.2f} cm"
                 if es_valido_top
-                else f"Margen superior incorrecto: {margin_top:.2f} cm (esperado: {settings.margin_top_cm} cm)",
+                else f"Margen superior incorrecto: {margin_top:.2f} cm (esperado: {margenes.superior_cm} cm)",
                 severidad=Severidad.ERROR if not es_valido_top else Severidad.SUGERENCIA,
-                sugerencia=f"Ajustar margen superior a {settings.margin_top_cm} cm"
+                sugerencia=f"Ajustar margen superior a {margenes.superior_cm} cm"
                 if not es_valido_top
                 else None,
             )
@@ -48,22 +57,23 @@ def validar_margenes(doc: Document) -> List[ValidacionItem]:
 
         # Margen inferior
         margin_bottom = (
-            twips_to_cm(section.bottom_margin.twips) if section.bottom_margin else 0
+            twips_to_cm(section.margen_inferior) if section.margen_inferior else 0
         )
-        es_valido_bottom = abs(margin_bottom - settings.margin_bottom_cm) <= tolerancia
+        es_valido_bottom = abs(margin_bottom - margenes.inferior_cm) <= tolerancia
         resultados.append(
             ValidacionItem(
                 tipo="Margen",
                 categoria="Inferior",
                 elemento=section_name,
+                pagina=pagina,
                 es_valido=es_valido_bottom,
                 valor_actual=f"{margin_bottom:.2f} cm",
-                valor_esperado=f"{settings.margin_bottom_cm} cm",
+                valor_esperado=f"{margenes.inferior_cm} cm",
                 mensaje=f"Margen inferior: {margin_bottom:.2f} cm"
                 if es_valido_bottom
-                else f"Margen inferior incorrecto: {margin_bottom:.2f} cm (esperado: {settings.margin_bottom_cm} cm)",
+                else f"Margen inferior incorrecto: {margin_bottom:.2f} cm (esperado: {margenes.inferior_cm} cm)",
                 severidad=Severidad.ERROR if not es_valido_bottom else Severidad.SUGERENCIA,
-                sugerencia=f"Ajustar margen inferior a {settings.margin_bottom_cm} cm"
+                sugerencia=f"Ajustar margen inferior a {margenes.inferior_cm} cm"
                 if not es_valido_bottom
                 else None,
             )
@@ -71,22 +81,23 @@ def validar_margenes(doc: Document) -> List[ValidacionItem]:
 
         # Margen izquierdo
         margin_left = (
-            twips_to_cm(section.left_margin.twips) if section.left_margin else 0
+            twips_to_cm(section.margen_izquierdo) if section.margen_izquierdo else 0
         )
-        es_valido_left = abs(margin_left - settings.margin_left_cm) <= tolerancia
+        es_valido_left = abs(margin_left - margenes.izquierdo_cm) <= tolerancia
         resultados.append(
             ValidacionItem(
                 tipo="Margen",
                 categoria="Izquierdo",
                 elemento=section_name,
+                pagina=pagina,
                 es_valido=es_valido_left,
                 valor_actual=f"{margin_left:.2f} cm",
-                valor_esperado=f"{settings.margin_left_cm} cm",
+                valor_esperado=f"{margenes.izquierdo_cm} cm",
                 mensaje=f"Margen izquierdo: {margin_left:.2f} cm"
                 if es_valido_left
-                else f"Margen izquierdo incorrecto: {margin_left:.2f} cm (esperado: {settings.margin_left_cm} cm)",
+                else f"Margen izquierdo incorrecto: {margin_left:.2f} cm (esperado: {margenes.izquierdo_cm} cm)",
                 severidad=Severidad.ERROR if not es_valido_left else Severidad.SUGERENCIA,
-                sugerencia=f"Ajustar margen izquierdo a {settings.margin_left_cm} cm"
+                sugerencia=f"Ajustar margen izquierdo a {margenes.izquierdo_cm} cm"
                 if not es_valido_left
                 else None,
             )
@@ -94,22 +105,23 @@ def validar_margenes(doc: Document) -> List[ValidacionItem]:
 
         # Margen derecho
         margin_right = (
-            twips_to_cm(section.right_margin.twips) if section.right_margin else 0
+            twips_to_cm(section.margen_derecho) if section.margen_derecho else 0
         )
-        es_valido_right = abs(margin_right - settings.margin_right_cm) <= tolerancia
+        es_valido_right = abs(margin_right - margenes.derecho_cm) <= tolerancia
         resultados.append(
             ValidacionItem(
                 tipo="Margen",
                 categoria="Derecho",
                 elemento=section_name,
+                pagina=pagina,
                 es_valido=es_valido_right,
                 valor_actual=f"{margin_right:.2f} cm",
-                valor_esperado=f"{settings.margin_right_cm} cm",
+                valor_esperado=f"{margenes.derecho_cm} cm",
                 mensaje=f"Margen derecho: {margin_right:.2f} cm"
                 if es_valido_right
-                else f"Margen derecho incorrecto: {margin_right:.2f} cm (esperado: {settings.margin_right_cm} cm)",
+                else f"Margen derecho incorrecto: {margin_right:.2f} cm (esperado: {margenes.derecho_cm} cm)",
                 severidad=Severidad.ERROR if not es_valido_right else Severidad.SUGERENCIA,
-                sugerencia=f"Ajustar margen derecho a {settings.margin_right_cm} cm"
+                sugerencia=f"Ajustar margen derecho a {margenes.derecho_cm} cm"
                 if not es_valido_right
                 else None,
             )
@@ -117,23 +129,24 @@ def validar_margenes(doc: Document) -> List[ValidacionItem]:
 
         # Tamaño de página (A4)
         page_width = (
-            twips_to_cm(section.page_width.twips) if section.page_width else 0
+            twips_to_cm(section.ancho_pagina) if section.ancho_pagina else 0
         )
         page_height = (
-            twips_to_cm(section.page_height.twips) if section.page_height else 0
+            twips_to_cm(section.alto_pagina) if section.alto_pagina else 0
         )
         es_a4 = (
-            abs(page_width - settings.page_width_cm) <= 0.5
-            and abs(page_height - settings.page_height_cm) <= 0.5
+            abs(page_width - plan.pagina.ancho_cm) <= plan.pagina.tolerancia_cm
+            and abs(page_height - plan.pagina.alto_cm) <= plan.pagina.tolerancia_cm
         )
         resultados.append(
             ValidacionItem(
                 tipo="Página",
                 categoria="Tamaño",
                 elemento=section_name,
+                pagina=pagina,
                 es_valido=es_a4,
                 valor_actual=f"{page_width:.1f} x {page_height:.1f} cm",
-                valor_esperado=f"{settings.page_width_cm} x {settings.page_height_cm} cm (A4)",
+                valor_esperado=f"{plan.pagina.ancho_cm} x {plan.pagina.alto_cm} cm (A4)",
                 mensaje="Tamaño de página correcto (A4)"
                 if es_a4
                 else f"Tamaño de página incorrecto: {page_width:.1f} x {page_height:.1f} cm",
@@ -0,0 +1,416 @@
+"""
+Motor de validación sobre el XML del paquete, sin python-docx.
+
+Lee `word/document.xml` directamente del zip con `iterparse`, procesa cada
+hijo de `w:body` al cerrarse y lo libera enseguida, de modo que nunca se
+construye el árbol completo ni los objetos proxy de python-docx. Produce el
+mismo DocumentoSnapshot que `construir_snapshot`, así que los validadores y
+sus resultados son idénticos con cualquiera de los dos motores.
+
+La memoria queda acotada por el texto del documento (que guarda la
+instantánea), no por el tamaño del XML. Con settings.validation_stories los
+párrafos de tablas, controles de contenido y cuadros de texto se recorren
+cuando se cierra su elemento del cuerpo, antes de liberarlo, y después se
+leen los encabezados, pies y notas: la memoria sigue acotada por el elemento
+más grande (p. ej. la tabla más grande), no por el documento.
+"""
+import io
+import posixpath
+import zipfile
+from contextlib import contextmanager
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from lxml import etree
+
+from .disposicion import BloqueSnapshot, bloque_xml, disposicion_parrafo, inicio_y_numeracion
+from .estilos import ResolutorEstilos, twips
+from .historias import (
+    HISTORIA_CUERPO,
+    HISTORIA_NOTA_FINAL,
+    HISTORIA_NOTA_PIE,
+    TIPO_ENDNOTES,
+    TIPO_FOOTNOTES,
+    parrafos_hijos,
+    parrafos_parte,
+    referencias_secciones,
+)
+from .snapshot import (
+    DocumentoSnapshot,
+    ParrafoSnapshot,
+    RunSnapshot,
+    SeccionSnapshot,
+    registrar_tamano,
+)
+from ..config import get_settings
+from ..etapas import etapa
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+W_BODY = _W + "body"
+W_P = _W + "p"
+W_R = _W + "r"
+W_HYPERLINK = _W + "hyperlink"
+W_TBL = _W + "tbl"
+W_SDT = _W + "sdt"
+W_CUSTOM_XML = _W + "customXml"
+W_SECTPR = _W + "sectPr"
+W_PPR = _W + "pPr"
+W_PSTYLE = _W + "pStyle"
+W_RPR = _W + "rPr"
+W_PGMAR = _W + "pgMar"
+W_PGSZ = _W + "pgSz"
+
+A_VAL = _W + "val"
+A_TYPE = _W + "type"
+
+# Texto equivalente de cada hijo de w:r (igual que python-docx)
+_TEXTO_FIJO = {
+    _W + "tab": "\t",
+    _W + "ptab": "\t",
+    _W + "cr": "\n",
+    _W + "noBreakHyphen": "-",
+}
+W_T = _W + "t"
+W_BR = _W + "br"
+
+TIPO_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+TIPO_STYLES = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"
+TIPO_THEME = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/theme"
+
+FuentePaquete = Union[bytes, str, IO[bytes]]
+
+# Recibe (styles.xml, theme1.xml) y retorna la función que arma cada párrafo:
+# (elemento w:p, índice) -> ParrafoSnapshot
+FabricaParrafos = Callable[
+    [Optional[bytes], Optional[bytes]], Callable[[object, int], ParrafoSnapshot]
+]
+
+
+def _ruta_rels(parte: str) -> str:
+    carpeta, nombre = posixpath.split(parte)
+    return posixpath.join(carpeta, "_rels", nombre + ".rels")
+
+
+def _destino_relacion(paquete: zipfile.ZipFile, origen: str, tipo: str) -> Optional[str]:
+    """Ruta dentro del zip de la parte relacionada con `origen` por `tipo`."""
+    try:
+        rels = etree.fromstring(paquete.read(_ruta_rels(origen)))
+    except KeyError:
+        return None
+    for rel in rels.iter(_REL + "Relationship"):
+        if rel.get("Type") == tipo and rel.get("TargetMode") != "External":
+            destino = rel.get("Target")
+            if destino.startswith("/"):
+                return destino.lstrip("/")
+            return posixpath.normpath(posixpath.join(posixpath.dirname(origen), destino))
+    return None
+
+
+def _relaciones(paquete: zipfile.ZipFile, origen: str) -> Dict[str, str]:
+    """r:id -> ruta dentro del zip de las partes internas relacionadas con `origen`."""
+    try:
+        rels = etree.fromstring(paquete.read(_ruta_rels(origen)))
+    except KeyError:
+        return {}
+    rutas = {}
+    for rel in rels.iter(_REL + "Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        destino = rel.get("Target")
+        if destino.startswith("/"):
+            rutas[rel.get("Id")] = destino.lstrip("/")
+        else:
+            rutas[rel.get("Id")] = posixpath.normpath(posixpath.join(posixpath.dirname(origen), destino))
+    return rutas
+
+
+def _leer_relacionada(paquete: zipfile.ZipFile, origen: str, tipo: str) -> Optional[bytes]:
+    ruta = _destino_relacion(paquete, origen, tipo)
+    if ruta is None:
+        return None
+    return _leer(paquete, ruta)
+
+
+def _leer(paquete: zipfile.ZipFile, ruta: str) -> Optional[bytes]:
+    try:
+        return paquete.read(ruta)
+    except KeyError:
+        return None
+
+
+def _texto_run(r) -> str:
+    partes = []
+    for hijo in r:
+        tag = hijo.tag
+        if tag == W_T:
+            partes.append(hijo.text or "")
+        elif tag == W_BR:
+            if hijo.get(A_TYPE, "textWrapping") == "textWrapping":
+                partes.append("\n")
+        else:
+            fijo = _TEXTO_FIJO.get(tag)
+            if fijo is not None:
+                partes.append(fijo)
+    return "".join(partes)
+
+
+def parrafo_xml(p, indice: int, estilos: ResolutorEstilos) -> ParrafoSnapshot:
+    """Instantánea de un elemento w:p."""
+    runs_directos = []
+    partes_texto = []
+    for hijo in p:
+        if hijo.tag == W_R:
+            texto_run = _texto_run(hijo)
+            runs_directos.append((hijo, texto_run))
+            partes_texto.append(texto_run)
+        elif hijo.tag == W_HYPERLINK:
+            partes_texto.extend(_texto_run(r) for r in hijo.iterchildren(W_R))
+
+    texto = "".join(partes_texto).strip()
+    pPr = p.find(W_PPR)
+    style_id = None
+    if pPr is not None:
+        pStyle = pPr.find(W_PSTYLE)
+        if pStyle is not None:
+            style_id = pStyle.get(A_VAL)
+    formato = estilos.parrafo(style_id, pPr)
+    disposicion = disposicion_parrafo(p, formato.salto_pagina_antes)
+    if not texto:
+        return ParrafoSnapshot(indice, "", None, None, None, None, None, (), disposicion=disposicion)
+
+    runs = []
+    for r, texto_run in runs_directos:
+        props = estilos.run(style_id, r.find(W_RPR))
+        runs.append(RunSnapshot(texto_run, props.fuente, props.tamano_pt))
+
+    return ParrafoSnapshot(
+        indice=indice,
+        texto=texto,
+        estilo=estilos.nombre_estilo(style_id),
+        interlineado=formato.interlineado,
+        sangria_cm=formato.sangria_cm,
+        espacio_antes_pt=formato.espacio_antes_pt,
+        espacio_despues_pt=formato.espacio_despues_pt,
+        runs=tuple(runs),
+        disposicion=disposicion,
+    )
+
+
+def _seccion(sectPr) -> SeccionSnapshot:
+    def medida(elemento, atributo):
+        if elemento is None:
+            return None
+        valor = twips(elemento.get(atributo))
+        return valor.twips if valor is not None else None
+
+    pgMar = sectPr.find(W_PGMAR)
+    pgSz = sectPr.find(W_PGSZ)
+    inicio, numeracion = inicio_y_numeracion(sectPr)
+    return SeccionSnapshot(
+        margen_superior=medida(pgMar, _W + "top"),
+        margen_inferior=medida(pgMar, _W + "bottom"),
+        margen_izquierdo=medida(pgMar, _W + "left"),
+        margen_derecho=medida(pgMar, _W + "right"),
+        ancho_pagina=medida(pgSz, _W + "w"),
+        alto_pagina=medida(pgSz, _W + "h"),
+        inicio=inicio,
+        numeracion=numeracion,
+    )
+
+
+def _iterar_cuerpo(xml: IO[bytes]) -> Iterator:
+    """Hijos de w:body a medida que se cierran; se liberan al avanzar (sin huge_tree, ver _parsear_parte)."""
+    for _, elem in etree.iterparse(
+        xml,
+        events=("end",),
+        tag=(W_P, W_TBL, W_SDT, W_CUSTOM_XML, W_SECTPR),
+        resolve_entities=False,
+    ):
+        padre = elem.getparent()
+        if padre is None or padre.tag != W_BODY:
+            continue
+        yield elem
+        elem.clear()
+        while elem.getprevious() is not None:
+            del padre[0]
+
+
+def _parrafos_completos(
+    styles_xml: Optional[bytes], theme_xml: Optional[bytes]
+) -> Callable[[object, int], ParrafoSnapshot]:
+    estilos = ResolutorEstilos.desde_xml(styles_xml, theme_xml)
+    return lambda p, indice: parrafo_xml(p, indice, estilos)
+
+
+def construir_snapshot_xml(fuente: FuentePaquete) -> DocumentoSnapshot:
+    """Construye la instantánea leyendo el paquete .docx en streaming."""
+    with etapa("snapshot_xml"):
+        snapshot = recorrer_paquete(fuente, _parrafos_completos)
+    registrar_tamano(snapshot)
+    return snapshot
+
+
+def _hijos_cuerpo(
+    elementos: Iterator, secciones: List[SeccionSnapshot], referencias: List[Tuple[str, str]]
+) -> Iterator:
+    """Hijos de bloque de w:body; anota de paso las secciones y sus encabezados y pies."""
+    for elem in elementos:
+        if elem.tag == W_SECTPR:
+            sectPr = elem
+        elif elem.tag == W_P:
+            pPr = elem.find(W_PPR)
+            sectPr = pPr.find(W_SECTPR) if pPr is not None else None
+        else:
+            sectPr = None
+        if sectPr is not None:
+            secciones.append(_seccion(sectPr))
+            referencias.extend(referencias_secciones(sectPr))
+        if elem.tag != W_SECTPR:
+            yield elem
+
+
+def _con_bloques(hijos: Iterator, parrafos: List[ParrafoSnapshot], bloques: List[BloqueSnapshot]) -> Iterator:
+    """Anota las tablas y controles de contenido del cuerpo antes de entregarlos."""
+    for elem in hijos:
+        if elem.tag != W_P:
+            bloque = bloque_xml(elem, len(parrafos))
+            if bloque is not None:
+                bloques.append(bloque)
+        yield elem
+
+
+class PaqueteDocx:
+    """Partes de un paquete .docx abierto que lee el motor."""
+
+    def __init__(self, paquete: zipfile.ZipFile):
+        self.zip = paquete
+        self.ruta_documento = (
+            _destino_relacion(paquete, "", TIPO_OFFICE_DOCUMENT) or "word/document.xml"
+        )
+        self.styles_xml = _leer_relacionada(paquete, self.ruta_documento, TIPO_STYLES)
+        self.theme_xml = _leer_relacionada(paquete, self.ruta_documento, TIPO_THEME)
+
+    def documento(self) -> IO[bytes]:
+        """word/document.xml, para leerlo en streaming."""
+        return self.zip.open(self.ruta_documento)
+
+    def historias(self, referencias: List[Tuple[str, str]]) -> Iterator[Tuple[str, bytes]]:
+        """
+        (historia, contenido) de los encabezados y pies referenciados por las
+        secciones, en su orden y sin repetir, y después de las notas.
+        """
+        partes = _relaciones(self.zip, self.ruta_documento)
+        vistas = set()
+        for historia, r_id in referencias:
+            ruta = partes.get(r_id)
+            if ruta is None or ruta in vistas:
+                continue
+            vistas.add(ruta)
+            parte = _leer(self.zip, ruta)
+            if parte is not None:
+                yield historia, parte
+        for historia, tipo in ((HISTORIA_NOTA_PIE, TIPO_FOOTNOTES), (HISTORIA_NOTA_FINAL, TIPO_ENDNOTES)):
+            notas = _leer_relacionada(self.zip, self.ruta_documento, tipo)
+            if notas is not None:
+                yield historia, notas
+
+
+@contextmanager
+def abrir_paquete(fuente: FuentePaquete) -> Iterator[PaqueteDocx]:
+    origen = io.BytesIO(fuente) if isinstance(fuente, (bytes, bytearray)) else fuente
+    with zipfile.ZipFile(origen) as paquete:
+        yield PaqueteDocx(paquete)
+
+
+class RecorridoCuerpo:
+    """
+    Arma las filas de la instantánea a partir del cuerpo (`cuerpo`) y de las
+    demás historias (`historia`), con los párrafos que construye
+    `construir_parrafo`. Los índices y posiciones son relativos a lo que
+    recorrió este objeto, así que sirve también para un trozo del cuerpo.
+    """
+
+    def __init__(self, construir_parrafo: Callable[[object, int], ParrafoSnapshot], todas_las_historias: bool):
+        self.construir_parrafo = construir_parrafo
+        self.todas_las_historias = todas_las_historias
+        self.parrafos: List[ParrafoSnapshot] = []
+        self.secciones: List[SeccionSnapshot] = []
+        self.adicionales: List[ParrafoSnapshot] = []
+        self.referencias: List[Tuple[str, str]] = []
+        self.bloques: List[BloqueSnapshot] = []
+        self.hijos = 0  # hijos de w:body recorridos
+        self.tablas = 0  # de ellos, w:tbl
+
+    def _adicional(self, historia: str, ubicacion: str, p) -> None:
+        fila = self.construir_parrafo(p, len(self.adicionales))
+        self.adicionales.append(fila._replace(historia=historia, ubicacion=ubicacion))
+
+    def _contar(self, elementos: Iterator) -> Iterator:
+        for elem in elementos:
+            self.hijos += 1
+            if elem.tag == W_TBL:
+                self.tablas += 1
+            yield elem
+
+    def cuerpo(self, xml: IO[bytes]) -> None:
+        """Recorre un word/document.xml (completo o con parte de los hijos de w:body)."""
+        elementos = self._contar(_iterar_cuerpo(xml))
+        hijos = _con_bloques(
+            _hijos_cuerpo(elementos, self.secciones, self.referencias), self.parrafos, self.bloques
+        )
+        if not self.todas_las_historias:
+            for elem in hijos:
+                if elem.tag == W_P:
+                    self.parrafos.append(self.construir_parrafo(elem, len(self.parrafos)))
+        else:
+            for historia, ubicacion, p in parrafos_hijos(hijos, HISTORIA_CUERPO):
+                if not ubicacion and p.getparent().tag == W_BODY:
+                    self.parrafos.append(self.construir_parrafo(p, len(self.parrafos)))
+                else:
+                    self._adicional(historia, ubicacion, p)
+
+    def historia(self, historia: str, contenido: bytes) -> None:
+        """Párrafos de un encabezado, pie o parte de notas, como adicionales."""
+        for ubicado in parrafos_parte(_parsear_parte(contenido), historia):
+            self._adicional(*ubicado)
+
+    def instantanea(self) -> DocumentoSnapshot:
+        return DocumentoSnapshot(
+            parrafos=tuple(self.parrafos),
+            secciones=tuple(self.secciones),
+            adicionales=tuple(self.adicionales),
+            bloques=tuple(self.bloques),
+        )
+
+
+def recorrer_paquete(
+    fuente: FuentePaquete,
+    fabrica: FabricaParrafos,
+    todas_las_historias: Optional[bool] = None,
+) -> DocumentoSnapshot:
+    """
+    Recorre el cuerpo del documento en streaming y arma la instantánea con
+    los párrafos que construye `fabrica`. `todas_las_historias` (por defecto
+    settings.validation_stories) agrega los párrafos de las demás historias
+    en `adicionales`.
+    """
+    if todas_las_historias is None:
+        todas_las_historias = get_settings().validation_stories
+    with abrir_paquete(fuente) as paquete:
+        recorrido = RecorridoCuerpo(
+            fabrica(paquete.styles_xml, paquete.theme_xml), todas_las_historias
+        )
+        with paquete.documento() as xml:
+            recorrido.cuerpo(xml)
+        if todas_las_historias:
+            for historia, contenido in paquete.historias(recorrido.referencias):
+                recorrido.historia(historia, contenido)
+    return recorrido.instantanea()
+
+
+def _parsear_parte(datos: bytes):
+    # Sin huge_tree: el archivo lo sube el usuario y los límites de libxml2
+    # (profundidad, tamaño de cada nodo de texto) acotan lo que cuesta
+    # parsearlo; python-docx tampoco los levanta
+    return etree.fromstring(datos, etree.XMLParser(resolve_entities=False))
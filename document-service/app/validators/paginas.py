@@ -0,0 +1,136 @@
+from docx import Document
+from typing import List, Optional, Union
+from ..clasificacion import TipoParrafo, normalizar_texto
+from ..models import ValidacionItem, Severidad
+from .maquetacion import maquetar
+from .reglas import PlanReglas, plan_reglas
+from .snapshot import DocumentoSnapshot, clasificar_snapshot, obtener_snapshot
+
+NUMERACION_ROMANA = ("lowerRoman", "upperRoman")
+
+
+def validar_paginas(
+    doc: Union[Document, DocumentoSnapshot], plan: Optional[PlanReglas] = None
+) -> List[ValidacionItem]:
+    """
+    Valida la paginación según la Guía UNAP 2.0, sobre páginas estimadas
+    (ver maquetacion.py):
+    - La portada ocupa sola la primera página
+    - Cada capítulo empieza en una página nueva
+    - Las páginas preliminares se numeran con romanos
+    """
+    plan = plan or plan_reglas()
+    reglas = plan.paginas
+    snapshot = obtener_snapshot(doc)
+    maquetacion = maquetar(snapshot)
+    clases = clasificar_snapshot(snapshot)
+    resultados = []
+
+    # Portada: la primera sección (resumen, dedicatoria, índice o capítulo) debe
+    # caer en la página 2 o después
+    if reglas.portada_sola and clases and clases[0].tipo is TipoParrafo.PORTADA:
+        siguiente = next(
+            (
+                i
+                for i, (para, clase) in enumerate(zip(snapshot.parrafos, clases))
+                if clase.tipo in (TipoParrafo.CAPITULO, TipoParrafo.INDICE)
+                or (clase.es_titulo and bool(plan.buscador.secciones(normalizar_texto(para.texto))))
+            ),
+            None,
+        )
+        if siguiente is not None:
+            pagina = maquetacion.paginas[siguiente]
+            es_valida = pagina > 1
+            resultados.append(
+                ValidacionItem(
+                    tipo="Página",
+                    categoria="Portada",
+                    es_valido=es_valida,
+                    valor_actual="Sola en la página 1" if es_valida else "Comparte la página 1",
+                    valor_esperado="Portada sola en la primera página",
+                    mensaje="La portada ocupa sola la primera página (estimado)"
+                    if es_valida
+                    else f"'{snapshot.parrafos[siguiente].texto[:50]}' empieza en la página 1, junto a la portada (estimado)",
+                    severidad=Severidad.SUGERENCIA if es_valida else Severidad.ADVERTENCIA,
+                    sugerencia=None if es_valida else "Insertar un salto de página después de la portada",
+                    pagina=1,
+                )
+            )
+
+    # Capítulos al comienzo de una página
+    capitulos = [i for i, clase in enumerate(clases) if clase.tipo is TipoParrafo.CAPITULO]
+    if reglas.capitulos_en_pagina_nueva and capitulos:
+        fuera = [i for i in capitulos if not maquetacion.arriba[i]]
+        for i in fuera:
+            resultados.append(
+                ValidacionItem(
+                    tipo="Página",
+                    categoria="Inicio de capítulo",
+                    elemento=f"Capítulo {clases[i].capitulo}",
+                    es_valido=False,
+                    valor_actual=f"A mitad de la página {maquetacion.paginas[i]}",
+                    valor_esperado="Inicio de página",
+                    mensaje=f"El capítulo {clases[i].capitulo} no empieza en una página nueva (estimado)",
+                    severidad=Severidad.ADVERTENCIA,
+                    sugerencia="Insertar un salto de página antes del título del capítulo",
+                    pagina=maquetacion.paginas[i],
+                )
+            )
+        if not fuera:
+            resultados.append(
+                ValidacionItem(
+                    tipo="Página",
+                    categoria="Inicio de capítulo",
+                    es_valido=True,
+                    valor_actual=f"{len(capitulos)} de {len(capitulos)} capítulos",
+                    valor_esperado="Inicio de página",
+                    mensaje="Todos los capítulos empiezan en una página nueva (estimado)",
+                    severidad=Severidad.SUGERENCIA,
+                )
+            )
+
+    # Numeración romana de las secciones anteriores al primer capítulo
+    if reglas.preliminares_romanos and capitulos and capitulos[0] > 0:
+        seccion_capitulo = maquetacion.secciones[capitulos[0]]
+        if seccion_capitulo == 0:
+            resultados.append(
+                ValidacionItem(
+                    tipo="Página",
+                    categoria="Numeración preliminar",
+                    es_valido=False,
+                    valor_actual="Sin sección propia",
+                    valor_esperado="Romanos (i, ii, iii...)",
+                    mensaje="Las páginas preliminares están en la misma sección que los capítulos, "
+                    "así que no pueden numerarse con romanos",
+                    severidad=Severidad.ADVERTENCIA,
+                    sugerencia="Insertar un salto de sección antes del primer capítulo y numerar "
+                    "las páginas preliminares con romanos",
+                )
+            )
+        else:
+            incorrectas = [
+                s for s in range(seccion_capitulo)
+                if snapshot.secciones[s].numeracion not in NUMERACION_ROMANA
+            ]
+            resultados.append(
+                ValidacionItem(
+                    tipo="Página",
+                    categoria="Numeración preliminar",
+                    elemento=f"Sección {incorrectas[0] + 1}" if incorrectas else None,
+                    es_valido=not incorrectas,
+                    valor_actual=(snapshot.secciones[incorrectas[0]].numeracion or "decimal")
+                    if incorrectas
+                    else "Romanos",
+                    valor_esperado="Romanos (i, ii, iii...)",
+                    mensaje=f"{len(incorrectas)} secciones preliminares no se numeran con romanos"
+                    if incorrectas
+                    else "Las páginas preliminares se numeran con romanos",
+                    severidad=Severidad.ADVERTENCIA if incorrectas else Severidad.SUGERENCIA,
+                    sugerencia="Aplicar formato de número de página i, ii, iii... a las secciones preliminares"
+                    if incorrectas
+                    else None,
+                    pagina=maquetacion.inicio_secciones[incorrectas[0]] if incorrectas else None,
+                )
+            )
+
+    return resultados
@@ -0,0 +1,310 @@
+"""
+Reglas de validación declarativas por escuela o facultad.
+
+Cada conjunto de reglas es un JSON en settings.rules_dir (`<id>.json`) que
+sobrescribe solo lo que cambia respecto de otro (`"hereda"`, por defecto el
+de la guía):
+
+    {
+      "nombre": "Escuela de Posgrado",
+      "margenes": {"superior_cm": 3.0, "izquierdo_cm": 3.0},
+      "parrafo": {"interlineado": 1.5},
+      "estructura": {"minimo_capitulos": 3, "secciones": ["RESUMEN", "ABSTRACT", "CONCLUSIONES"]}
+    }
+
+El conjunto "guia" (settings.rules_default) sale de Settings, así que las
+variables de entorno de formato siguen funcionando igual. Un archivo con ese
+id lo sobrescribe.
+
+Cada conjunto se resuelve (herencia + validación con pydantic) y se compila
+una sola vez en un PlanReglas por proceso: los valores que usan los
+validadores, la secuencia de capítulos y el autómata de secciones. Los planes
+se guardan por id; cada settings.rules_reload_interval_s se comprueba la
+fecha de modificación de sus archivos y, si cambió, se recompila sin
+reiniciar. Si el archivo nuevo no es válido se sigue usando el plan anterior.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from ..config import Settings, get_settings
+from .secciones import SECCIONES_OBLIGATORIAS, VARIANTES_SECCIONES, BuscadorSecciones
+
+logger = logging.getLogger(__name__)
+
+_ID_VALIDO = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class ReglasDesconocidas(ValueError):
+    """El id de reglas pedido no existe en settings.rules_dir."""
+
+    def __init__(self, reglas_id: str):
+        super().__init__(f"No existe el conjunto de reglas '{reglas_id}'")
+
+
+class _Seccion(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+
+class ReglasPagina(_Seccion):
+    ancho_cm: float
+    alto_cm: float
+    tolerancia_cm: float = 0.5
+
+
+class ReglasMargenes(_Seccion):
+    superior_cm: float
+    inferior_cm: float
+    izquierdo_cm: float
+    derecho_cm: float
+    tolerancia_cm: float = 0.2  # 2mm
+
+
+class ReglasFuente(_Seccion):
+    nombre: str
+    tamano_pt: float
+    minimo_principal_pct: float = 90  # de los runs con la fuente principal
+    minimo_tamano_pct: float = 80  # de los runs con el tamaño principal
+    maximo_fuentes: int = 2
+    errores_listados: int = 3
+
+
+class ReglasParrafo(_Seccion):
+    interlineado: float
+    tolerancia_interlineado: float = 0.1
+    minimo_interlineado_pct: float = 80
+    sangria_cm: float
+    tolerancia_sangria_cm: float = 0.15  # 1.5mm
+    maximo_espaciados: int = 3  # valores distintos de espaciado posterior
+
+
+class ReglasEstructura(_Seccion):
+    capitulos: List[str] = ["I", "II", "III", "IV", "V"]
+    minimo_capitulos: int = 4
+    secciones: List[str] = SECCIONES_OBLIGATORIAS
+    variantes: Dict[str, List[str]] = {}
+    minimo_titulos: int = 10
+
+
+class ReglasPaginas(_Seccion):
+    # Reglas sobre la paginación estimada (ver maquetacion.py)
+    portada_sola: bool = True
+    capitulos_en_pagina_nueva: bool = True
+    preliminares_romanos: bool = True  # secciones antes del primer capítulo en i, ii, iii...
+
+
+class ReglasFormato(BaseModel):
+    """Conjunto de reglas ya resuelto (con la herencia aplicada)."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    id: str
+    nombre: str = ""
+    hereda: Optional[str] = None
+    pagina: ReglasPagina
+    margenes: ReglasMargenes
+    fuente: ReglasFuente
+    parrafo: ReglasParrafo
+    estructura: ReglasEstructura
+    paginas: ReglasPaginas = ReglasPaginas()
+
+
+def reglas_guia(settings: Settings) -> Dict[str, Any]:
+    """Reglas de la Guía UNAP 2.0 con los valores de Settings."""
+    variantes: Dict[str, List[str]] = {s: list(v) for s, v in VARIANTES_SECCIONES.items()}
+    for seccion, extra in settings.estructura_variantes.items():
+        variantes.setdefault(seccion, []).extend(extra)
+    return {
+        "id": settings.rules_default,
+        "nombre": "Guía UNAP 2.0",
+        "pagina": {"ancho_cm": settings.page_width_cm, "alto_cm": settings.page_height_cm},
+        "margenes": {
+            "superior_cm": settings.margin_top_cm,
+            "inferior_cm": settings.margin_bottom_cm,
+            "izquierdo_cm": settings.margin_left_cm,
+            "derecho_cm": settings.margin_right_cm,
+        },
+        "fuente": {"nombre": settings.font_name, "tamano_pt": settings.font_size_pt},
+        "parrafo": {
+            "interlineado": settings.line_spacing,
+            "sangria_cm": settings.first_line_indent_cm,
+        },
+        "estructura": {
+            "secciones": list(settings.estructura_secciones or SECCIONES_OBLIGATORIAS),
+            "variantes": variantes,
+        },
+    }
+
+
+def _combinar(base: Dict[str, Any], cambios: Dict[str, Any]) -> Dict[str, Any]:
+    """Copia de `base` con `cambios` aplicados; los dicts anidados se combinan por clave."""
+    resultado = dict(base)
+    for clave, valor in cambios.items():
+        if isinstance(valor, dict) and isinstance(resultado.get(clave), dict) and clave != "variantes":
+            resultado[clave] = _combinar(resultado[clave], valor)
+        else:
+            resultado[clave] = valor
+    return resultado
+
+
+class PlanReglas:
+    """
+    Reglas compiladas para los validadores: valores planos, secuencia de
+    capítulos y buscador de secciones ya construidos.
+    """
+
+    def __init__(self, reglas: ReglasFormato):
+        self.reglas = reglas
+        self.id = reglas.id
+        self.pagina = reglas.pagina
+        self.margenes = reglas.margenes
+        self.fuente = reglas.fuente
+        self.parrafo = reglas.parrafo
+        self.estructura = reglas.estructura
+        self.paginas = reglas.paginas
+        # Tamaño sin decimales si es entero (12pt, no 12.0pt), como en Settings
+        tamano = reglas.fuente.tamano_pt
+        self.tamano_pt = int(tamano) if float(tamano).is_integer() else tamano
+        self.capitulos: Tuple[str, ...] = tuple(reglas.estructura.capitulos)
+        self.buscador = BuscadorSecciones(reglas.estructura.secciones, reglas.estructura.variantes)
+        datos = json.dumps(reglas.model_dump(mode="json"), sort_keys=True).encode()
+        self.huella = hashlib.sha256(datos).hexdigest()[:16]
+
+
+class RegistroReglas:
+    """Planes compilados por id de reglas, recompilados si cambian sus archivos."""
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self._settings = settings
+        # id -> (firma de la fuente, instante de la última comprobación, plan)
+        self._planes: Dict[str, Tuple[Any, float, PlanReglas]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def settings(self) -> Settings:
+        return self._settings or get_settings()
+
+    def plan(self, reglas_id: Optional[str] = None) -> PlanReglas:
+        """Plan del conjunto `reglas_id` (None = settings.rules_default)."""
+        settings = self.settings
+        reglas_id = reglas_id or settings.rules_default
+        entrada = self._planes.get(reglas_id)
+        ahora = time.monotonic()
+        if entrada is not None and ahora - entrada[1] < settings.rules_reload_interval_s:
+            return entrada[2]
+
+        with self._lock:
+            firma = self._firma(reglas_id, settings)
+            entrada = self._planes.get(reglas_id)
+            if entrada is not None and entrada[0] == firma:
+                self._planes[reglas_id] = (firma, ahora, entrada[2])
+                return entrada[2]
+            try:
+                plan = PlanReglas(self._resolver(reglas_id, settings, set()))
+            except (ValidationError, ValueError, OSError) as e:
+                if entrada is None or isinstance(e, ReglasDesconocidas):
+                    raise
+                logger.error("Reglas '%s' inválidas, se mantienen las anteriores: %s", reglas_id, e)
+                plan = entrada[2]
+            else:
+                if entrada is not None:
+                    logger.info("Reglas '%s' recargadas", reglas_id)
+            self._planes[reglas_id] = (firma, ahora, plan)
+            return plan
+
+    def disponibles(self) -> List[str]:
+        """Ids de reglas: el de la guía y los archivos de settings.rules_dir."""
+        settings = self.settings
+        ids = {settings.rules_default}
+        if settings.rules_dir and os.path.isdir(settings.rules_dir):
+            ids.update(
+                nombre[: -len(".json")]
+                for nombre in os.listdir(settings.rules_dir)
+                if nombre.endswith(".json") and _ID_VALIDO.match(nombre[: -len(".json")])
+            )
+        return sorted(ids)
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._planes.clear()
+
+    # -- Resolución -------------------------------------------------------
+
+    def _ruta(self, reglas_id: str, settings: Settings) -> Optional[str]:
+        if not settings.rules_dir or not _ID_VALIDO.match(reglas_id):
+            return None
+        return os.path.join(settings.rules_dir, f"{reglas_id}.json")
+
+    def _firma(self, reglas_id: str, settings: Settings) -> Any:
+        """Fecha y tamaño de los archivos de la cadena de herencia, y las reglas de Settings."""
+        cadena = []
+        vistos = set()
+        while reglas_id and reglas_id not in vistos:
+            vistos.add(reglas_id)
+            ruta = self._ruta(reglas_id, settings)
+            try:
+                estado = os.stat(ruta) if ruta else None
+            except OSError:
+                estado = None
+            if estado is None:
+                cadena.append((reglas_id,))
+                break
+            cadena.append((reglas_id, estado.st_mtime_ns, estado.st_size))
+            reglas_id = self._padre(ruta, settings)
+        return tuple(cadena), reglas_guia(settings)
+
+    def _padre(self, ruta: str, settings: Settings) -> Optional[str]:
+        try:
+            with open(ruta, encoding="utf-8") as f:
+                hereda = json.load(f).get("hereda", settings.rules_default)
+        except (OSError, ValueError, AttributeError):
+            return None
+        return None if hereda == os.path.basename(ruta)[: -len(".json")] else hereda
+
+    def _resolver(self, reglas_id: str, settings: Settings, vistos: set) -> ReglasFormato:
+        return ReglasFormato.model_validate(self._datos(reglas_id, settings, vistos))
+
+    def _datos(self, reglas_id: str, settings: Settings, vistos: set) -> Dict[str, Any]:
+        if reglas_id in vistos:
+            raise ValueError(f"Herencia circular en las reglas '{reglas_id}'")
+        vistos.add(reglas_id)
+        ruta = self._ruta(reglas_id, settings)
+        if ruta is None or not os.path.isfile(ruta):
+            if reglas_id == settings.rules_default:
+                return reglas_guia(settings)
+            raise ReglasDesconocidas(reglas_id)
+
+        with open(ruta, encoding="utf-8") as f:
+            datos = json.load(f)
+        if not isinstance(datos, dict):
+            raise ValueError(f"{ruta}: se esperaba un objeto JSON")
+        hereda = datos.get("hereda", settings.rules_default)
+        if hereda == reglas_id:
+            # El archivo de la guía sobrescribe los valores de Settings
+            base = reglas_guia(settings)
+        else:
+            base = self._datos(hereda, settings, vistos)
+        return _combinar(base, {**datos, "id": reglas_id})
+
+
+_registro: Optional[RegistroReglas] = None
+
+
+def get_reglas() -> RegistroReglas:
+    """Registro de reglas del proceso."""
+    global _registro
+    if _registro is None:
+        _registro = RegistroReglas()
+    return _registro
+
+
+def plan_reglas(reglas_id: Optional[str] = None) -> PlanReglas:
+    """Plan compilado de `reglas_id` (None = las reglas por defecto)."""
+    return get_reglas().plan(reglas_id)
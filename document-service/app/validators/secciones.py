@@ -0,0 +1,125 @@
+"""
+Detección de las secciones obligatorias en los títulos del documento.
+
+Un título cuenta como una sección si contiene su nombre o alguna variante
+aceptada ("BIBLIOGRAFIA" para "REFERENCIAS BIBLIOGRAFICAS"), o si es un
+fragmento de alguno de ellos ("RESULTADOS" para "RESULTADOS Y DISCUSION").
+
+Todos los nombres y variantes se compilan en un autómata de Aho-Corasick que
+encuentra las coincidencias del primer caso en una sola pasada por el título;
+los fragmentos se resuelven con un diccionario precalculado. El costo por
+título no crece con la cantidad de secciones o variantes configuradas
+(settings.estructura_secciones y settings.estructura_variantes, o las de cada
+conjunto de reglas). El buscador se compila una vez por plan (ver reglas.py).
+"""
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Sequence, Tuple
+
+from ..clasificacion import normalizar_texto
+
+# Secciones obligatorias según Guía UNAP 2.0
+SECCIONES_OBLIGATORIAS = [
+    "RESUMEN",
+    "ABSTRACT",
+    "INTRODUCCION",
+    "REVISION DE LITERATURA",
+    "MATERIALES Y METODOS",
+    "RESULTADOS Y DISCUSION",
+    "CONCLUSIONES",
+    "RECOMENDACIONES",
+    "REFERENCIAS BIBLIOGRAFICAS",
+]
+
+# Otros nombres aceptados para una sección obligatoria
+VARIANTES_SECCIONES: Dict[str, List[str]] = {
+    "REFERENCIAS BIBLIOGRAFICAS": ["BIBLIOGRAFIA"],
+}
+
+_VACIO: FrozenSet[str] = frozenset()
+
+
+class AutomataPatrones:
+    """
+    Aho-Corasick: todas las etiquetas de los patrones contenidos en un texto.
+
+    Los enlaces de fallo se resuelven al construirlo (autómata determinista),
+    así que buscar es una consulta a un dict por carácter del texto.
+    """
+
+    def __init__(self, patrones: Iterable[Tuple[str, str]]):
+        """`patrones`: pares (patrón, etiqueta); varios patrones pueden compartir etiqueta."""
+        trie: List[Dict[str, int]] = [{}]
+        salida: List[FrozenSet[str]] = [_VACIO]
+        for patron, etiqueta in patrones:
+            if not patron:
+                continue
+            estado = 0
+            for c in patron:
+                siguiente = trie[estado].get(c)
+                if siguiente is None:
+                    siguiente = len(trie)
+                    trie[estado][c] = siguiente
+                    trie.append({})
+                    salida.append(_VACIO)
+                estado = siguiente
+            salida[estado] = salida[estado] | {etiqueta}
+
+        # Por niveles: cada estado copia las transiciones de su enlace de fallo
+        # (que ya está completo) y hereda su salida. Se omiten las que van a 0.
+        transiciones: List[Dict[str, int]] = [dict(trie[0])] + [{} for _ in trie[1:]]
+        fallo = [0] * len(trie)
+        cola = deque(trie[0].values())
+        while cola:
+            estado = cola.popleft()
+            transiciones[estado] = {**transiciones[fallo[estado]], **trie[estado]}
+            salida[estado] = salida[estado] | salida[fallo[estado]]
+            for c, hijo in trie[estado].items():
+                fallo[hijo] = transiciones[fallo[estado]].get(c, 0) if estado else 0
+                cola.append(hijo)
+
+        self._transiciones = transiciones
+        self._salida = salida
+
+    def buscar(self, texto: str) -> FrozenSet[str]:
+        transiciones = self._transiciones
+        salida = self._salida
+        encontradas: FrozenSet[str] = _VACIO
+        estado = 0
+        for c in texto:
+            estado = transiciones[estado].get(c, 0)
+            if salida[estado]:
+                encontradas = encontradas | salida[estado]
+        return encontradas
+
+
+class BuscadorSecciones:
+    """Secciones obligatorias (y sus variantes) presentes en cada título."""
+
+    def __init__(self, obligatorias: Sequence[str], variantes: Mapping[str, Sequence[str]]):
+        self.obligatorias: Tuple[str, ...] = tuple(normalizar_texto(s) for s in obligatorias)
+        por_seccion: Dict[str, List[str]] = {}
+        for seccion, nombres in variantes.items():
+            por_seccion.setdefault(normalizar_texto(seccion), []).extend(
+                normalizar_texto(v) for v in nombres
+            )
+        patrones: List[Tuple[str, str]] = []
+        for seccion in self.obligatorias:
+            for nombre in [seccion] + por_seccion.get(seccion, []):
+                patrones.append((nombre, seccion))
+
+        self._automata = AutomataPatrones(patrones)
+        # Todo fragmento de un nombre o variante -> secciones a las que pertenece
+        fragmentos: Dict[str, set] = {}
+        for nombre, seccion in patrones:
+            for inicio in range(len(nombre)):
+                for fin in range(inicio + 1, len(nombre) + 1):
+                    fragmentos.setdefault(nombre[inicio:fin], set()).add(seccion)
+        self._fragmentos: Dict[str, FrozenSet[str]] = {
+            fragmento: frozenset(secciones) for fragmento, secciones in fragmentos.items()
+        }
+
+    def secciones(self, titulo_normalizado: str) -> FrozenSet[str]:
+        """Secciones que cubre un título ya pasado por normalizar_texto."""
+        contenidas = self._automata.buscar(titulo_normalizado)
+        fragmento = self._fragmentos.get(titulo_normalizado, _VACIO)
+        return contenidas | fragmento if fragmento else contenidas
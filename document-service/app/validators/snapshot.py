@@ -0,0 +1,241 @@
+"""
+Instantánea del documento para las validaciones.
+
+Se recorre `doc.paragraphs` una sola vez y se guarda, por párrafo, solo lo que
+usan los validadores (texto, estilo, interlineado, sangría, espaciado y runs).
+Así cada validador lee tuplas simples en lugar de reconstruir los objetos
+proxy de python-docx y volver a calcular `para.text.strip()`.
+
+Los valores de formato son los efectivos (formato directo o heredado de los
+estilos, docDefaults y el tema), resueltos con ResolutorEstilos.
+
+Con settings.validation_stories la instantánea incluye además, en
+`adicionales`, los párrafos que `doc.paragraphs` no ve (tablas, controles de
+contenido, cuadros de texto, encabezados, pies y notas; ver historias.py).
+Los validadores de formato los revisan con `con_texto(todas_las_historias=True)`.
+
+Para la maquetación aproximada (maquetacion.py) se guarda también lo que
+ocupa o fuerza espacio vertical: saltos de página e imágenes de cada párrafo
+(incluso de los vacíos), el tipo de inicio y la numeración de cada sección y
+las tablas y controles de contenido del cuerpo (ver disposicion.py).
+"""
+from docx import Document
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar, Union
+
+from .disposicion import (
+    SIN_DISPOSICION,
+    BloqueSnapshot,
+    DisposicionParrafo,
+    bloque_xml,
+    disposicion_parrafo,
+    inicio_y_numeracion,
+)
+from .estilos import ResolutorEstilos
+from .historias import HISTORIA_CUERPO, iterar_historias
+from ..clasificacion import Clasificacion, clasificar_parrafos
+from ..config import get_settings
+from ..etapas import etapa, registrar
+
+
+class RunSnapshot(NamedTuple):
+    texto: str
+    fuente: Optional[str]
+    tamano_pt: Optional[float]
+
+
+class ParrafoSnapshot(NamedTuple):
+    indice: int  # posición en doc.paragraphs (o en los adicionales)
+    texto: str  # texto sin espacios al inicio/final
+    estilo: Optional[str]
+    interlineado: Optional[float]  # en múltiplos de línea (valores efectivos)
+    sangria_cm: Optional[float]  # sangría de primera línea
+    espacio_antes_pt: Optional[float]
+    espacio_despues_pt: Optional[float]
+    runs: Tuple[RunSnapshot, ...]
+    historia: str = HISTORIA_CUERPO
+    ubicacion: str = ""  # tabla, control de contenido, cuadro de texto o nota
+    disposicion: DisposicionParrafo = SIN_DISPOSICION  # saltos, imágenes, fin de sección
+
+    @property
+    def descripcion(self) -> str:
+        """Dónde está el párrafo, para los mensajes ("párrafo 12", "encabezado", ...)."""
+        if self.historia == HISTORIA_CUERPO and not self.ubicacion:
+            return f"párrafo {self.indice + 1}"
+        partes = [self.historia] if self.historia != HISTORIA_CUERPO else []
+        if self.ubicacion:
+            partes.append(self.ubicacion)
+        return ", ".join(partes)
+
+
+class SeccionSnapshot(NamedTuple):
+    # Valores en twips; None si la sección no los define
+    margen_superior: Optional[int]
+    margen_inferior: Optional[int]
+    margen_izquierdo: Optional[int]
+    margen_derecho: Optional[int]
+    ancho_pagina: Optional[int]
+    alto_pagina: Optional[int]
+    inicio: Optional[str] = None  # w:type: nextPage (por defecto), continuous, oddPage, ...
+    numeracion: Optional[str] = None  # formato de w:pgNumType: decimal, lowerRoman, ...
+
+
+class DocumentoSnapshot(NamedTuple):
+    parrafos: Tuple[ParrafoSnapshot, ...]
+    secciones: Tuple[SeccionSnapshot, ...]
+    # Párrafos fuera de doc.paragraphs, en orden del documento (solo con
+    # settings.validation_stories)
+    adicionales: Tuple[ParrafoSnapshot, ...] = ()
+    # Tablas y controles de contenido del cuerpo, en orden del documento
+    bloques: Tuple[BloqueSnapshot, ...] = ()
+
+    def con_texto(self, todas_las_historias: bool = False) -> List[ParrafoSnapshot]:
+        """Párrafos no vacíos, que son los que revisan los validadores."""
+        parrafos = [p for p in self.parrafos if p.texto]
+        if todas_las_historias:
+            parrafos.extend(p for p in self.adicionales if p.texto)
+        return parrafos
+
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_P = _W + "p"
+_BLOQUES = frozenset((_W + "tbl", _W + "sdt", _W + "customXml"))
+
+
+def _twips(length) -> Optional[int]:
+    return length.twips if length is not None else None
+
+
+def construir_snapshot(doc: Document) -> DocumentoSnapshot:
+    """Recorre el documento una sola vez y construye la instantánea."""
+    with etapa("snapshot"):
+        snapshot = _construir_snapshot(doc)
+    registrar_tamano(snapshot)
+    return snapshot
+
+
+def registrar_tamano(snapshot: DocumentoSnapshot) -> None:
+    """Párrafos y runs de la instantánea, para las métricas."""
+    registrar("parrafos", len(snapshot.parrafos))
+    registrar("runs", sum(len(p.runs) for p in snapshot.parrafos))
+    if snapshot.adicionales:
+        registrar("parrafos_adicionales", len(snapshot.adicionales))
+
+
+def _construir_snapshot(doc: Document) -> DocumentoSnapshot:
+    parrafos = []
+    estilos = ResolutorEstilos.desde_documento(doc)
+
+    for i, para in enumerate(doc.paragraphs):
+        texto = para.text.strip()
+        style_id = para._p.style
+        formato = estilos.parrafo(style_id, para._p.pPr)
+        disposicion = disposicion_parrafo(para._p, formato.salto_pagina_antes)
+        if not texto:
+            # Los párrafos vacíos se conservan para mantener los índices
+            parrafos.append(
+                ParrafoSnapshot(i, "", None, None, None, None, None, (), disposicion=disposicion)
+            )
+            continue
+
+        runs = []
+        for run in para.runs:
+            props = estilos.run(style_id, run._r.rPr)
+            runs.append(RunSnapshot(run.text, props.fuente, props.tamano_pt))
+
+        parrafos.append(
+            ParrafoSnapshot(
+                indice=i,
+                texto=texto,
+                estilo=estilos.nombre_estilo(style_id),
+                interlineado=formato.interlineado,
+                sangria_cm=formato.sangria_cm,
+                espacio_antes_pt=formato.espacio_antes_pt,
+                espacio_despues_pt=formato.espacio_despues_pt,
+                runs=tuple(runs),
+                disposicion=disposicion,
+            )
+        )
+
+    secciones = tuple(_seccion(section) for section in doc.sections)
+
+    # Tablas y controles de contenido entre los párrafos del cuerpo
+    bloques = []
+    siguiente = 0
+    for hijo in doc.element.body.iterchildren():
+        if hijo.tag == W_P:
+            siguiente += 1
+        elif hijo.tag in _BLOQUES:
+            bloque = bloque_xml(hijo, siguiente)
+            if bloque is not None:
+                bloques.append(bloque)
+
+    adicionales: Tuple[ParrafoSnapshot, ...] = ()
+    if get_settings().validation_stories:
+        adicionales = _adicionales(doc, estilos)
+
+    return DocumentoSnapshot(
+        parrafos=tuple(parrafos), secciones=secciones, adicionales=adicionales, bloques=tuple(bloques)
+    )
+
+
+def _seccion(section) -> SeccionSnapshot:
+    inicio, numeracion = inicio_y_numeracion(section._sectPr)
+    return SeccionSnapshot(
+        margen_superior=_twips(section.top_margin),
+        margen_inferior=_twips(section.bottom_margin),
+        margen_izquierdo=_twips(section.left_margin),
+        margen_derecho=_twips(section.right_margin),
+        ancho_pagina=_twips(section.page_width),
+        alto_pagina=_twips(section.page_height),
+        inicio=inicio,
+        numeracion=numeracion,
+    )
+
+
+def _adicionales(doc: Document, estilos: ResolutorEstilos) -> Tuple[ParrafoSnapshot, ...]:
+    """Párrafos de las demás historias, con el mismo armado que el motor XML."""
+    from .motor_xml import parrafo_xml  # motor_xml importa este módulo
+
+    return tuple(
+        parrafo_xml(p, i, estilos)._replace(historia=historia, ubicacion=ubicacion)
+        for i, (historia, ubicacion, p) in enumerate(iterar_historias(doc, cuerpo=False))
+    )
+
+
+def obtener_snapshot(doc: Union[Document, DocumentoSnapshot]) -> DocumentoSnapshot:
+    """Acepta un Document o una instantánea ya construida."""
+    if isinstance(doc, DocumentoSnapshot):
+        return doc
+    return construir_snapshot(doc)
+
+
+T = TypeVar("T")
+
+# Datos derivados de la última instantánea (clasificación, tabla de formato,
+# maquetación): los validadores de un mismo documento corren seguidos sobre
+# ella. Se guarda el objeto (no su id) para no confundirla con otra que
+# reutilice la misma dirección, y el par se reemplaza entero para que dos
+# hilos con instantáneas distintas no mezclen sus datos.
+_derivados: Tuple[Optional[DocumentoSnapshot], Dict[str, Any]] = (None, {})
+
+
+def por_instantanea(snapshot: DocumentoSnapshot, clave: str, calcular: Callable[[DocumentoSnapshot], T]) -> T:
+    """`calcular(snapshot)`, calculado una sola vez por instantánea y `clave`."""
+    global _derivados
+    previa, valores = _derivados
+    if previa is not snapshot:
+        valores = {}
+        _derivados = (snapshot, valores)
+    valor = valores.get(clave)
+    if valor is None:
+        valor = valores[clave] = calcular(snapshot)
+    return valor
+
+
+def _clasificar(snapshot: DocumentoSnapshot) -> Tuple[Clasificacion, ...]:
+    return tuple(clasificar_parrafos((p.texto, p.estilo) for p in snapshot.parrafos))
+
+
+def clasificar_snapshot(snapshot: DocumentoSnapshot) -> Tuple[Clasificacion, ...]:
+    """Clasificación de cada párrafo de la instantánea (ver app/clasificacion.py)."""
+    return por_instantanea(snapshot, "clasificacion", _clasificar)
@@ -0,0 +1,223 @@
+"""
+Tabla columnar del formato de un documento, para las estadísticas de los validadores.
+
+La instantánea se recorre una sola vez y se vuelca en columnas tipadas
+(`array.array`): una fila por párrafo con texto y una por run con texto.
+Fuentes y estilos se guardan como ids enteros. Los valores ausentes (None)
+y los ceros se guardan como 0, igual que los ignoraban los validadores al
+preguntar `if valor:`.
+
+Las estadísticas se calculan sobre columnas completas con funciones de C
+(`map` con `operator`, `Counter`, `filter`, `itertools.compress`), sin un
+bucle de Python por fila. Por eso histogramas, valor dominante, porcentaje de
+cumplimiento, posiciones fuera de norma, percentiles y desgloses por capítulo
+salen de la misma tabla sin volver a recorrer la instantánea.
+
+La tabla se arma uniendo tramos (ParteTabla). Calcular un tramo sí es un
+bucle de Python por párrafo y por run; unirlos es copiar columnas y asignar
+los ids de fuentes y estilos con `dict.fromkeys` y `map`. Al validar un
+documento completo hay un solo tramo; la revalidación incremental guarda un
+tramo por hijo de w:body y solo calcula los de los que cambiaron (ver
+incremental.py). El capítulo de cada párrafo sale de la clasificación
+compartida (clasificar_snapshot), que también está en caché por instantánea.
+
+    tabla = tabla_formato(snapshot)
+    fuentes = tabla.histograma(tabla.r_fuente)          # Counter de ids
+    tabla.cumplen(tabla.p_interlineado, 2.0, 0.1)       # párrafos con 2.0 ± 0.1
+    tabla.por_capitulo(tabla.p_interlineado, 1)         # {capítulo: Counter}
+"""
+import statistics
+from array import array
+from collections import Counter
+from itertools import chain, compress, count, islice, repeat
+from operator import add, and_, le, lt, mul, ne, sub
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..clasificacion import TipoParrafo
+from .snapshot import (
+    DocumentoSnapshot,
+    ParrafoSnapshot,
+    RunSnapshot,
+    clasificar_snapshot,
+    por_instantanea,
+)
+
+SIN_ID = -1
+
+# Bits de p_banderas
+TITULO = 1  # título por texto o estilo (clasificacion.es_titulo)
+ADICIONAL = 2  # fuera de doc.paragraphs: tablas, encabezados, notas, ...
+
+
+class ParteTabla(NamedTuple):
+    """
+    Columnas de un tramo de párrafos con texto, en el orden de la tabla. Las
+    fuentes y los estilos van por nombre: los ids se asignan al unir los tramos.
+    parte_tabla arma array.array; un tramo leído de un estado guardado trae
+    listas (al unirlos solo se copian).
+    """
+
+    interlineado: Sequence[float]
+    sangria: Sequence[float]
+    espacio_antes: Sequence[float]
+    espacio_despues: Sequence[float]
+    estilos: List[Optional[str]]
+    r_parrafo: Sequence[int]  # fila del párrafo dentro del tramo
+    r_run: Sequence[int]  # posición del run en para.runs
+    r_fuente: List[Optional[str]]
+    r_tamano: Sequence[float]
+
+
+def parte_tabla(parrafos: Iterable[ParrafoSnapshot]) -> ParteTabla:
+    """Tramo de la tabla con los párrafos con texto de `parrafos`."""
+    parte = ParteTabla(
+        array("d"), array("d"), array("d"), array("d"), [],
+        array("i"), array("i"), [], array("d"),
+    )
+    fila = 0
+    for para in parrafos:
+        if not para.texto:
+            continue
+        parte.interlineado.append(para.interlineado or 0.0)
+        parte.sangria.append(para.sangria_cm or 0.0)
+        parte.espacio_antes.append(para.espacio_antes_pt or 0.0)
+        parte.espacio_despues.append(para.espacio_despues_pt or 0.0)
+        parte.estilos.append(para.estilo)
+        for posicion, run in enumerate(para.runs):
+            if not run.texto.strip():
+                continue
+            parte.r_parrafo.append(fila)
+            parte.r_run.append(posicion)
+            parte.r_fuente.append(run.fuente)
+            parte.r_tamano.append(run.tamano_pt or 0.0)
+        fila += 1
+    return parte
+
+
+def _ids(nombres: List[Optional[str]]) -> Tuple[array, Dict[str, int]]:
+    """Ids enteros de `nombres` en orden de primera aparición; SIN_ID si no hay nombre."""
+    ids = dict(zip(dict.fromkeys(filter(None, nombres)), count()))
+    return array("i", map(ids.get, nombres, repeat(SIN_ID))), ids
+
+
+class TablaFormato:
+    """Columnas de los párrafos con texto (todas las historias) y de sus runs con texto."""
+
+    def __init__(self, snapshot: DocumentoSnapshot, partes: Optional[Sequence[ParteTabla]] = None):
+        """
+        `partes`: tramos ya calculados que cubren, en orden, los párrafos con
+        texto de la instantánea (ver incremental.py); si no, un solo tramo.
+        """
+        self.parrafos: List[ParrafoSnapshot] = snapshot.con_texto(todas_las_historias=True)
+        if partes is None:
+            partes = (parte_tabla(self.parrafos),)
+
+        # Capítulo y título de cada párrafo con texto del cuerpo (0 = antes del
+        # primer capítulo); los adicionales van después en self.parrafos
+        capitulos: List[int] = []
+        titulos: List[bool] = []
+        capitulo = 0
+        for para, clase in zip(snapshot.parrafos, clasificar_snapshot(snapshot)):
+            if clase.tipo is TipoParrafo.CAPITULO:
+                capitulo += 1
+            if para.texto:
+                capitulos.append(capitulo)
+                titulos.append(clase.es_titulo)
+        adicionales = len(self.parrafos) - len(capitulos)
+
+        self.p_interlineado = array("d")
+        self.p_sangria = array("d")
+        self.p_espacio_antes = array("d")
+        self.p_espacio_despues = array("d")
+        self.p_capitulo = array("i", capitulos)
+        self.p_capitulo.extend(repeat(SIN_ID, adicionales))
+        self.p_banderas = array("B", map(mul, titulos, repeat(TITULO)))
+        self.p_banderas.extend(repeat(ADICIONAL, adicionales))
+        self.r_parrafo = array("i")  # fila del párrafo en las columnas p_*
+        self.r_run = array("i")  # posición del run en para.runs
+        self.r_tamano = array("d")
+
+        # Unir los tramos es copiar columnas; solo r_parrafo se desplaza
+        for parte in partes:
+            base = len(self.p_interlineado)
+            self.p_interlineado.extend(parte.interlineado)
+            self.p_sangria.extend(parte.sangria)
+            self.p_espacio_antes.extend(parte.espacio_antes)
+            self.p_espacio_despues.extend(parte.espacio_despues)
+            self.r_parrafo.extend(map(add, parte.r_parrafo, repeat(base)) if base else parte.r_parrafo)
+            self.r_run.extend(parte.r_run)
+            self.r_tamano.extend(parte.r_tamano)
+
+        self.p_estilo, estilos = _ids(list(chain.from_iterable(p.estilos for p in partes)))
+        self.r_fuente, self._fuentes = _ids(list(chain.from_iterable(p.r_fuente for p in partes)))
+        self.estilos = list(estilos)
+        self.fuentes = list(self._fuentes)
+
+    def id_fuente(self, nombre: str) -> int:
+        return self._fuentes.get(nombre, SIN_ID)
+
+    # -- Estadísticas sobre columnas ---------------------------------------
+
+    @staticmethod
+    def histograma(columna: Sequence, decimales: Optional[int] = None) -> Counter:
+        """
+        Conteo de los valores presentes (sin 0 ni SIN_ID), en orden de primera
+        aparición, así que most_common desempata como antes. Con `decimales`
+        se redondea cada valor antes de contar.
+        """
+        presentes = filter(None, columna) if columna.typecode == "d" else _con_id(columna)
+        if decimales is not None:
+            presentes = map(round, presentes, repeat(decimales))
+        return Counter(presentes)
+
+    @staticmethod
+    def cumplen(columna: Sequence[float], objetivo: float, tolerancia: float, inclusive: bool = False) -> int:
+        """Valores presentes con |valor - objetivo| < tolerancia (<= si `inclusive`)."""
+        diferencias = map(abs, map(sub, filter(None, columna), repeat(objetivo)))
+        return sum(map(le if inclusive else lt, diferencias, repeat(tolerancia)))
+
+    @staticmethod
+    def posiciones_distintas(columna: Sequence[int], valor: int) -> Iterator[int]:
+        """Filas con un id presente distinto de `valor` (p. ej. fuente incorrecta), en orden."""
+        presentes = map(ne, columna, repeat(SIN_ID))
+        distintas = map(ne, columna, repeat(valor))
+        return compress(range(len(columna)), map(and_, presentes, distintas))
+
+    @staticmethod
+    def percentiles(columna: Sequence[float], n: int = 4) -> List[float]:
+        """Cortes de los valores presentes en n partes iguales (n=4: cuartiles)."""
+        presentes = list(filter(None, columna))
+        if len(presentes) < 2:
+            return presentes
+        return statistics.quantiles(presentes, n=n, method="inclusive")
+
+    def por_capitulo(self, columna: Sequence[float], decimales: Optional[int] = None) -> Dict[int, Counter]:
+        """Histograma de una columna p_* por capítulo (0 = antes del primero, -1 = fuera del cuerpo)."""
+        valores = iter(columna) if decimales is None else map(round, columna, repeat(decimales))
+        conteo = Counter(compress(zip(self.p_capitulo, valores), columna))
+        resultado: Dict[int, Counter] = {}
+        for (capitulo, valor), cantidad in conteo.items():
+            resultado.setdefault(capitulo, Counter())[valor] = cantidad
+        return resultado
+
+    def primeras(self, filas: Iterator[int], cantidad: int) -> List[Tuple[ParrafoSnapshot, RunSnapshot]]:
+        """(párrafo, run) de las primeras `cantidad` filas de runs indicadas."""
+        resultado = []
+        for i in islice(filas, cantidad):
+            para = self.parrafos[self.r_parrafo[i]]
+            resultado.append((para, para.runs[self.r_run[i]]))
+        return resultado
+
+
+def _con_id(columna: Sequence[int]) -> Iterator[int]:
+    return compress(columna, map(ne, columna, repeat(SIN_ID)))
+
+
+def tabla_formato(
+    snapshot: DocumentoSnapshot, partes: Optional[Sequence[ParteTabla]] = None
+) -> TablaFormato:
+    """
+    Tabla columnar de la instantánea, construida una vez por instantánea (con
+    `partes` si se indican; ver TablaFormato).
+    """
+    return por_instantanea(snapshot, "tabla_formato", lambda s: TablaFormato(s, partes))
@@ -0,0 +1 @@
+# Benchmarks del Document Service
@@ -0,0 +1,246 @@
+"""
+Generador de tesis sintéticas para los benchmarks.
+
+Construye con python-docx un documento con la estructura de la Guía UNAP 2.0
+(portada, resumen, índice, capítulos, referencias) y un tamaño configurable.
+El contenido es aleatorio pero reproducible: la misma semilla produce
+siempre el mismo documento.
+
+Uso:
+    python -m benchmarks.generador tesis.docx --paginas 150 --tablas 20
+"""
+import argparse
+import io
+import random
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import List
+
+from docx import Document
+from docx.enum.text import WD_LINE_SPACING
+from docx.shared import Cm, Pt
+
+# Párrafos de cuerpo por página con interlineado doble (~250 palabras)
+PARRAFOS_POR_PAGINA = 3
+
+CAPITULOS = [
+    ("I", "INTRODUCCIÓN"),
+    ("II", "REVISIÓN DE LITERATURA"),
+    ("III", "MATERIALES Y MÉTODOS"),
+    ("IV", "RESULTADOS Y DISCUSIÓN"),
+    ("V", "CONCLUSIONES"),
+]
+
+FUENTES_ALTERNATIVAS = ["Arial", "Calibri", "Cambria", "Georgia"]
+
+PALABRAS = (
+    "el la de en que los las del se por con para una un como más sobre "
+    "investigación análisis resultados datos muestra población variable "
+    "método estudio región altiplano puno agua suelo producción cultivo "
+    "temperatura promedio significativo estadística modelo evaluación "
+    "desarrollo sistema proceso calidad nivel diferencia factor tratamiento"
+).split()
+
+
+@dataclass
+class OpcionesTesis:
+    paginas: int = 50
+    capitulos: int = 5
+    tablas: int = 5
+    imagenes: int = 3
+    # Fracción de runs con una fuente distinta de Times New Roman
+    fuentes_mixtas: float = 0.05
+    # Fracción de párrafos con formato directo; el resto lo hereda de Normal
+    formato_directo: float = 0.5
+    semilla: int = 0
+
+
+def _png(ancho: int, alto: int, rng: random.Random) -> bytes:
+    """PNG RGB de color sólido, sin depender de Pillow."""
+    def chunk(tipo: bytes, datos: bytes) -> bytes:
+        cuerpo = tipo + datos
+        return struct.pack(">I", len(datos)) + cuerpo + struct.pack(">I", zlib.crc32(cuerpo))
+
+    color = bytes(rng.randrange(256) for _ in range(3))
+    fila = b"\x00" + color * ancho
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", ancho, alto, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(fila * alto))
+        + chunk(b"IEND", b"")
+    )
+
+
+def _oracion(rng: random.Random, palabras: int) -> str:
+    texto = " ".join(rng.choice(PALABRAS) for _ in range(palabras))
+    return texto[0].upper() + texto[1:] + "."
+
+
+def _repartir(total: int, partes: int) -> List[int]:
+    base, resto = divmod(total, partes)
+    return [base + (1 if i < resto else 0) for i in range(partes)]
+
+
+class _Generador:
+    def __init__(self, opciones: OpcionesTesis):
+        self.op = opciones
+        self.rng = random.Random(opciones.semilla)
+        self.doc = Document()
+        self._configurar_normal()
+
+    def _configurar_normal(self) -> None:
+        normal = self.doc.styles["Normal"]
+        normal.font.name = "Times New Roman"
+        normal.font.size = Pt(12)
+        normal.paragraph_format.line_spacing = 2.0
+        normal.paragraph_format.line_spacing_rule = WD_LINE_SPACING.MULTIPLE
+        normal.paragraph_format.first_line_indent = Cm(1.25)
+
+        section = self.doc.sections[0]
+        section.page_width = Cm(21.0)
+        section.page_height = Cm(29.7)
+        section.top_margin = Cm(3.5)
+        section.bottom_margin = Cm(2.5)
+        section.left_margin = Cm(2.5)
+        section.right_margin = Cm(2.5)
+
+    def titulo(self, texto: str, estilo: str = "Heading 1") -> None:
+        self.doc.add_paragraph(texto, style=estilo)
+
+    def parrafo(self) -> None:
+        oraciones = [_oracion(self.rng, self.rng.randint(12, 25)) for _ in range(4)]
+        directo = self.rng.random() < self.op.formato_directo
+        para = self.doc.add_paragraph()
+        if directo:
+            pf = para.paragraph_format
+            pf.line_spacing = 2.0
+            pf.first_line_indent = Cm(1.25)
+            pf.space_after = Pt(0)
+
+        for oracion in oraciones:
+            run = para.add_run(oracion + " ")
+            if self.rng.random() < self.op.fuentes_mixtas:
+                run.font.name = self.rng.choice(FUENTES_ALTERNATIVAS)
+            elif directo:
+                run.font.name = "Times New Roman"
+            if directo:
+                run.font.size = Pt(12)
+
+    def tabla(self, numero: int) -> None:
+        self.doc.add_paragraph(f"Tabla {numero}: {_oracion(self.rng, 6)}")
+        filas, columnas = self.rng.randint(4, 12), self.rng.randint(3, 6)
+        tabla = self.doc.add_table(rows=filas, cols=columnas)
+        for fila in tabla.rows:
+            for celda in fila.cells:
+                celda.text = f"{self.rng.uniform(0, 1000):.2f}"
+
+    def imagen(self, numero: int) -> None:
+        contenido = _png(self.rng.randint(200, 600), self.rng.randint(150, 400), self.rng)
+        self.doc.add_picture(io.BytesIO(contenido), width=Cm(12))
+        self.doc.add_paragraph(f"Figura {numero}: {_oracion(self.rng, 6)}")
+
+    def generar(self) -> Document:
+        op = self.op
+        for linea in (
+            "UNIVERSIDAD NACIONAL DEL ALTIPLANO",
+            "FACULTAD DE INGENIERÍA",
+            "ESCUELA PROFESIONAL DE INGENIERÍA DE SISTEMAS",
+            "TESIS",
+            _oracion(self.rng, 14).upper(),
+            "PRESENTADA POR:",
+            "PUNO - PERÚ",
+        ):
+            self.doc.add_paragraph(linea)
+        self.doc.add_page_break()
+
+        self.titulo("RESUMEN")
+        self.parrafo()
+        self.titulo("ABSTRACT")
+        self.parrafo()
+
+        self.titulo("ÍNDICE GENERAL")
+        capitulos = CAPITULOS[: max(1, min(op.capitulos, len(CAPITULOS)))]
+        for i, (numero, nombre) in enumerate(capitulos):
+            self.doc.add_paragraph(f"{i + 1}. {nombre} .......... {10 + i * 15}")
+        self.doc.add_page_break()
+
+        paginas = _repartir(op.paginas, len(capitulos))
+        tablas = _repartir(op.tablas, len(capitulos))
+        imagenes = _repartir(op.imagenes, len(capitulos))
+        n_tabla = n_imagen = 0
+
+        for c, (numero, nombre) in enumerate(capitulos):
+            self.titulo(f"CAPÍTULO {numero}")
+            self.titulo(nombre)
+            parrafos = max(1, paginas[c] * PARRAFOS_POR_PAGINA)
+            subtitulos = max(1, parrafos // 6)
+            por_subtitulo = _repartir(parrafos, subtitulos)
+            # Repartir tablas e imágenes al azar entre los subtítulos
+            extras: List[List[str]] = [[] for _ in por_subtitulo]
+            for extra in ["tabla"] * tablas[c] + ["imagen"] * imagenes[c]:
+                extras[self.rng.randrange(subtitulos)].append(extra)
+
+            for s, cantidad in enumerate(por_subtitulo):
+                self.titulo(f"{c + 1}.{s + 1}. {_oracion(self.rng, 4)[:-1]}", "Heading 2")
+                for _ in range(cantidad):
+                    self.parrafo()
+                for extra in extras[s]:
+                    if extra == "tabla":
+                        n_tabla += 1
+                        self.tabla(n_tabla)
+                    else:
+                        n_imagen += 1
+                        self.imagen(n_imagen)
+            self.doc.add_page_break()
+
+        self.titulo("RECOMENDACIONES")
+        for _ in range(2):
+            self.parrafo()
+
+        self.titulo("REFERENCIAS BIBLIOGRÁFICAS")
+        for _ in range(max(5, op.paginas // 5)):
+            self.doc.add_paragraph(
+                f"{_oracion(self.rng, 3)[:-1]} ({self.rng.randint(1990, 2024)}). {_oracion(self.rng, 10)}"
+            )
+        return self.doc
+
+
+def generar_tesis(opciones: OpcionesTesis) -> Document:
+    """Construye la tesis sintética como Document de python-docx."""
+    return _Generador(opciones).generar()
+
+
+def generar_tesis_bytes(opciones: OpcionesTesis) -> bytes:
+    """Igual que generar_tesis, pero retorna el .docx serializado."""
+    salida = io.BytesIO()
+    generar_tesis(opciones).save(salida)
+    return salida.getvalue()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Genera una tesis sintética (.docx)")
+    parser.add_argument("salida", help="ruta del .docx a generar")
+    parser.add_argument("--paginas", type=int, default=OpcionesTesis.paginas)
+    parser.add_argument("--capitulos", type=int, default=OpcionesTesis.capitulos)
+    parser.add_argument("--tablas", type=int, default=OpcionesTesis.tablas)
+    parser.add_argument("--imagenes", type=int, default=OpcionesTesis.imagenes)
+    parser.add_argument("--fuentes-mixtas", type=float, default=OpcionesTesis.fuentes_mixtas)
+    parser.add_argument("--formato-directo", type=float, default=OpcionesTesis.formato_directo)
+    parser.add_argument("--semilla", type=int, default=OpcionesTesis.semilla)
+    args = parser.parse_args()
+
+    opciones = OpcionesTesis(
+        paginas=args.paginas,
+        capitulos=args.capitulos,
+        tablas=args.tablas,
+        imagenes=args.imagenes,
+        fuentes_mixtas=args.fuentes_mixtas,
+        formato_directo=args.formato_directo,
+        semilla=args.semilla,
+    )
+    generar_tesis(opciones).save(args.salida)
+
+
+if __name__ == "__main__":
+    main()
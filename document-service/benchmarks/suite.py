@@ -0,0 +1,218 @@
+"""
+Suite de benchmarks del Document Service.
+
+Mide, para tesis sintéticas de varios tamaños (ver generador.py):
+- carga: `Document()` desde memoria
+- carga_validacion: carga sin imágenes ni objetos incrustados (app/paquete.py)
+- snapshot / snapshot_xml: construcción de la instantánea con cada motor
+- cada validador sobre la instantánea y validar_documento_completo
+- cada formateador de app/formatters sobre un documento recién cargado
+- guardado: `doc.save()` a memoria
+- guardado_copiando: guardar_paquete copiando las partes sin cambios (app/guardado.py)
+
+Escribe los resultados en JSON y, si se indica un archivo base, compara las
+medianas y termina con código 1 cuando alguna supera el umbral de regresión.
+
+Uso (desde document-service/):
+    python -m benchmarks.suite --salida base.json
+    python -m benchmarks.suite --base base.json --umbral 0.2
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from docx import Document
+
+from app.guardado import guardar_paquete
+from app.paquete import abrir_para_validar
+from app.formatters import (
+    aplicar_estilos_base,
+    formatear_capitulos,
+    generar_indices,
+    generar_portada,
+)
+from app.validators import (
+    construir_snapshot,
+    construir_snapshot_xml,
+    maquetar,
+    validar_documento_completo,
+    validar_estructura,
+    validar_fuentes,
+    validar_interlineado,
+    validar_margenes,
+    validar_paginas,
+)
+
+from .generador import OpcionesTesis, generar_tesis_bytes
+
+TAMANOS: Dict[str, OpcionesTesis] = {
+    "chico": OpcionesTesis(paginas=10, tablas=2, imagenes=1),
+    "mediano": OpcionesTesis(paginas=100, tablas=10, imagenes=5),
+    "grande": OpcionesTesis(paginas=400, tablas=40, imagenes=20),
+}
+
+DATOS_PORTADA = {"titulo": "Tesis de prueba", "autor": "Autor de prueba"}
+
+# Diferencias menores a esto se consideran ruido aunque superen el umbral
+MINIMO_REGRESION_S = 0.002
+
+
+def medir(
+    fn: Callable[[Any], Any],
+    preparar: Callable[[], Any],
+    repeticiones: int,
+) -> Dict[str, float]:
+    """
+    Ejecuta fn(preparar()) `repeticiones` veces, midiendo solo fn, tras una
+    ejecución de calentamiento que no se cuenta.
+    """
+    fn(preparar())
+    tiempos: List[float] = []
+    for _ in range(repeticiones):
+        argumento = preparar()
+        inicio = time.perf_counter()
+        fn(argumento)
+        tiempos.append(time.perf_counter() - inicio)
+    return {
+        "mediana_s": statistics.median(tiempos),
+        "minimo_s": min(tiempos),
+        "media_s": statistics.fmean(tiempos),
+        "repeticiones": repeticiones,
+    }
+
+
+def medir_tamano(contenido: bytes, repeticiones: int) -> Dict[str, Dict[str, float]]:
+    """Todas las mediciones sobre un mismo documento."""
+    def cargar() -> Document:
+        return Document(io.BytesIO(contenido))
+
+    doc = cargar()
+    snapshot = construir_snapshot(doc)
+    constante = lambda valor: (lambda: valor)  # noqa: E731
+    # Copia de la instantánea por repetición: la clasificación, la tabla de
+    # formato y la maquetación se guardan para la última instantánea
+    copia = lambda: snapshot._replace()  # noqa: E731
+
+    casos: List[Tuple[str, Callable[[Any], Any], Callable[[], Any]]] = [
+        ("carga", lambda c: Document(io.BytesIO(c)), constante(contenido)),
+        ("carga_validacion", abrir_para_validar, constante(contenido)),
+        ("snapshot", construir_snapshot, constante(doc)),
+        ("snapshot_xml", construir_snapshot_xml, constante(contenido)),
+        ("validar_margenes", validar_margenes, copia),
+        ("validar_fuentes", validar_fuentes, copia),
+        ("validar_interlineado", validar_interlineado, copia),
+        ("validar_estructura", validar_estructura, copia),
+        ("validar_paginas", validar_paginas, copia),
+        ("maquetacion", maquetar, copia),
+        ("validar_documento_completo", validar_documento_completo, constante(doc)),
+        # Los formateadores modifican el documento: uno recién cargado por repetición
+        ("aplicar_estilos_base", lambda d: aplicar_estilos_base(d, "directo"), cargar),
+        ("aplicar_estilos_base_estilos", lambda d: aplicar_estilos_base(d, "estilos"), cargar),
+        ("formatear_capitulos", formatear_capitulos, cargar),
+        ("generar_portada", lambda d: generar_portada(d, DATOS_PORTADA), cargar),
+        ("generar_indices", generar_indices, cargar),
+        ("guardado", lambda d: d.save(io.BytesIO()), constante(doc)),
+        ("guardado_copiando", lambda d: guardar_paquete(d, io.BytesIO(), contenido), constante(doc)),
+    ]
+    return {nombre: medir(fn, preparar, repeticiones) for nombre, fn, preparar in casos}
+
+
+def ejecutar(tamanos: List[str], repeticiones: int) -> Dict[str, Any]:
+    resultados: Dict[str, Any] = {}
+    for nombre in tamanos:
+        contenido = generar_tesis_bytes(TAMANOS[nombre])
+        print(f"[{nombre}] {len(contenido) / 1024:.0f} KB", file=sys.stderr)
+        resultados[nombre] = medir_tamano(contenido, repeticiones)
+    return {
+        "meta": {
+            "fecha": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "repeticiones": repeticiones,
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(
+    actual: Dict[str, Any],
+    base: Dict[str, Any],
+    umbral: float,
+    minimo_s: float = MINIMO_REGRESION_S,
+) -> List[str]:
+    """Mediciones cuya mediana empeoró más de `umbral` (0.2 = 20 %) respecto de la base."""
+    regresiones = []
+    for tamano, medidas in actual["resultados"].items():
+        medidas_base = base.get("resultados", {}).get(tamano, {})
+        for nombre, medida in medidas.items():
+            anterior = medidas_base.get(nombre)
+            if anterior is None:
+                continue
+            antes, ahora = anterior["mediana_s"], medida["mediana_s"]
+            if ahora > antes * (1 + umbral) and ahora - antes > minimo_s:
+                regresiones.append(
+                    f"{tamano}/{nombre}: {antes * 1000:.1f} ms -> {ahora * 1000:.1f} ms "
+                    f"(+{(ahora / antes - 1) * 100:.0f}%)"
+                )
+    return regresiones
+
+
+def imprimir(resultados: Dict[str, Any]) -> None:
+    for tamano, medidas in resultados["resultados"].items():
+        print(f"\n{tamano}")
+        for nombre, medida in medidas.items():
+            print(
+                f"  {nombre:<28} {medida['mediana_s'] * 1000:>10.2f} ms"
+                f"  (mín {medida['minimo_s'] * 1000:.2f} ms)"
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del Document Service")
+    parser.add_argument(
+        "--tamanos",
+        default="chico,mediano",
+        help=f"tamaños separados por coma ({', '.join(TAMANOS)})",
+    )
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--salida", default="resultados_benchmark.json", help="JSON de resultados")
+    parser.add_argument("--base", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument(
+        "--umbral",
+        type=float,
+        default=0.2,
+        help="aumento relativo de la mediana que se considera regresión (0.2 = 20%%)",
+    )
+    args = parser.parse_args(argv)
+
+    tamanos = [t.strip() for t in args.tamanos.split(",") if t.strip()]
+    desconocidos = [t for t in tamanos if t not in TAMANOS]
+    if desconocidos:
+        parser.error(f"tamaños desconocidos: {', '.join(desconocidos)}")
+
+    resultados = ejecutar(tamanos, max(args.repeticiones, 1))
+    imprimir(resultados)
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, indent=2)
+
+    if args.base:
+        with open(args.base, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(resultados, base, args.umbral)
+        if regresiones:
+            print(f"\nRegresiones (umbral {args.umbral:.0%}):")
+            for linea in regresiones:
+                print(f"  {linea}")
+            return 1
+        print(f"\nSin regresiones respecto de {args.base} (umbral {args.umbral:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+import io
+import os
+import sys
+from typing import Iterable, Optional, Tuple, Union
+
+import pytest
+from docx import Document
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Párrafo: texto, o (texto, estilo)
+Parrafo = Union[str, Tuple[str, Optional[str]]]
+
+
+def documento_docx(parrafos: Iterable[Parrafo]) -> bytes:
+    """Bytes de un .docx con los párrafos indicados."""
+    doc = Document()
+    for parrafo in parrafos:
+        texto, estilo = (parrafo, None) if isinstance(parrafo, str) else parrafo
+        doc.add_paragraph(texto, style=estilo)
+    salida = io.BytesIO()
+    doc.save(salida)
+    return salida.getvalue()
+
+
+@pytest.fixture
+def tesis_chica() -> bytes:
+    """Tesis sintética de unas pocas páginas (ver benchmarks/generador.py)."""
+    from benchmarks.generador import OpcionesTesis, generar_tesis_bytes
+
+    return generar_tesis_bytes(OpcionesTesis(paginas=8, tablas=2, imagenes=1))
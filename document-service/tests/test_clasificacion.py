@@ -0,0 +1,93 @@
+from app.clasificacion import TipoParrafo, clasificar_parrafos
+from app.validators import validar_estructura
+from app.validators.snapshot import construir_snapshot
+
+from conftest import documento_docx
+
+CUERPO = "Texto del cuerpo de la tesis con varias palabras."
+
+CAPITULOS = [
+    ("CAPÍTULO I", "INTRODUCCIÓN"),
+    ("CAPÍTULO II", "REVISIÓN DE LITERATURA"),
+    ("CAPÍTULO III", "MATERIALES Y MÉTODOS"),
+    ("CAPÍTULO IV", "RESULTADOS Y DISCUSIÓN"),
+    ("CAPÍTULO V", "CONCLUSIONES"),
+]
+
+
+def _cuerpo_tesis():
+    parrafos = ["RESUMEN", CUERPO, "ABSTRACT", CUERPO]
+    for capitulo, titulo in CAPITULOS:
+        parrafos += [capitulo, titulo, CUERPO]
+    parrafos += ["RECOMENDACIONES", CUERPO, "REFERENCIAS BIBLIOGRÁFICAS", "Autor, A. (2020). Obra."]
+    return parrafos
+
+
+def _tipos(parrafos):
+    textos = [(p, None) if isinstance(p, str) else p for p in parrafos]
+    return [c.tipo for c in clasificar_parrafos(textos)]
+
+
+def _secciones(parrafos):
+    from docx import Document
+    import io
+
+    doc = Document(io.BytesIO(documento_docx(parrafos)))
+    return [i for i in validar_estructura(construir_snapshot(doc)) if i.categoria in ("Secciones", "Capítulos")]
+
+
+def test_indices_sin_entradas_en_el_orden_de_la_guia():
+    parrafos = ["ÍNDICE GENERAL", "ÍNDICE DE TABLAS"] + _cuerpo_tesis()
+    tipos = _tipos(parrafos)
+    assert tipos[:2] == [TipoParrafo.INDICE, TipoParrafo.INDICE]
+    assert tipos[2] is TipoParrafo.TITULO_1  # RESUMEN termina el índice
+    assert TipoParrafo.ENTRADA_INDICE not in tipos
+
+    items = _secciones(parrafos)
+    assert all(i.es_valido for i in items), [i.mensaje for i in items]
+    assert any(i.valor_actual.startswith("5 capítulos") for i in items)
+
+
+def test_entradas_de_indice_con_capitulos_no_son_capitulos():
+    indice = ["ÍNDICE GENERAL", "RESUMEN\t1", "ABSTRACT\t2"]
+    for capitulo, titulo in CAPITULOS:
+        indice += [capitulo, f"{titulo} ........ 5", f"1.1. Planteamiento del problema\t6"]
+    indice += ["ÍNDICE DE TABLAS", "Tabla 1. Distribución de la muestra\t20"]
+    parrafos = indice + _cuerpo_tesis()
+    tipos = _tipos(parrafos)
+
+    assert tipos[: len(indice)].count(TipoParrafo.CAPITULO) == 0
+    assert tipos[len(indice)] is TipoParrafo.TITULO_1
+    assert tipos.count(TipoParrafo.CAPITULO) == len(CAPITULOS)
+
+    items = _secciones(parrafos)
+    assert all(i.es_valido for i in items), [i.mensaje for i in items]
+
+
+def test_indice_que_termina_en_el_primer_capitulo():
+    parrafos = [
+        "ÍNDICE GENERAL",
+        "CAPÍTULO I INTRODUCCIÓN ..... 1",
+        "CAPÍTULO II REVISIÓN DE LITERATURA ..... 8",
+        "CAPÍTULO I",
+        "INTRODUCCIÓN",
+        CUERPO,
+    ]
+    assert _tipos(parrafos) == [
+        TipoParrafo.INDICE,
+        TipoParrafo.ENTRADA_INDICE,
+        TipoParrafo.ENTRADA_INDICE,
+        TipoParrafo.CAPITULO,
+        TipoParrafo.TITULO_1,
+        TipoParrafo.CUERPO,
+    ]
+
+
+def test_capitulo_tras_lista_de_tablas_y_titulo_con_estilo():
+    assert _tipos(["LISTA DE TABLAS", "Tabla 1. Datos\t4", "CAPÍTULO I", CUERPO])[2] is TipoParrafo.CAPITULO
+    assert _tipos(["ÍNDICE", "Algo\t3", ("Marco conceptual", "Heading 1"), CUERPO])[2] is TipoParrafo.TITULO_1
+
+
+def test_palabra_de_indice_en_el_cuerpo_no_abre_un_indice():
+    tipos = _tipos(["CAPÍTULO I", "Análisis de contenido", CUERPO, "1.1. Objetivos"])
+    assert tipos == [TipoParrafo.CAPITULO, TipoParrafo.CUERPO, TipoParrafo.CUERPO, TipoParrafo.TITULO_2]
@@ -0,0 +1,81 @@
+import io
+import re
+import zipfile
+
+import pytest
+
+from app.config import get_settings
+from app.validators import plan_reglas, validar_snapshot
+from app.validators.incremental import (
+    construir_snapshot_incremental,
+    deserializar_estado,
+    serializar_estado,
+)
+from app.validators.motor_xml import construir_snapshot_xml
+
+
+def _editar_documento(datos: bytes, editar) -> bytes:
+    """El mismo .docx con word/document.xml pasado por `editar`."""
+    salida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(datos)) as origen, zipfile.ZipFile(
+        salida, "w", zipfile.ZIP_DEFLATED
+    ) as destino:
+        for info in origen.infolist():
+            contenido = origen.read(info.filename)
+            if info.filename == "word/document.xml":
+                contenido = editar(contenido)
+            destino.writestr(info, contenido)
+    return salida.getvalue()
+
+
+def _nueva_version(xml: bytes) -> bytes:
+    # Cambia el texto de un párrafo y quita la primera tabla (la segunda pasa a ser "tabla 1")
+    xml = xml.replace(b"<w:t>RESUMEN</w:t>", b"<w:t>RESUMEN EJECUTIVO</w:t>", 1)
+    return re.sub(rb"<w:tbl>.*?</w:tbl>", b"", xml, count=1, flags=re.S)
+
+
+@pytest.fixture(params=[False, True], ids=["cuerpo", "historias"])
+def historias(request, monkeypatch):
+    monkeypatch.setattr(get_settings(), "validation_stories", request.param)
+    return request.param
+
+
+def test_igual_a_la_validacion_completa(tesis_chica, historias):
+    snapshot, estado, revalidados = construir_snapshot_incremental(tesis_chica, None)
+    assert snapshot == construir_snapshot_xml(tesis_chica)
+    # Sin estado previo se lee todo (los hijos repetidos, una sola vez)
+    assert 0 < revalidados <= len(snapshot.parrafos) + len(snapshot.adicionales)
+
+    nueva = _editar_documento(tesis_chica, _nueva_version)
+    previo = deserializar_estado(serializar_estado(estado))
+    snapshot, _, revalidados = construir_snapshot_incremental(nueva, previo)
+    completo = construir_snapshot_xml(nueva)
+    assert snapshot == completo
+    # Solo se vuelve a leer el párrafo editado
+    assert revalidados == 1
+    plan = plan_reglas()
+    assert validar_snapshot(snapshot, plan) == validar_snapshot(completo, plan)
+
+
+def test_estado_guardado(tesis_chica, historias):
+    _, estado, _ = construir_snapshot_incremental(tesis_chica, None)
+    datos = serializar_estado(estado)
+    previo = deserializar_estado(datos)
+    assert previo.trozos.keys() == estado.trozos.keys()
+    # Los trozos reutilizados se vuelven a escribir igual
+    _, reescrito, revalidados = construir_snapshot_incremental(tesis_chica, previo)
+    assert revalidados == 0
+    assert serializar_estado(reescrito) == datos
+
+    assert deserializar_estado(b"") is None
+    assert deserializar_estado(b"no es un estado") is None
+
+
+def test_xml_que_no_se_parte_se_recorre_completo(tesis_chica, historias):
+    # Un comentario entre los hijos de w:body
+    con_comentario = _editar_documento(
+        tesis_chica, lambda xml: xml.replace(b"<w:body>", b"<w:body><!-- nota -->", 1)
+    )
+    snapshot, estado, _ = construir_snapshot_incremental(con_comentario, None)
+    assert snapshot == construir_snapshot_xml(con_comentario)
+    assert not estado.trozos
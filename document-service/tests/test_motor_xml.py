@@ -0,0 +1,50 @@
+import io
+import zipfile
+
+import pytest
+from lxml import etree
+
+from app.config import get_settings
+from app.paquete import abrir_para_validar
+from app.validators import (
+    construir_snapshot,
+    construir_snapshot_xml,
+    plan_reglas,
+    validar_documento_completo,
+    validar_snapshot,
+)
+
+from conftest import documento_docx
+
+
+@pytest.mark.parametrize("historias", [False, True], ids=["cuerpo", "historias"])
+def test_mismo_resultado_que_python_docx(tesis_chica, historias, monkeypatch):
+    monkeypatch.setattr(get_settings(), "validation_stories", historias)
+    doc, _ = abrir_para_validar(tesis_chica)
+    snapshot = construir_snapshot_xml(tesis_chica)
+    assert snapshot == construir_snapshot(doc)
+    if historias:
+        assert snapshot.adicionales
+
+    plan = plan_reglas()
+    assert validar_snapshot(snapshot, plan) == validar_documento_completo(doc, plan)
+
+
+def test_sin_huge_tree():
+    # 3000 niveles de anidamiento: libxml2 lo rechaza igual que con python-docx
+    n = 3000
+    anidado = b'<w:customXml w:element="a">' * n + b"</w:customXml>" * n
+    salida = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(documento_docx(["Hola"]))) as origen, zipfile.ZipFile(
+        salida, "w"
+    ) as destino:
+        for info in origen.infolist():
+            contenido = origen.read(info.filename)
+            if info.filename == "word/document.xml":
+                contenido = contenido.replace(b"<w:body>", b"<w:body>" + anidado, 1)
+            destino.writestr(info, contenido)
+
+    with pytest.raises(etree.XMLSyntaxError):
+        construir_snapshot_xml(salida.getvalue())
+    with pytest.raises(etree.XMLSyntaxError):
+        abrir_para_validar(salida.getvalue())
@@ -0,0 +1,60 @@
+import io
+from collections import Counter
+
+from docx import Document
+
+from app.config import get_settings
+from app.validators.snapshot import clasificar_snapshot, construir_snapshot
+from app.validators.tabla import ADICIONAL, SIN_ID, TITULO, tabla_formato
+
+CUERPO = "Texto del cuerpo de la tesis con varias palabras."
+
+
+def _snapshot():
+    doc = Document()
+    # (texto, interlineado)
+    for texto, interlineado in [
+        ("RESUMEN", 1.0),
+        (CUERPO, 1.5),
+        ("CAPÍTULO I", 1.0),
+        ("INTRODUCCIÓN", 1.0),
+        (CUERPO, 2.0),
+        (CUERPO, 2.0),
+        ("CAPÍTULO II", 1.0),
+        ("REVISIÓN DE LITERATURA", 1.0),
+        (CUERPO, 1.5),
+    ]:
+        doc.add_paragraph(texto).paragraph_format.line_spacing = interlineado
+    doc.add_table(rows=1, cols=1).cell(0, 0).text = "Celda"
+    salida = io.BytesIO()
+    doc.save(salida)
+    return construir_snapshot(Document(io.BytesIO(salida.getvalue())))
+
+
+def test_capitulos_y_banderas_de_la_clasificacion_compartida(monkeypatch):
+    # Con las demás historias, la celda de la tabla queda como párrafo adicional
+    monkeypatch.setattr(get_settings(), "validation_stories", True)
+    snapshot = _snapshot()
+    tabla = tabla_formato(snapshot)
+
+    assert list(tabla.p_capitulo) == [0, 0, 1, 1, 1, 1, 2, 2, 2, SIN_ID]
+    titulos = [bool(b & TITULO) for b in tabla.p_banderas]
+    esperados = [c.es_titulo for c in clasificar_snapshot(snapshot)] + [False]
+    assert titulos == esperados
+    assert tabla.p_banderas[-1] == ADICIONAL
+    assert tabla.estilos[tabla.p_estilo[0]] == "Normal"
+    # La tabla reutiliza la clasificación de la instantánea
+    assert tabla_formato(snapshot) is tabla
+
+
+def test_por_capitulo_y_percentiles():
+    tabla = tabla_formato(_snapshot())
+
+    por_capitulo = tabla.por_capitulo(tabla.p_interlineado, 1)
+    assert por_capitulo[0] == Counter({1.0: 1, 1.5: 1})
+    assert por_capitulo[1] == Counter({1.0: 2, 2.0: 2})
+    assert por_capitulo[2] == Counter({1.0: 2, 1.5: 1})
+    assert set(por_capitulo) == {0, 1, 2}
+
+    assert tabla.percentiles(tabla.p_interlineado, 2) == [1.0]
+    assert tabla.percentiles(tabla.p_espacio_antes) == []
@@ -0,0 +1,109 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from app import trabajos
+from app.ejecucion import EjecutorDocumentos
+from app.models import EstadoTrabajo, TipoTrabajo
+from app.trabajos import (
+    BackendTrabajosMemoria,
+    BackendTrabajosSQLite,
+    GestorTrabajos,
+    _ahora,
+)
+
+
+@pytest.fixture
+def ejecutor_hilos(monkeypatch):
+    """Ejecutor en hilos del propio proceso, en lugar del pool de procesos."""
+    ejecutor = EjecutorDocumentos(workers=0)
+    ejecutor.iniciar()
+    monkeypatch.setattr(trabajos, "get_ejecutor", lambda: ejecutor)
+    yield ejecutor
+    ejecutor.detener()
+
+
+async def _esperar_final(gestor: GestorTrabajos, trabajo_id: str, limite: float = 60):
+    async with asyncio.timeout(limite):
+        while True:
+            trabajo = await gestor.obtener(trabajo_id)
+            if trabajo.estado in trabajos.ESTADOS_FINALES:
+                return trabajo
+            await asyncio.sleep(0.05)
+
+
+@pytest.mark.parametrize("backend", ["memoria", "sqlite"])
+def test_ciclo_de_vida(backend, tmp_path, tesis_chica, ejecutor_hilos):
+    if backend == "sqlite":
+        almacen = BackendTrabajosSQLite(str(tmp_path / "trabajos.db"))
+    else:
+        almacen = BackendTrabajosMemoria()
+
+    async def escenario():
+        gestor = GestorTrabajos(almacen, concurrencia=1, lease=30, sondeo=0.1)
+        gestor.iniciar()
+        try:
+            trabajo = await gestor.encolar(TipoTrabajo.VALIDAR, tesis_chica, "tesis.docx", "x")
+            assert trabajo.estado == EstadoTrabajo.EN_COLA
+            final = await _esperar_final(gestor, trabajo.id)
+            assert final.estado == EstadoTrabajo.COMPLETADO, final.error
+            assert final.resultado["total_validaciones"] > 0
+            assert {"espera", "carga", "validacion", "total"} <= set(final.tiempos)
+            assert await gestor.documento(trabajo.id) is None
+
+            formateo = await gestor.encolar(
+                TipoTrabajo.FORMATEAR, tesis_chica, "tesis.docx", "x"
+            )
+            final = await _esperar_final(gestor, formateo.id)
+            assert final.estado == EstadoTrabajo.COMPLETADO, final.error
+            assert final.tiene_documento
+            assert (await gestor.documento(formateo.id)).startswith(b"PK")
+
+            # Un trabajo final no vuelve a cambiar de estado
+            cancelado = await gestor.cancelar(formateo.id)
+            assert cancelado.estado == EstadoTrabajo.COMPLETADO
+        finally:
+            await gestor.detener()
+
+    asyncio.run(escenario())
+
+
+def test_cancelado_en_cola_no_se_ejecuta(tesis_chica):
+    async def escenario():
+        # Sin iniciar el gestor: nadie consume la cola
+        gestor = GestorTrabajos(BackendTrabajosMemoria())
+        trabajo = await gestor.encolar(TipoTrabajo.VALIDAR, tesis_chica, "tesis.docx", "x")
+        cancelado = await gestor.cancelar(trabajo.id)
+        assert cancelado.estado == EstadoTrabajo.CANCELADO
+        assert gestor.backend.siguiente() is None
+
+    asyncio.run(escenario())
+
+
+def test_lease_vencido_vuelve_a_la_cola(tmp_path):
+    ruta = str(tmp_path / "trabajos.db")
+    # Dos conexiones al mismo archivo, como dos workers de app.servidor
+    dueno = BackendTrabajosSQLite(ruta)
+    otro = BackendTrabajosSQLite(ruta)
+    try:
+        gestor = GestorTrabajos(dueno)
+        trabajo = asyncio.run(gestor.encolar(TipoTrabajo.VALIDAR, b"PK", "tesis.docx", "x"))
+        assert dueno.siguiente() == trabajo.id
+        tomado = dueno.obtener(trabajo.id)
+        tomado.estado = EstadoTrabajo.EN_PROCESO
+        dueno.actualizar(tomado)
+
+        # Dueño vivo y lease vigente: el otro worker no lo toca
+        assert otro.recuperar(_ahora() - timedelta(seconds=60)) == 0
+        assert otro.siguiente() is None
+        assert dueno.renovar(trabajo.id)
+
+        # Lease vencido: vuelve a la cola y el dueño pierde el trabajo
+        assert otro.recuperar(_ahora() + timedelta(seconds=1)) == 1
+        assert otro.obtener(trabajo.id).estado == EstadoTrabajo.EN_COLA
+        assert not dueno.renovar(trabajo.id)
+        assert otro.siguiente() == trabajo.id
+    finally:
+        dueno.cerrar()
+        otro.cerrar()
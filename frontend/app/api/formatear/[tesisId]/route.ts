@@ -67,14 +67,15 @@ export async function POST(
       type: "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
     })
     formData.append("file", blob, tesis.archivoOriginalNombre || "documento.docx")
-    formData.append("titulo", tesis.titulo)
-    formData.append(
-      "autor",
-      `${tesis.user.nombres} ${tesis.user.apellidoPaterno} ${tesis.user.apellidoMaterno || ""}`
-    )
 
-    // Llamar al servicio de formateo
-    const formatResponse = await fetch(`${DOCUMENT_SERVICE_URL}/formatear`, {
+    const query = new URLSearchParams({
+      descargar: "true",
+      titulo: tesis.titulo,
+      autor: `${tesis.user.nombres} ${tesis.user.apellidoPaterno} ${tesis.user.apellidoMaterno || ""}`.trim(),
+    })
+
+    // Llamar al servicio de formateo: responde con el .docx formateado
+    const formatResponse = await fetch(`${DOCUMENT_SERVICE_URL}/formatear?${query}`, {
       method: "POST",
       body: formData,
     })
@@ -84,28 +85,26 @@ export async function POST(
       throw new Error(error.detail || "Error en el formateo")
     }
 
-    const formatResult = await formatResponse.json()
-
-    if (!formatResult.exito) {
+    // Si el formateo falla el servicio responde JSON en lugar del documento
+    if (formatResponse.headers.get("content-type")?.includes("application/json")) {
+      const formatResult = await formatResponse.json()
       throw new Error(formatResult.mensaje || "Error en el formateo")
     }
 
-    // El servicio Python guarda el archivo formateado
-    // Necesitamos obtenerlo y subirlo a MinIO
-
-    // Para simplificar, simulamos que el archivo formateado está disponible
-    // En producción, el servicio Python debería devolver el archivo o su ubicación
+    const cambiosRealizados: string[] = JSON.parse(
+      formatResponse.headers.get("x-cambios-realizados") || "[]"
+    )
+    const formattedBuffer = Buffer.from(await formatResponse.arrayBuffer())
 
     // Generar nombre para el archivo formateado
     const nombreFormateado = tesis.archivoOriginalNombre
       ? tesis.archivoOriginalNombre.replace(".docx", "_formateado.docx")
       : "tesis_formateado.docx"
 
-    // Subir archivo formateado a MinIO (usando el original por ahora como placeholder)
-    // En implementación real, se usaría el archivo retornado por el servicio
+    // Subir archivo formateado a MinIO
     const formattedObjectName = await uploadFile(
       nombreFormateado,
-      fileBuffer, // Esto debería ser el buffer del archivo formateado
+      formattedBuffer,
       "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     )
 
@@ -125,9 +124,9 @@ export async function POST(
         tesisId: params.tesisId,
         tipo: "FORMATEO",
         estado: "COMPLETADO",
-        mensaje: formatResult.mensaje,
+        mensaje: "Documento formateado exitosamente",
         detalles: {
-          cambios: formatResult.cambios_realizados,
+          cambios: cambiosRealizados,
         },
         finalizadoEn: new Date(),
       },
@@ -136,7 +135,7 @@ export async function POST(
     return NextResponse.json({
       exito: true,
       mensaje: "Documento formateado exitosamente",
-      cambiosRealizados: formatResult.cambios_realizados,
+      cambiosRealizados,
       tesis: updatedTesis,
     })
   } catch (error) {